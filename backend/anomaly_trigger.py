@@ -0,0 +1,250 @@
+# anomaly_trigger.py
+"""
+Cheap anomaly trigger that gates the accident model.
+
+Accidents are rare, so running the accident model on every full frame wastes
+most of its compute. This trigger watches signals that are almost free to
+compute and decides when, and where, the accident model should run:
+
+- sudden stops: a track's speed drops sharply from its running average
+- overlapping tracks: two vehicle boxes start to overlap
+- stationary vehicles: a track stops for a while although the lane keeps moving
+- motion energy jumps: the frame difference spikes against its running average
+
+Track signals come from the vehicle tracker of the counting head (its
+latest_tracks); motion energy works on any frame. Triggered regions are held
+for a few seconds so an incident keeps being observed, and the full frame is
+still checked on a low periodic fallback cadence.
+"""
+
+import logging
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from config import Config
+from incident_tracker import box_iou
+
+MOTION_SIZE = (160, 90)  # Resolution for the motion-energy frame difference
+
+
+class AnomalyTrigger:
+    """
+    Decides when and where to run the accident model
+    """
+
+    def __init__(
+        self,
+        track_source=None,
+        fallback_seconds: float = Config.ANOMALY_FALLBACK_SECONDS,
+        hold_seconds: float = Config.ANOMALY_HOLD_SECONDS,
+        crop_margin: float = Config.ANOMALY_CROP_MARGIN
+    ):
+        """
+        Initialize the trigger
+
+        Args:
+            track_source: Object with a latest_tracks dict (e.g. the vehicle counting head);
+                          None to use motion energy and the fallback cadence only
+            fallback_seconds: Run the model on the full frame at least this often (video time)
+            hold_seconds: Keep running on a triggered region for this long
+            crop_margin: Margin added around triggered boxes, as a fraction of their size
+        """
+        self.track_source = track_source
+        self.fallback_seconds = fallback_seconds
+        self.hold_seconds = hold_seconds
+        self.crop_margin = crop_margin
+
+        # Per-track state: running speed average and time since the track stopped
+        self.avg_speed: Dict[int, float] = {}
+        self.stopped_since: Dict[int, float] = {}
+        self.flagged_stationary = set()
+        self.overlapping_pairs = set()
+
+        self.prev_small = None
+        self.motion_avg = 0.0
+
+        self.last_full_run: Optional[float] = None
+        self.active_regions: List[Dict] = []  # {'box': [x1, y1, x2, y2], 'until': seconds}
+
+        self.evaluations = 0
+        self.full_runs = 0
+        self.crop_runs = 0
+        self.signal_counts = {'sudden_stop': 0, 'overlap': 0, 'stationary': 0, 'motion': 0}
+
+        source = type(track_source).__name__ if track_source is not None else "motion only"
+        logging.info(f"AnomalyTrigger initialized ({source}, fallback every {fallback_seconds}s, "
+                     f"hold {hold_seconds}s)")
+
+    def evaluate(self, frame, clock) -> List[Optional[List[int]]]:
+        """
+        Decide where to run the accident model on this frame
+
+        Args:
+            frame: Full video frame
+            clock: Pipeline clock positioned at this frame
+
+        Returns:
+            List of regions [x1, y1, x2, y2] to run the model on; None in the list means
+            the full frame. An empty list means the model is skipped for this frame.
+        """
+        self.evaluations += 1
+        now = clock.elapsed
+        height, width = frame.shape[:2]
+
+        boxes = self._track_signals(now) + self._motion_signal(frame)
+        for box in boxes:
+            self.active_regions.append({'box': self._expand(box, width, height), 'until': now + self.hold_seconds})
+        self.active_regions = [r for r in self.active_regions if r['until'] >= now]
+
+        if self.last_full_run is None or now - self.last_full_run >= self.fallback_seconds:
+            self.last_full_run = now
+            self.full_runs += 1
+            return [None]
+
+        if not self.active_regions:
+            return []
+
+        regions = self._merge([r['box'] for r in self.active_regions])
+        self.crop_runs += len(regions)
+        return regions
+
+    def hold(self, box, frame_shape, now: float):
+        """
+        Keep running the model on a region (e.g. an unconfirmed incident) for hold_seconds
+
+        Args:
+            box: Region [x1, y1, x2, y2] in frame coordinates
+            frame_shape: Shape of the frame the box belongs to
+            now: Current video time in seconds
+        """
+        height, width = frame_shape[:2]
+        self.active_regions.append({'box': self._expand(box, width, height), 'until': now + self.hold_seconds})
+
+    def stats(self) -> Dict:
+        """Trigger counters"""
+        model_runs = self.full_runs + self.crop_runs
+        return {
+            'evaluations': self.evaluations,
+            'full_runs': self.full_runs,
+            'crop_runs': self.crop_runs,
+            'skipped': self.evaluations - min(self.evaluations, model_runs),
+            'signals': dict(self.signal_counts),
+        }
+
+    def _track_signals(self, now: float) -> List[List[float]]:
+        """Sudden stops, new overlaps and stationary vehicles among the current tracks"""
+        tracks = getattr(self.track_source, 'latest_tracks', None) if self.track_source is not None else None
+        if not tracks:
+            return []
+
+        active = {tid: t for tid, t in tracks.items() if t['lost_frames'] == 0}
+        for tid in list(self.avg_speed):
+            if tid not in active:
+                self.avg_speed.pop(tid, None)
+                self.stopped_since.pop(tid, None)
+                self.flagged_stationary.discard(tid)
+        if not active:
+            self.overlapping_pairs = set()
+            return []
+
+        track_ids = list(active)
+        bboxes = np.array([active[tid]['bbox'] for tid in track_ids], dtype=np.float64)
+        speeds = np.array([
+            np.hypot(*np.subtract(active[tid]['center'], active[tid]['prev_center']))
+            if active[tid]['prev_center'] is not None else np.nan
+            for tid in track_ids
+        ])
+
+        triggered: List[List[float]] = []
+        moving = speeds[speeds >= Config.ANOMALY_MIN_MOVING_SPEED]
+        lane_moving = len(moving) > 0 and len(moving) >= len(track_ids) / 2
+
+        for index, tid in enumerate(track_ids):
+            speed = speeds[index]
+            if np.isnan(speed):
+                continue
+
+            average = self.avg_speed.get(tid)
+            if (average is not None and average >= Config.ANOMALY_MIN_MOVING_SPEED
+                    and speed < average * Config.ANOMALY_SUDDEN_STOP_RATIO):
+                self.signal_counts['sudden_stop'] += 1
+                triggered.append(bboxes[index].tolist())
+            self.avg_speed[tid] = speed if average is None else 0.7 * average + 0.3 * speed
+
+            if speed < Config.ANOMALY_STATIONARY_SPEED:
+                since = self.stopped_since.setdefault(tid, now)
+                if (lane_moving and tid not in self.flagged_stationary
+                        and now - since >= Config.ANOMALY_STATIONARY_SECONDS):
+                    self.flagged_stationary.add(tid)
+                    self.signal_counts['stationary'] += 1
+                    triggered.append(bboxes[index].tolist())
+            else:
+                self.stopped_since.pop(tid, None)
+                self.flagged_stationary.discard(tid)
+
+        # Newly overlapping pairs (queues overlap constantly, so only changes count)
+        pairs = set()
+        if len(track_ids) > 1:
+            ious = np.triu(box_iou(bboxes, bboxes), k=1)
+            for i, j in zip(*np.nonzero(ious >= Config.ANOMALY_OVERLAP_IOU)):
+                pair = (track_ids[i], track_ids[j])
+                pairs.add(pair)
+                if pair not in self.overlapping_pairs:
+                    self.signal_counts['overlap'] += 1
+                    triggered.append([
+                        min(bboxes[i, 0], bboxes[j, 0]), min(bboxes[i, 1], bboxes[j, 1]),
+                        max(bboxes[i, 2], bboxes[j, 2]), max(bboxes[i, 3], bboxes[j, 3])
+                    ])
+        self.overlapping_pairs = pairs
+
+        return triggered
+
+    def _motion_signal(self, frame) -> List[List[float]]:
+        """Region of a sudden jump in frame-difference energy"""
+        small = cv2.cvtColor(cv2.resize(frame, MOTION_SIZE, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        prev, self.prev_small = self.prev_small, small
+        if prev is None:
+            return []
+
+        diff = cv2.absdiff(small, prev)
+        energy = float(diff.mean())
+        average = self.motion_avg
+        self.motion_avg = energy if average == 0.0 else 0.9 * average + 0.1 * energy
+
+        if average == 0.0 or energy < Config.ANOMALY_MOTION_MIN_ENERGY or energy < average * Config.ANOMALY_MOTION_JUMP_RATIO:
+            return []
+
+        ys, xs = np.nonzero(diff > 25)
+        if len(xs) == 0:
+            return []
+
+        self.signal_counts['motion'] += 1
+        scale_x = frame.shape[1] / MOTION_SIZE[0]
+        scale_y = frame.shape[0] / MOTION_SIZE[1]
+        return [[xs.min() * scale_x, ys.min() * scale_y, (xs.max() + 1) * scale_x, (ys.max() + 1) * scale_y]]
+
+    def _expand(self, box, width: int, height: int) -> List[int]:
+        """Grow a box by the crop margin (at least Config.ANOMALY_MIN_CROP pixels) and clip it to the frame"""
+        x1, y1, x2, y2 = box
+        margin_x = max((x2 - x1) * self.crop_margin, (Config.ANOMALY_MIN_CROP - (x2 - x1)) / 2, 0)
+        margin_y = max((y2 - y1) * self.crop_margin, (Config.ANOMALY_MIN_CROP - (y2 - y1)) / 2, 0)
+        return [
+            int(max(0, x1 - margin_x)), int(max(0, y1 - margin_y)),
+            int(min(width, x2 + margin_x)), int(min(height, y2 + margin_y))
+        ]
+
+    @staticmethod
+    def _merge(boxes: List[List[int]]) -> List[List[int]]:
+        """Merge overlapping regions so each area is inferred once"""
+        merged: List[List[int]] = []
+        for box in sorted(boxes):
+            for other in merged:
+                if box[0] < other[2] and box[2] > other[0] and box[1] < other[3] and box[3] > other[1]:
+                    other[:] = [min(box[0], other[0]), min(box[1], other[1]),
+                                max(box[2], other[2]), max(box[3], other[3])]
+                    break
+            else:
+                merged.append(list(box))
+        return merged
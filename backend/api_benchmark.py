@@ -0,0 +1,118 @@
+# api_benchmark.py
+"""
+API load benchmark: throughput and latency as client concurrency grows.
+
+Runs closed-loop clients (each sends its next request when the previous one
+returns) against a running backend for every --concurrency level, cycling
+through a mix of dashboard endpoints. With blocking handlers on the event loop,
+throughput stays flat as concurrency grows; with handlers on the worker thread
+pool it scales until the database or the CPU saturates.
+
+Usage:
+    python api_benchmark.py
+    python api_benchmark.py --concurrency 1 8 32 128 --duration 20 --junction J-002
+    python api_benchmark.py --paths /junctions /alerts
+"""
+
+import argparse
+import threading
+import time
+from typing import Dict, List
+
+import numpy as np
+import requests
+
+DEFAULT_PATHS = [
+    "/junctions",
+    "/junctions/{junction_id}",
+    "/alerts",
+    "/signal-timings/{junction_id}",
+    "/traffic-data-history/{junction_id}?limit=50",
+    "/schedule?junction_id={junction_id}",
+    "/system-stats",
+]
+
+
+def run_level(base_url: str, paths: List[str], concurrency: int, duration: float) -> Dict:
+    """Run `concurrency` clients for `duration` seconds; returns throughput and latency percentiles"""
+    stop = threading.Event()
+    lock = threading.Lock()
+    latencies: List[float] = []
+    counters = {'requests': 0, 'errors': 0}
+
+    def client(offset: int):
+        session = requests.Session()
+        own = []
+        done = errors = 0
+        index = offset
+        while not stop.is_set():
+            url = base_url + paths[index % len(paths)]
+            index += 1
+            started = time.perf_counter()
+            try:
+                ok = session.get(url, timeout=30).status_code < 500
+            except requests.RequestException:
+                ok = False
+            own.append(time.perf_counter() - started)
+            done += 1
+            errors += not ok
+        with lock:
+            latencies.extend(own)
+            counters['requests'] += done
+            counters['errors'] += errors
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    values = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'concurrency': concurrency,
+        'requests': counters['requests'],
+        'errors': counters['errors'],
+        'throughput': counters['requests'] / elapsed,
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+    }
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='API throughput/latency benchmark across concurrency levels')
+    parser.add_argument('--base-url', type=str, default='http://localhost:8000', help='Backend URL')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 64],
+                        help='Concurrent clients per level (default: 1 4 16 64)')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per level (default: 10)')
+    parser.add_argument('--junction', type=str, default='J-001', help='Junction used in the paths (default: J-001)')
+    parser.add_argument('--paths', nargs='+', default=DEFAULT_PATHS,
+                        help='Paths to cycle through ({junction_id} is filled in)')
+    args = parser.parse_args()
+
+    base_url = args.base_url.rstrip('/')
+    paths = [path.format(junction_id=args.junction) for path in args.paths]
+    requests.get(base_url + "/health", timeout=10).raise_for_status()
+
+    results = [run_level(base_url, paths, level, args.duration) for level in args.concurrency]
+
+    baseline = results[0]['throughput'] or 1.0
+    print(f"\n--- {base_url}: {len(paths)} endpoint(s), {args.duration:.0f}s per level ---")
+    print("{:>11} {:>10} {:>9} {:>10} {:>10} {:>10} {:>8}".format(
+        "Concurrency", "Req/s", "Scaling", "p50", "p95", "p99", "Errors"))
+    print("-" * 74)
+    for r in results:
+        print("{:>11} {:>10.1f} {:>8.2f}x {:>8.1f}ms {:>8.1f}ms {:>8.1f}ms {:>8}".format(
+            r['concurrency'], r['throughput'], r['throughput'] / baseline,
+            r['p50_ms'], r['p95_ms'], r['p99_ms'], r['errors']))
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,63 @@
+# backend_metrics.py
+"""
+Process-level load metrics for the API: CPU time and database statements.
+
+Every SQL statement executed on the shared engine is counted and timed via
+engine events, so load tests (controller_fleet_sim.py) can read CPU seconds
+and DB load from /metrics before and after a run and compute rates from the
+difference.
+"""
+
+import os
+import threading
+import time
+from typing import Dict
+
+from sqlalchemy import event
+
+from database import engine
+
+
+class BackendMetrics:
+    """
+    Cumulative CPU and database counters of this process
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.db_statements = 0
+        self.db_seconds = 0.0
+
+    def record_statement(self, seconds: float):
+        with self.lock:
+            self.db_statements += 1
+            self.db_seconds += seconds
+
+    def snapshot(self) -> Dict:
+        """Cumulative counters; rates come from the difference of two snapshots"""
+        times = os.times()
+        with self.lock:
+            db_statements, db_seconds = self.db_statements, self.db_seconds
+        return {
+            'timestamp': round(time.time(), 3),
+            'uptime_seconds': round(time.time() - self.started, 3),
+            'cpu_seconds': round(times.user + times.system, 3),
+            'threads': threading.active_count(),
+            'db_statements': db_statements,
+            'db_seconds': round(db_seconds, 4),
+        }
+
+
+backend_metrics = BackendMetrics()
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('statement_started', []).append(time.perf_counter())
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _end_statement(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['statement_started'].pop()
+    backend_metrics.record_statement(time.perf_counter() - started)
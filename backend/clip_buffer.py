@@ -0,0 +1,297 @@
+# clip_buffer.py
+"""
+Pre/post-event video clips without re-decoding the source.
+
+ClipRecorder is a frame-pipeline head that keeps a bounded ring buffer of
+recent frames, downscaled and JPEG-compressed, so the last few seconds before
+an accident are already in memory. When a clip is requested it is filled with
+the buffered pre-event frames plus the frames that follow, then encoded to a
+video file on a background thread.
+
+Clips are requested when an incident is confirmed, with its first-sighting
+time, so the buffer keeps pre_seconds plus the confirmation delay. One byte
+budget covers the buffer and every clip not yet written (frames shared by the
+buffer and a clip are counted for both, so the budget errs on the safe side);
+under pressure the oldest buffered frames go first, then clips stop growing.
+At most max_pending clips wait for frames or the writer; more are dropped.
+
+For file sources (recordings) there is nothing to buffer: the clip is cut
+straight from the file with ffmpeg stream copy (no re-encode), also off the
+frame loop. The ring buffer is used for live streams, or when ffmpeg is not
+installed.
+"""
+
+import logging
+import os
+import queue
+import shutil
+import subprocess
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Callable, Deque, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config import Config
+
+_STOP = object()
+
+
+class PendingClip:
+    """A clip waiting for its post-event frames"""
+
+    def __init__(self, filepath: Path, end_time: float, frames: List[Tuple[float, bytes]],
+                 on_done: Optional[Callable[[str], None]]):
+        self.filepath = filepath
+        self.end_time = end_time
+        self.frames = frames
+        self.bytes = sum(len(data) for _, data in frames)
+        self.on_done = on_done
+        self.truncated = False  # Stopped taking frames when the memory budget ran out
+
+
+class ClipRecorder:
+    """
+    Ring buffer of recent compressed frames that writes pre/post-event clips
+    """
+
+    def __init__(
+        self,
+        video_source: str,
+        clip_dir: Path,
+        pre_seconds: float = Config.CLIP_PRE_SECONDS,
+        post_seconds: float = Config.CLIP_POST_SECONDS,
+        max_buffer_mb: float = Config.CLIP_BUFFER_MAX_MB,
+        max_pending: int = Config.CLIP_MAX_PENDING,
+        confirm_delay: float = Config.CLIP_CONFIRM_DELAY_SECONDS,
+        buffer_fps: float = Config.CLIP_BUFFER_FPS,
+        scale: float = Config.CLIP_SCALE,
+        jpeg_quality: int = Config.CLIP_JPEG_QUALITY
+    ):
+        """
+        Initialize the recorder
+
+        Args:
+            video_source: Video file path or stream URL the frames come from
+            clip_dir: Directory clips are written to
+            pre_seconds: Seconds of video kept before an event
+            post_seconds: Seconds of video recorded after an event
+            max_buffer_mb: Memory cap for the ring buffer plus all clips not yet written
+            max_pending: Clips waiting for post-event frames or the writer thread
+            confirm_delay: Seconds between an event and its clip request; buffered on top of pre_seconds
+            buffer_fps: Frame rate kept in the buffer (frames in between are skipped)
+            scale: Downscale factor applied before compression
+            jpeg_quality: JPEG quality of buffered frames (0-100)
+        """
+        self.video_source = video_source
+        self.clip_dir = Path(clip_dir)
+        self.clip_dir.mkdir(parents=True, exist_ok=True)
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.max_bytes = int(max_buffer_mb * 1024 * 1024)
+        self.max_pending = max(1, max_pending)
+        self.retain_seconds = pre_seconds + max(0.0, confirm_delay)
+        self.buffer_fps = buffer_fps
+        self.scale = scale
+        self.jpeg_quality = jpeg_quality
+
+        # Recordings are cut with ffmpeg stream copy; live streams use the ring buffer
+        self.ffmpeg = shutil.which('ffmpeg')
+        self.stream_copy = bool(self.ffmpeg) and os.path.isfile(video_source)
+
+        self.buffer: Deque[Tuple[float, bytes]] = deque()
+        self.buffer_bytes = 0
+        self.last_slot: Optional[int] = None  # Buffer at most one frame per 1/buffer_fps interval
+        self.pending: List[PendingClip] = []
+
+        # Clips requested but not yet written, and the frame bytes they hold (shared with the writer thread)
+        self.clip_lock = threading.Lock()
+        self.active_clips = 0
+        self.clip_bytes = 0
+
+        # Never fills: at most max_pending clips are active, plus the stop marker
+        self.jobs: queue.Queue = queue.Queue(maxsize=self.max_pending + 1)
+        self.thread = threading.Thread(target=self._run, name="clip-writer", daemon=True)
+        self.thread.start()
+
+        self.clips_written = 0
+        self.clips_failed = 0
+        self.clips_dropped = 0
+        self.clips_truncated = 0
+
+        mode = "ffmpeg stream copy" if self.stream_copy else f"ring buffer ({max_buffer_mb} MB cap, {buffer_fps} FPS)"
+        logging.info(f"ClipRecorder initialized: {pre_seconds}s before / {post_seconds}s after, {mode}")
+
+    def process_frame(self, frame, clock):
+        """Buffer the frame and complete clips whose post-event window has passed (frame-pipeline head)"""
+        if self.stream_copy:
+            return
+
+        now = clock.elapsed
+        slot = int(now * self.buffer_fps)
+        if slot != self.last_slot:
+            self.last_slot = slot
+            entry = (now, self._compress(frame))
+            self._append(entry)
+            for clip in self.pending:
+                if clip.truncated:
+                    continue
+                if self.buffer_bytes + self.clip_bytes + len(entry[1]) > self.max_bytes:
+                    clip.truncated = True
+                    self.clips_truncated += 1
+                    logging.warning(f"Clip memory budget reached, {clip.filepath.name} ends at {now:.1f}s")
+                    continue
+                clip.frames.append(entry)
+                clip.bytes += len(entry[1])
+                with self.clip_lock:
+                    self.clip_bytes += len(entry[1])
+
+        if self.pending:
+            ready = [clip for clip in self.pending if now >= clip.end_time]
+            if ready:
+                self.pending = [clip for clip in self.pending if clip not in ready]
+                for clip in ready:
+                    self.jobs.put(('encode', clip))
+
+    def request_clip(self, name: str, event_time: float, on_done: Optional[Callable[[str], None]] = None) -> str:
+        """
+        Request a clip around an event
+
+        Args:
+            name: Clip file name without extension
+            event_time: Event time in seconds on the video timeline (clock.elapsed)
+            on_done: Called from the writer thread with the clip path once written
+
+        Returns:
+            Path the clip will be written to
+        """
+        filepath = self.clip_dir / f"{name}.mp4"
+        start = max(0.0, event_time - self.pre_seconds)
+
+        with self.clip_lock:
+            if self.active_clips >= self.max_pending:
+                self.clips_dropped += 1
+                logging.warning(f"Clip dropped: {filepath.name} ({self.active_clips} clips already in progress)")
+                return str(filepath)
+            self.active_clips += 1
+
+        if self.stream_copy:
+            self.jobs.put(('extract', (filepath, start, event_time + self.post_seconds - start, on_done)))
+        else:
+            frames = [entry for entry in self.buffer if entry[0] >= start]
+            if self.buffer and self.buffer[0][0] > start:
+                logging.debug(f"Clip {filepath.name}: buffer starts at {self.buffer[0][0]:.1f}s, after {start:.1f}s")
+            clip = PendingClip(filepath, event_time + self.post_seconds, frames, on_done)
+            with self.clip_lock:
+                self.clip_bytes += clip.bytes
+            self.pending.append(clip)
+            self._evict(0.0)
+
+        logging.info(f"Clip requested: {filepath.name} ({start:.1f}s - {event_time + self.post_seconds:.1f}s)")
+        return str(filepath)
+
+    def finish(self, clock=None):
+        """Write clips still waiting for post-event frames and stop the writer thread (frame-pipeline head)"""
+        if not self.thread.is_alive():
+            return
+
+        for clip in self.pending:
+            self.jobs.put(('encode', clip))
+        self.pending = []
+        self.buffer.clear()
+        self.buffer_bytes = 0
+
+        self.jobs.put(_STOP)
+        self.thread.join()
+        logging.info(f"ClipRecorder finished: {self.clips_written} clip(s) written, {self.clips_failed} failed, "
+                     f"{self.clips_dropped} dropped, {self.clips_truncated} truncated")
+
+    def _compress(self, frame) -> bytes:
+        if self.scale != 1.0:
+            frame = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        _, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        return encoded.tobytes()
+
+    def _append(self, entry: Tuple[float, bytes]):
+        """Add a frame and evict old ones beyond the retention window or the memory budget"""
+        self.buffer.append(entry)
+        self.buffer_bytes += len(entry[1])
+
+        self._evict(entry[0] - self.retain_seconds)
+
+    def _evict(self, oldest_needed: float):
+        """Drop buffered frames older than oldest_needed, then the oldest ones while over the memory budget"""
+        while self.buffer and (self.buffer[0][0] < oldest_needed or
+                               self.buffer_bytes + self.clip_bytes > self.max_bytes):
+            _, data = self.buffer.popleft()
+            self.buffer_bytes -= len(data)
+
+    def _run(self):
+        """Writer thread: encode buffered clips or cut clips from the source file"""
+        while True:
+            job = self.jobs.get()
+            if job is _STOP:
+                break
+            action, payload = job
+            try:
+                if action == 'encode':
+                    filepath, on_done = self._encode(payload), payload.on_done
+                else:
+                    filepath, on_done = self._extract(*payload[:3]), payload[3]
+            except Exception as e:
+                self.clips_failed += 1
+                logging.error(f"Error writing clip: {e}")
+                continue
+            finally:
+                self._release(payload if action == 'encode' else None)
+
+            if filepath is None:
+                self.clips_failed += 1
+                continue
+            self.clips_written += 1
+            logging.info(f"Clip saved: {filepath}")
+            if on_done:
+                on_done(str(filepath))
+
+    def _release(self, clip: Optional[PendingClip]):
+        """A clip job is done: free its slot and its share of the memory budget"""
+        with self.clip_lock:
+            self.active_clips -= 1
+            if clip is not None:
+                self.clip_bytes -= clip.bytes
+        if clip is not None:
+            clip.frames = []
+
+    def _encode(self, clip: PendingClip) -> Optional[Path]:
+        """Decode the buffered JPEGs and write them as a video"""
+        if not clip.frames:
+            logging.warning(f"No buffered frames for clip {clip.filepath.name}")
+            return None
+
+        first = cv2.imdecode(np.frombuffer(clip.frames[0][1], np.uint8), cv2.IMREAD_COLOR)
+        height, width = first.shape[:2]
+        duration = clip.frames[-1][0] - clip.frames[0][0]
+        fps = (len(clip.frames) - 1) / duration if duration > 0 else self.buffer_fps
+
+        writer = cv2.VideoWriter(str(clip.filepath), cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+        try:
+            for _, data in clip.frames:
+                writer.write(cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR))
+        finally:
+            writer.release()
+        return clip.filepath
+
+    def _extract(self, filepath: Path, start: float, duration: float) -> Optional[Path]:
+        """Cut a clip from the source file without re-encoding"""
+        command = [
+            self.ffmpeg, '-y', '-loglevel', 'error',
+            '-ss', f"{start:.3f}", '-i', self.video_source, '-t', f"{duration:.3f}",
+            '-c', 'copy', '-an', '-avoid_negative_ts', 'make_zero', str(filepath)
+        ]
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            logging.error(f"ffmpeg clip extraction failed: {result.stderr.strip()}")
+            return None
+        return filepath
@@ -61,6 +61,108 @@ class Config:
     # Tracking Settings (placeholders, will be used by a tracking module)
     MAX_TRACK_AGE: int = 30 # Number of frames a track can be 'lost' before being deleted
     MIN_HITS: int = 3      # Minimum number of detections required to establish a track
+    MAX_TRACK_ID: int = 1_000_000  # Track IDs wrap around after this value (IDs still in use are skipped)
+
+    # Count Streaming Settings
+    COUNT_BUCKET_SECONDS: int = 60     # Length of each traffic_data count bucket (video time)
+    COUNT_FLUSH_BATCH_SIZE: int = 10   # Closed buckets collected before one batched DB write...
+    COUNT_FLUSH_INTERVAL_SECONDS: float = 60.0  # ...or written this long after the first one closed; also the retry delay (video time)
+    COUNT_MAX_PENDING_BUCKETS: int = 1440  # Unwritten buckets kept while writes fail; the oldest are dropped (logged)
+
+    # Frame Pipeline Settings
+    ACCIDENT_MODEL: str = "best.pt"    # Accident detection model weights
+    ACCIDENT_CONFIDENCE_THRESHOLD: float = 0.75
+    ACCIDENT_EVERY_N_FRAMES: int = 3   # Cadence of the accident head in the shared pipeline
+    ACCIDENT_BATCH_SIZE: int = 8       # Max crops per accident model call (multi-source monitor)
+
+    # Accident Incident Settings
+    INCIDENT_IOU_THRESHOLD: float = 0.3        # Min IoU to merge a detection into an open incident
+    INCIDENT_MAX_GAP_SECONDS: float = 10.0     # Close an incident after this long unseen (video time)
+    INCIDENT_UPDATE_MIN_GAIN: float = 0.05     # Confidence gain that triggers an incident record update
+    INCIDENT_CONFIRM_HITS: int = 3             # K: detections needed to confirm an incident...
+    INCIDENT_CONFIRM_WINDOW: int = 5           # M: ...within this many model evaluations of its region
+
+    # Evidence Writer Settings
+    EVIDENCE_QUEUE_SIZE: int = 32              # Max pending evidence jobs (each holds one raw frame)
+    EVIDENCE_ENQUEUE_TIMEOUT: float = 2.0      # Seconds a new incident waits for queue space before dropping
+    EVIDENCE_MAX_RETRIES: int = 3              # Attempts per evidence job (image write + DB record)
+    EVIDENCE_JPEG_QUALITY: int = 90
+    EVIDENCE_MAX_TRACKED_INCIDENTS: int = 256  # Incidents whose record ID the writer keeps for later updates
+    EVIDENCE_THUMBNAIL_SIZE: int = 320         # Longest side of list-view thumbnails (pixels)
+    EVIDENCE_THUMBNAIL_QUALITY: int = 70
+    EVIDENCE_RETENTION_DAYS: int = 30          # Compact resolved/false-positive evidence after this many days
+    EVIDENCE_COMPACT_MAX_SIDE: int = 640       # Longest side of compacted evidence images
+    EVIDENCE_COMPACT_QUALITY: int = 60
+
+    # Accident Clip Settings
+    CLIP_PRE_SECONDS: float = 5.0      # Video kept before an incident
+    CLIP_POST_SECONDS: float = 5.0     # Video recorded after an incident
+    CLIP_BUFFER_MAX_MB: float = 64.0   # Memory cap per camera for the ring buffer plus clips in progress (live streams)
+    CLIP_MAX_PENDING: int = 4          # Clips per camera waiting for frames or being written; more are dropped
+    CLIP_CONFIRM_DELAY_SECONDS: float = 10.0  # Extra seconds buffered for first sighting -> confirmation
+    CLIP_BUFFER_FPS: float = 10.0      # Frame rate kept in the ring buffer
+    CLIP_SCALE: float = 0.5            # Downscale factor for buffered frames
+    CLIP_JPEG_QUALITY: int = 80
+
+    # Accident Anomaly Trigger Settings
+    ANOMALY_FALLBACK_SECONDS: float = 2.0     # Full-frame accident check at least this often (video time)
+    ANOMALY_HOLD_SECONDS: float = 3.0         # Keep checking a triggered region for this long
+    ANOMALY_CROP_MARGIN: float = 0.5          # Margin around triggered boxes (fraction of box size)
+    ANOMALY_MIN_CROP: int = 320               # Minimum crop side in pixels, for context around the vehicles
+    ANOMALY_MIN_MOVING_SPEED: float = 4.0     # Track speed (px per counting step) that counts as moving
+    ANOMALY_SUDDEN_STOP_RATIO: float = 0.3    # Speed drop below this fraction of the average is a sudden stop
+    ANOMALY_STATIONARY_SPEED: float = 1.0     # Track speed below this counts as stopped
+    ANOMALY_STATIONARY_SECONDS: float = 5.0   # Stopped this long while the lane moves triggers a check
+    ANOMALY_OVERLAP_IOU: float = 0.25         # IoU at which two vehicle boxes count as overlapping
+    ANOMALY_MOTION_JUMP_RATIO: float = 3.0    # Frame-difference energy vs. its average that triggers a check
+    ANOMALY_MOTION_MIN_ENERGY: float = 4.0    # Ignore motion jumps below this mean absolute difference
+
+    # Schedule Cache Settings
+    SCHEDULE_CACHE_TTL_SECONDS: float = 30.0  # Max age of a cached schedule (bounds staleness from other processes' writes)
+
+    # Demand Forecast Settings (Holt smoothing with time-of-day seasonality, per junction phase)
+    FORECAST_ALPHA: float = 0.1          # Level smoothing
+    FORECAST_BETA: float = 0.05          # Trend smoothing
+    FORECAST_GAMMA: float = 0.3          # Seasonal smoothing
+    FORECAST_TREND_DAMPING: float = 0.9  # Trend damping per observation (1.0 = undamped)
+    FORECAST_SLOT_MINUTES: int = 60      # Length of a time-of-day season slot
+    FORECAST_MIN_SAMPLES: int = 3        # Observations needed before the forecast replaces the latest count
+
+    # Signal Optimizer Settings (schedule method 'optimize')
+    OPTIMIZER_MIN_CYCLE: float = 30.0          # Shortest candidate cycle (seconds)
+    OPTIMIZER_MAX_CYCLE: float = 180.0         # Longest candidate cycle (seconds)
+    OPTIMIZER_CYCLE_STEP: float = 5.0          # Cycle candidate spacing (seconds)
+    OPTIMIZER_MIN_GREEN: float = 7.0           # Minimum green of a phase with demand (seconds)
+    OPTIMIZER_MAX_GREEN: float = 150.0         # Maximum green of a phase (seconds)
+    OPTIMIZER_ANALYSIS_SECONDS: float = 900.0  # Period over which oversaturation delay is counted
+
+    # Green Wave Settings
+    GREEN_WAVE_SPEED_KMH: float = 40.0  # Progression speed for offsets between adjacent junctions
+
+    # Emergency Corridor Settings
+    CORRIDOR_SPEED_KMH: float = 50.0             # Emergency vehicle speed for arrival times
+    CORRIDOR_PREEMPT_LEAD_SECONDS: float = 20.0  # Switch a signal to green this long before arrival
+    CORRIDOR_RELEASE_AFTER_SECONDS: float = 10.0 # Return a signal to normal this long after arrival
+    CORRIDOR_CACHE_SIZE: int = 256               # Planned paths kept in the LRU
+
+    # Schedule Timeline Settings
+    TIMELINE_ENABLED: bool = True            # Run the timeline daemon with the API
+    TIMELINE_CYCLES: int = 10                # Upcoming cycles kept per junction
+    TIMELINE_REFRESH_SECONDS: float = 1.0    # Daemon tick interval
+
+    # Control Daemon Settings
+    CONTROL_LEAD_SECONDS: float = 2.0            # Recompute a junction's schedule this long before its cycle starts
+    CONTROL_DEADLINE_SECONDS: float = 1.0        # Compute budget per batch; late batches keep the previous timing
+    CONTROL_POLL_SECONDS: float = 1.0            # Interval for polling traffic_data for new counts
+    CONTROL_WRITE_BATCH_SECONDS: float = 10.0    # Interval for writing applied timings to signal_timings
+    CONTROL_PUSH_WORKERS: int = 8                # Concurrent pushes to controllers
+    CONTROL_PUSH_URL: str = None                 # Controller endpoint, e.g. "http://{junction_id}.signals.local/timing"
+    CONTROL_PUSH_TIMEOUT_SECONDS: float = 2.0    # Timeout of one push
+    CONTROL_REPORT_SECONDS: float = 60.0         # Interval for logging loop metrics
+    CONTROLLER_STALE_SECONDS: float = 30.0       # Controllers silent for longer count as stale in /controllers/state
+
+    # API Concurrency Settings
+    API_THREADPOOL_SIZE: int = 40  # Worker threads for blocking handlers (<= DB_POOL_SIZE + DB_MAX_OVERFLOW)
 
 # Configure logging early based on Config settings
 logging.basicConfig(level=Config.LOG_LEVEL, format='%(asctime)s - %(levelname)s - %(message)s',
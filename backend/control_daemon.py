@@ -0,0 +1,508 @@
+# control_daemon.py
+"""
+Closed-loop adaptive signal control daemon.
+
+Closes the loop from counts to timings without manual /schedule calls:
+
+    traffic_data rows --> recompute the schedule before every cycle --> push to the
+    junction's controller --> record the applied timing in signal_timings
+
+New count buckets are picked up by polling traffic_data past the last seen id
+(cheap on the primary key; covers prototype_headless.py running in other
+processes), and immediately from commits made in this process via the
+schedule cache invalidation listener.
+
+Each junction runs its own cycle. Config.CONTROL_LEAD_SECONDS before a cycle
+starts, the schedules of all junctions due together are recomputed in one
+traffic_cycle.calculate_schedules batch. The batch must finish within
+Config.CONTROL_DEADLINE_SECONDS; if it does not (or fails), the junctions
+keep their previous timing for that cycle and a deadline miss is counted.
+Applied timings are pushed on a worker pool, so a slow controller never holds
+up the loop, and written to signal_timings (one non-default row per phase,
+updated in place) in batches every Config.CONTROL_WRITE_BATCH_SECONDS.
+
+The reported latency is counts-to-applied-timing: from the creation of the
+oldest count row not yet reflected in an applied timing to the start of the
+cycle that applies it.
+
+Usage:
+    python control_daemon.py --simulate
+    python control_daemon.py --junctions J-001 J-002 --method optimize
+"""
+
+import argparse
+import logging
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+import requests
+from sqlalchemy import func
+
+import traffic_cycle
+from config import Config
+from database import SessionLocal
+from models import SignalPhase, SignalTiming, TrafficData
+from schedule_cache import schedule_cache
+from schedule_timeline import build_cycle
+
+
+def to_epoch(value: Optional[datetime]) -> Optional[float]:
+    """Epoch seconds of a database timestamp (naive values are UTC, as written by func.now())"""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class LatencyWindow:
+    """
+    Percentiles over the most recent samples
+    """
+
+    def __init__(self, size: int = 1000):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def summary(self) -> Dict:
+        """{'count', 'mean', 'p50', 'p95', 'p99', 'max'} in seconds (window of recent samples)"""
+        if not self.samples:
+            return {'count': self.count, 'mean': None, 'p50': None, 'p95': None, 'p99': None, 'max': None}
+        values = np.fromiter(self.samples, dtype=np.float64)
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        return {'count': self.count, 'mean': round(float(values.mean()), 3), 'p50': round(float(p50), 3),
+                'p95': round(float(p95), 3), 'p99': round(float(p99), 3), 'max': round(float(values.max()), 3)}
+
+
+# --- Controller links ---
+
+class ControllerLink(ABC):
+    """
+    Transport that delivers applied timings to junction controllers
+    """
+
+    @abstractmethod
+    def push(self, command: Dict):
+        """
+        Deliver one command: {'junction_id', 'cycle' (build_cycle layout), 'schedule', 'issued_at'}
+
+        Raises on delivery failure.
+        """
+
+
+class HttpControllerLink(ControllerLink):
+    """
+    POSTs commands as JSON to a per-junction URL (Config.CONTROL_PUSH_URL, '{junction_id}' is filled in)
+    """
+
+    def __init__(self, url_template: str, timeout: float = Config.CONTROL_PUSH_TIMEOUT_SECONDS):
+        self.url_template = url_template
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def push(self, command: Dict):
+        response = self.session.post(self.url_template.format(junction_id=command['junction_id']),
+                                     json=command, timeout=self.timeout)
+        response.raise_for_status()
+
+
+class SimulatedController(ControllerLink):
+    """
+    Local stand-in for junction controllers, for testing the loop without hardware
+
+    Keeps the last command per junction and answers which light each phase shows.
+    Optional delivery delay and failure rate exercise the daemon's error paths.
+    """
+
+    def __init__(self, delay_seconds: float = 0.0, failure_rate: float = 0.0, seed: Optional[int] = None):
+        self.delay_seconds = delay_seconds
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.commands: Dict[str, Dict] = {}
+        self.received = 0
+        self.failed = 0
+
+    def push(self, command: Dict):
+        if self.delay_seconds > 0:
+            time.sleep(self.delay_seconds)
+        with self.lock:
+            if self.failure_rate > 0 and self.random.random() < self.failure_rate:
+                self.failed += 1
+                raise ConnectionError(f"Simulated controller {command['junction_id']} unreachable")
+            self.commands[command['junction_id']] = command
+            self.received += 1
+
+    def lights(self, junction_id: str, at: Optional[float] = None) -> Optional[Dict[int, str]]:
+        """Light shown per phase ('green', 'yellow', 'red') at a time, from the last command"""
+        with self.lock:
+            command = self.commands.get(junction_id)
+        if command is None:
+            return None
+        at = time.time() if at is None else at
+        lights = {}
+        for phase in command['cycle']['phases']:
+            start = phase['green_start']
+            if start is not None and start <= at < phase['yellow_start']:
+                lights[phase['phase']] = 'green'
+            elif start is not None and phase['yellow_start'] <= at < phase['red_start']:
+                lights[phase['phase']] = 'yellow'
+            else:
+                lights[phase['phase']] = 'red'
+        return lights
+
+
+# --- Daemon ---
+
+class ControlDaemon:
+    """
+    Per-junction cycle loop: recompute before each cycle, push, record
+    """
+
+    def __init__(self, link: Optional[ControllerLink] = None, junction_ids: Optional[List[str]] = None,
+                 demand: str = 'latest', method: str = 'formula',
+                 lead_seconds: float = Config.CONTROL_LEAD_SECONDS,
+                 deadline_seconds: float = Config.CONTROL_DEADLINE_SECONDS,
+                 poll_seconds: float = Config.CONTROL_POLL_SECONDS,
+                 write_batch_seconds: float = Config.CONTROL_WRITE_BATCH_SECONDS,
+                 push_workers: int = Config.CONTROL_PUSH_WORKERS):
+        """
+        Initialize the daemon
+
+        Args:
+            link: Controller transport (default: none, timings are only recorded)
+            junction_ids: Junctions to control (default: every junction with signal phases)
+            demand: 'latest' or 'forecast' (see traffic_cycle.calculate_schedules)
+            method: 'formula' or 'optimize'
+            lead_seconds: Recompute this long before a cycle starts
+            deadline_seconds: Compute budget per batch; late batches fall back to the previous timing
+            poll_seconds: Interval for polling traffic_data for new counts
+            write_batch_seconds: Interval for writing applied timings to signal_timings
+            push_workers: Concurrent controller pushes
+        """
+        if demand not in traffic_cycle.DEMAND_MODES:
+            raise ValueError(f"Unknown demand mode '{demand}'")
+        if method not in traffic_cycle.METHODS:
+            raise ValueError(f"Unknown method '{method}'")
+        self.link = link
+        self.junction_filter = set(junction_ids) if junction_ids else None
+        self.demand = demand
+        self.method = method
+        self.lead_seconds = lead_seconds
+        self.deadline_seconds = deadline_seconds
+        self.poll_seconds = poll_seconds
+        self.write_batch_seconds = write_batch_seconds
+
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.wake = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.compute_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="control-compute")
+        self.push_pool = ThreadPoolExecutor(max_workers=max(1, push_workers), thread_name_prefix="control-push")
+        self.inflight = None                         # Compute batch that missed its deadline
+
+        self.next_cycle: Dict[str, float] = {}       # junction_id -> epoch start of its next cycle
+        self.applied: Dict[str, List[Dict]] = {}     # junction_id -> schedule of the current cycle
+        self.pending_since: Dict[str, float] = {}    # junction_id -> creation time of oldest unapplied count
+        self.notified = set()                        # Junctions invalidated by commits in this process
+        self.pending_writes: Dict[str, List[Dict]] = {}
+        self.last_count_id = 0
+        self.last_write = time.monotonic()
+
+        self.latency = LatencyWindow()
+        self.compute_time = LatencyWindow()
+        self.counters = {'cycles': 0, 'recomputed': 0, 'deadline_misses': 0, 'compute_errors': 0,
+                         'pushes': 0, 'push_errors': 0, 'timings_written': 0, 'write_errors': 0}
+
+    # --- Public API ---
+
+    def start(self):
+        """Start the control loop thread"""
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        schedule_cache.add_invalidation_listener(self.notify)
+        self.thread = threading.Thread(target=self.run, name="control-daemon", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Stop the loop, write outstanding timings and wait for pushes"""
+        self.stop_event.set()
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+        self.push_pool.shutdown(wait=True)
+        self.compute_pool.shutdown(wait=False)
+
+    def notify(self, junction_ids):
+        """New counts or phase changes committed in this process"""
+        with self.lock:
+            self.notified.update(junction_ids)
+        self.wake.set()
+
+    def stats(self) -> Dict:
+        """Loop counters, compute time and counts-to-applied-timing latency"""
+        with self.lock:
+            return {
+                'junctions': len(self.next_cycle),
+                **self.counters,
+                'compute_seconds': self.compute_time.summary(),
+                'counts_to_applied_seconds': self.latency.summary(),
+            }
+
+    # --- Loop ---
+
+    def run(self):
+        """Control loop (blocks until stop())"""
+        self._discover()
+        logging.info(f"Control daemon running for {len(self.next_cycle)} junction(s) "
+                     f"(demand={self.demand}, method={self.method}, deadline={self.deadline_seconds}s)")
+        last_poll = 0.0
+        while not self.stop_event.is_set():
+            now = time.time()
+            poll = now - last_poll >= self.poll_seconds
+            if poll:
+                last_poll = now
+            self.tick(now, poll=poll)
+
+            upcoming = min(self.next_cycle.values(), default=now + self.poll_seconds) - self.lead_seconds
+            self.wake.wait(max(0.0, min(upcoming, last_poll + self.poll_seconds) - time.time()))
+            self.wake.clear()
+        self._write_timings()
+
+    def tick(self, now: Optional[float] = None, poll: bool = True) -> List[str]:
+        """
+        One loop iteration without waiting
+
+        Returns:
+            Junctions whose next cycle was applied
+        """
+        now = time.time() if now is None else now
+        if poll:
+            self._poll_counts()
+        self._take_notifications(now)
+
+        due = [j for j, start in self.next_cycle.items() if start - now <= self.lead_seconds]
+        if due:
+            self._run_cycles(due, now)
+        if time.monotonic() - self.last_write >= self.write_batch_seconds:
+            self._write_timings()
+        return due
+
+    def _discover(self, now: Optional[float] = None):
+        """Junctions with signal phases; the first cycle starts one lead time from now"""
+        now = time.time() if now is None else now
+        db = SessionLocal()
+        try:
+            junction_ids = [row[0] for row in db.query(SignalPhase.junction_id).distinct()]
+            self.last_count_id = db.query(func.max(TrafficData.id)).scalar() or 0
+        finally:
+            db.close()
+        for junction_id in junction_ids:
+            if self.junction_filter is None or junction_id in self.junction_filter:
+                self.next_cycle.setdefault(junction_id, now + self.lead_seconds)
+
+    def _poll_counts(self):
+        """New traffic_data rows since the last poll, grouped per junction"""
+        db = SessionLocal()
+        try:
+            rows = db.query(
+                TrafficData.junction_id, func.max(TrafficData.id), func.min(TrafficData.created_at)
+            ).filter(TrafficData.id > self.last_count_id).group_by(TrafficData.junction_id).all()
+        finally:
+            db.close()
+
+        now = time.time()
+        for junction_id, max_id, first_created in rows:
+            self.last_count_id = max(self.last_count_id, max_id)
+            if self.junction_filter is not None and junction_id not in self.junction_filter:
+                continue
+            created = min(to_epoch(first_created) or now, now)
+            self.pending_since.setdefault(junction_id, created)
+            self.next_cycle.setdefault(junction_id, now + self.lead_seconds)
+
+    def _take_notifications(self, now: float):
+        with self.lock:
+            notified, self.notified = self.notified, set()
+        for junction_id in notified:
+            if self.junction_filter is None or junction_id in self.junction_filter:
+                self.pending_since.setdefault(junction_id, now)
+                self.next_cycle.setdefault(junction_id, now + self.lead_seconds)
+
+    def _run_cycles(self, due: List[str], now: Optional[float] = None):
+        """Recompute the due junctions within the deadline, then apply and push their next cycle"""
+        started = time.perf_counter()
+        schedules = self._compute(due)
+        compute_seconds = time.perf_counter() - started
+        now = time.time() if now is None else now
+
+        with self.lock:
+            self.compute_time.add(compute_seconds)
+            if schedules is not None:
+                self.counters['recomputed'] += len(due)
+
+        for junction_id in due:
+            fresh = schedules is not None and junction_id in schedules
+            if schedules is not None and not fresh:
+                # Phases removed since discovery
+                self.next_cycle.pop(junction_id, None)
+                self.applied.pop(junction_id, None)
+                self.pending_since.pop(junction_id, None)
+                continue
+            schedule = schedules[junction_id] if fresh else self.applied.get(junction_id)
+            start = max(self.next_cycle[junction_id], now)
+            if schedule is None:
+                # Nothing to fall back on yet: try again next lead time
+                self.next_cycle[junction_id] = now + self.lead_seconds
+                continue
+
+            cycle = build_cycle(schedule, start)
+            self.next_cycle[junction_id] = cycle['end']
+            self.applied[junction_id] = schedule
+            self.pending_writes[junction_id] = schedule
+            with self.lock:
+                self.counters['cycles'] += 1
+                if fresh and junction_id in self.pending_since:
+                    self.latency.add(start - self.pending_since.pop(junction_id))
+
+            if self.link is not None:
+                command = {'junction_id': junction_id, 'cycle': cycle, 'schedule': schedule,
+                           'issued_at': round(time.time(), 3)}
+                self.push_pool.submit(self._push, command)
+
+    def _compute(self, due: List[str]) -> Optional[Dict[str, List[Dict]]]:
+        """Schedules of the due junctions, or None when the batch misses its deadline or fails"""
+        if self.inflight is not None:
+            if not self.inflight.done():
+                # Previous batch still running: don't pile up work behind it
+                with self.lock:
+                    self.counters['deadline_misses'] += len(due)
+                return None
+            self.inflight = None
+
+        future = self.compute_pool.submit(
+            traffic_cycle.calculate_schedules, due, None, self.demand, self.method)
+        try:
+            return future.result(timeout=self.deadline_seconds)
+        except FutureTimeout:
+            self.inflight = future
+            with self.lock:
+                self.counters['deadline_misses'] += len(due)
+            logging.warning(f"Schedule batch for {len(due)} junction(s) missed the "
+                            f"{self.deadline_seconds}s deadline; keeping previous timings")
+        except Exception as e:
+            with self.lock:
+                self.counters['compute_errors'] += 1
+            logging.error(f"Schedule batch failed; keeping previous timings: {e}")
+        return None
+
+    def _push(self, command: Dict):
+        try:
+            self.link.push(command)
+            with self.lock:
+                self.counters['pushes'] += 1
+        except Exception as e:
+            with self.lock:
+                self.counters['push_errors'] += 1
+            logging.warning(f"Push to controller {command['junction_id']} failed: {e}")
+
+    def _write_timings(self):
+        """Upsert the latest applied timing per phase as non-default signal_timings rows, in one transaction"""
+        self.last_write = time.monotonic()
+        if not self.pending_writes:
+            return
+        pending, self.pending_writes = self.pending_writes, {}
+
+        db = SessionLocal()
+        try:
+            existing = {}
+            for timing in db.query(SignalTiming).filter(
+                    SignalTiming.junction_id.in_(list(pending)), SignalTiming.is_default == False
+            ).order_by(SignalTiming.id):
+                existing[(timing.junction_id, timing.phase)] = timing
+
+            written = 0
+            for junction_id, schedule in pending.items():
+                for row in schedule:
+                    key = (junction_id, row['traffic_light_no'])
+                    values = {'green_time': int(round(row['G'])), 'yellow_time': int(round(row['Y'])),
+                              'red_time': int(round(row['R']))}
+                    timing = existing.get(key)
+                    if timing is None:
+                        db.add(SignalTiming(junction_id=junction_id, phase=key[1], is_default=False, **values))
+                    else:
+                        for name, value in values.items():
+                            setattr(timing, name, value)
+                    written += 1
+            db.commit()
+            with self.lock:
+                self.counters['timings_written'] += written
+        except Exception as e:
+            db.rollback()
+            with self.lock:
+                self.counters['write_errors'] += 1
+            logging.error(f"Writing applied signal timings failed: {e}")
+            # Keep them for the next batch unless newer timings were applied meanwhile
+            for junction_id, schedule in pending.items():
+                self.pending_writes.setdefault(junction_id, schedule)
+        finally:
+            db.close()
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Closed-loop adaptive signal control daemon')
+    parser.add_argument('--junctions', nargs='+', default=None,
+                        help='Junction IDs to control (default: every junction with signal phases)')
+    parser.add_argument('--demand', choices=traffic_cycle.DEMAND_MODES, default='latest',
+                        help='Counts to schedule from (default: latest)')
+    parser.add_argument('--method', choices=traffic_cycle.METHODS, default='formula',
+                        help='Schedule calculation (default: formula)')
+    parser.add_argument('--deadline', type=float, default=Config.CONTROL_DEADLINE_SECONDS,
+                        help=f'Compute budget per batch in seconds (default: {Config.CONTROL_DEADLINE_SECONDS})')
+    parser.add_argument('--simulate', action='store_true',
+                        help='Push to local simulated controllers instead of Config.CONTROL_PUSH_URL')
+    parser.add_argument('--report-every', type=float, default=Config.CONTROL_REPORT_SECONDS,
+                        help=f'Seconds between metric reports (default: {Config.CONTROL_REPORT_SECONDS})')
+    args = parser.parse_args()
+
+    if args.simulate:
+        link = SimulatedController()
+    elif Config.CONTROL_PUSH_URL:
+        link = HttpControllerLink(Config.CONTROL_PUSH_URL)
+    else:
+        link = None
+        logging.info("No CONTROL_PUSH_URL configured: timings are recorded but not pushed")
+
+    daemon = ControlDaemon(link, args.junctions, demand=args.demand, method=args.method,
+                           deadline_seconds=args.deadline)
+    daemon.start()
+    try:
+        while True:
+            time.sleep(args.report_every)
+            stats = daemon.stats()
+            latency = stats['counts_to_applied_seconds']
+            logging.info(f"Control: {stats['cycles']} cycles, {stats['deadline_misses']} deadline misses, "
+                         f"{stats['push_errors']} push errors; counts-to-applied p50={latency['p50']}s "
+                         f"p95={latency['p95']}s max={latency['max']}s")
+    except KeyboardInterrupt:
+        logging.info("Stopping control daemon...")
+    finally:
+        daemon.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,422 @@
+# controller_fleet_sim.py
+"""
+Simulated signal-controller fleet for end-to-end control latency testing.
+
+Spins up thousands of virtual junction controllers against a running backend,
+without hardware. Each controller:
+
+    - pulls its timeline from /timeline/{junction_id} every --fetch-interval
+      seconds (If-None-Match, so unchanged timelines cost a 304),
+    - executes the buffered cycles on the wall clock (the phase and light it
+      would show; 'fallback' when its buffer has run out),
+    - reports its state to /controllers/{junction_id}/state every
+      --report-interval seconds.
+
+Controllers are multiplexed over --workers threads. Meanwhile an injector posts
+random count records to /traffic-data-record at --inject-rate per second. The
+end-to-end propagation latency is measured from posting a count to the first
+fetch of that junction's timeline generated after it.
+
+For each controller count given, the harness runs a warm-up, then measures for
+--duration seconds and reads /metrics before and after, giving backend CPU
+and database statements over the run.
+
+Usage:
+    python controller_fleet_sim.py --seed-junctions 5000
+    python controller_fleet_sim.py --controllers 100 1000 5000 --duration 60
+    python controller_fleet_sim.py --cleanup
+"""
+
+import argparse
+import logging
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
+import requests
+
+from config import Config
+from control_daemon import LatencyWindow
+from database import SessionLocal
+from models import DemandForecast, Junction, SignalPhase, SignalTiming, TrafficData
+
+SIM_PREFIX = "SIM-"
+
+
+# --- Test junctions ---
+
+def seed_junctions(count: int, phases: int = 4, seed: int = 0) -> int:
+    """
+    Create SIM-xxxxx junctions with signal phases and one count record per phase
+
+    Returns:
+        Number of junctions created (existing ones are kept)
+    """
+    rng = random.Random(seed)
+    db = SessionLocal()
+    try:
+        existing = {row[0] for row in db.query(Junction.id).filter(Junction.id.like(f"{SIM_PREFIX}%"))}
+        new_ids = [f"{SIM_PREFIX}{i:05d}" for i in range(1, count + 1)]
+        new_ids = [junction_id for junction_id in new_ids if junction_id not in existing]
+        db.add_all([Junction(id=junction_id, name=f"Simulated {junction_id}", phases=phases,
+                             status='active', mode='adaptive') for junction_id in new_ids])
+        db.flush()
+        for junction_id in new_ids:
+            for phase in range(1, phases + 1):
+                counts = [rng.randint(0, 30), rng.randint(0, 40), rng.randint(0, 8)]
+                db.add(SignalPhase(junction_id=junction_id, phase_number=phase, lane_count=rng.randint(1, 3)))
+                db.add(TrafficData(junction_id=junction_id, phase=phase, two_wheelers=counts[0],
+                                   light_vehicles=counts[1], heavy_vehicles=counts[2], total_count=sum(counts)))
+        db.commit()
+        return len(new_ids)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def cleanup_junctions() -> int:
+    """Delete the SIM-xxxxx junctions and their rows; returns the number of junctions removed"""
+    db = SessionLocal()
+    try:
+        pattern = f"{SIM_PREFIX}%"
+        for model in (TrafficData, SignalPhase, SignalTiming, DemandForecast):
+            db.query(model).filter(model.junction_id.like(pattern)).delete(synchronize_session=False)
+        removed = db.query(Junction).filter(Junction.id.like(pattern)).delete(synchronize_session=False)
+        db.commit()
+        return removed
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def controlled_junctions(limit: Optional[int] = None) -> List[str]:
+    """Junctions with signal phases (simulated ones first)"""
+    db = SessionLocal()
+    try:
+        ids = sorted(row[0] for row in db.query(SignalPhase.junction_id).distinct())
+    finally:
+        db.close()
+    ids.sort(key=lambda junction_id: not junction_id.startswith(SIM_PREFIX))
+    return ids[:limit] if limit is not None else ids
+
+
+# --- Virtual controllers ---
+
+class VirtualController:
+    """
+    One junction controller running from its fetched timeline
+    """
+
+    __slots__ = ('junction_id', 'etag', 'version', 'cycles', 'next_fetch', 'next_report')
+
+    def __init__(self, junction_id: str, next_fetch: float, next_report: float):
+        self.junction_id = junction_id
+        self.etag = None
+        self.version = None
+        self.cycles: List[Dict] = []
+        self.next_fetch = next_fetch
+        self.next_report = next_report
+
+    def load(self, etag: str, payload: Dict):
+        self.etag = etag
+        self.version = payload['version']
+        self.cycles = payload['cycles']
+
+    def execute(self, at: float):
+        """(phase, light) shown at a time; (None, 'fallback') when no buffered cycle covers it"""
+        for cycle in self.cycles:
+            if cycle['start'] <= at < cycle['end']:
+                for phase in cycle['phases']:
+                    if phase['green_start'] is None:
+                        continue
+                    if phase['green_start'] <= at < phase['yellow_start']:
+                        return phase['phase'], 'green'
+                    if phase['yellow_start'] <= at < phase['red_start']:
+                        return phase['phase'], 'yellow'
+                return None, 'red'  # All-red interval
+        return None, 'fallback'
+
+    def state(self, at: float) -> Dict:
+        phase, light = self.execute(at)
+        return {
+            'version': self.version,
+            'phase': phase,
+            'light': light,
+            'buffered_until': self.cycles[-1]['end'] if self.cycles else None,
+            'reported_at': round(at, 3),
+        }
+
+
+class FleetStats:
+    """
+    Counters and latency windows shared by the fleet workers
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.fetches = 0
+            self.not_modified = 0
+            self.missing = 0
+            self.errors = 0
+            self.reports = 0
+            self.fallbacks = 0
+            self.injected = 0
+            self.fetch_latency = LatencyWindow(size=100000)
+            self.propagation = LatencyWindow(size=100000)
+
+    def add(self, name: str, amount: int = 1):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+
+class ControllerFleet:
+    """
+    Virtual controllers multiplexed over worker threads, plus a count injector
+    """
+
+    def __init__(self, base_url: str, junction_ids: List[str], workers: int = 32,
+                 fetch_interval: float = 5.0, report_interval: float = 10.0,
+                 inject_rate: float = 5.0, seed: int = 0):
+        self.base_url = base_url.rstrip('/')
+        self.fetch_interval = fetch_interval
+        self.report_interval = report_interval
+        self.inject_rate = inject_rate
+        self.random = random.Random(seed)
+        self.stats = FleetStats()
+        self.stop_event = threading.Event()
+        self.threads: List[threading.Thread] = []
+
+        # Junction -> time a count was posted for it, until a controller fetches a timeline generated after it
+        self.injected: Dict[str, float] = {}
+        self.injected_lock = threading.Lock()
+
+        now = time.time()
+        controllers = [VirtualController(junction_id, now + self.random.random() * fetch_interval,
+                                         now + self.random.random() * report_interval)
+                       for junction_id in junction_ids]
+        workers = max(1, min(workers, len(controllers)))
+        self.groups = [controllers[i::workers] for i in range(workers)]
+
+    def start(self):
+        for index, group in enumerate(self.groups):
+            thread = threading.Thread(target=self._work, args=(group,), name=f"fleet-{index}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        if self.inject_rate > 0:
+            thread = threading.Thread(target=self._inject, name="fleet-injector", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join(max(self.fetch_interval, self.report_interval) + 5)
+        self.threads = []
+
+    def _work(self, controllers: List[VirtualController]):
+        session = requests.Session()
+        while not self.stop_event.is_set():
+            now = time.time()
+            for controller in controllers:
+                if controller.next_fetch <= now:
+                    self._fetch(session, controller)
+                    controller.next_fetch = now + self.fetch_interval
+                if controller.next_report <= now:
+                    self._report(session, controller, now)
+                    controller.next_report = now + self.report_interval
+            upcoming = min(min(c.next_fetch, c.next_report) for c in controllers)
+            self.stop_event.wait(max(0.0, upcoming - time.time()))
+
+    def _fetch(self, session: requests.Session, controller: VirtualController):
+        headers = {'If-None-Match': controller.etag} if controller.etag else {}
+        started = time.perf_counter()
+        try:
+            response = session.get(f"{self.base_url}/timeline/{controller.junction_id}",
+                                   headers=headers, timeout=10)
+        except requests.RequestException:
+            self.stats.add('errors')
+            return
+        received = time.time()
+        with self.stats.lock:
+            self.stats.fetch_latency.add(time.perf_counter() - started)
+            self.stats.fetches += 1
+
+        if response.status_code == 304:
+            self.stats.add('not_modified')
+            return
+        if response.status_code == 404:
+            self.stats.add('missing')
+            return
+        if response.status_code != 200:
+            self.stats.add('errors')
+            return
+
+        payload = response.json()
+        controller.load(response.headers.get('ETag'), payload)
+        with self.injected_lock:
+            posted = self.injected.get(controller.junction_id)
+            if posted is not None and payload['generated_at'] >= posted:
+                del self.injected[controller.junction_id]
+            else:
+                posted = None
+        if posted is not None:
+            with self.stats.lock:
+                self.stats.propagation.add(received - posted)
+
+    def _report(self, session: requests.Session, controller: VirtualController, now: float):
+        state = controller.state(now)
+        if state['light'] == 'fallback':
+            self.stats.add('fallbacks')
+        try:
+            response = session.post(f"{self.base_url}/controllers/{controller.junction_id}/state",
+                                    json=state, timeout=10)
+            response.raise_for_status()
+            self.stats.add('reports')
+        except requests.RequestException:
+            self.stats.add('errors')
+
+    def _inject(self):
+        """Post random counts for junctions without a pending injection"""
+        session = requests.Session()
+        junction_ids = [c.junction_id for group in self.groups for c in group]
+        while not self.stop_event.wait(1.0 / self.inject_rate):
+            junction_id = self.random.choice(junction_ids)
+            with self.injected_lock:
+                if junction_id in self.injected:
+                    continue
+            counts = [self.random.randint(0, 60), self.random.randint(0, 80), self.random.randint(0, 15)]
+            record = {'junction_id': junction_id, 'phase': 1, 'two_wheelers': counts[0],
+                      'light_vehicles': counts[1], 'heavy_vehicles': counts[2], 'total_count': sum(counts)}
+            posted = time.time()
+            try:
+                session.post(f"{self.base_url}/traffic-data-record", json=record, timeout=10).raise_for_status()
+            except requests.RequestException:
+                self.stats.add('errors')
+                continue
+            with self.injected_lock:
+                self.injected[junction_id] = posted
+            self.stats.add('injected')
+
+
+# --- Harness ---
+
+def backend_metrics(base_url: str) -> Dict:
+    response = requests.get(f"{base_url.rstrip('/')}/metrics", timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+
+def run_step(base_url: str, junction_ids: List[str], duration: float, warmup: float, **fleet_args) -> Dict:
+    """Run the fleet on the given junctions and measure after a warm-up"""
+    fleet = ControllerFleet(base_url, junction_ids, **fleet_args)
+    fleet.start()
+    try:
+        time.sleep(warmup)
+        fleet.stats.reset()
+        with fleet.injected_lock:
+            fleet.injected.clear()
+        before = backend_metrics(base_url)
+        started = time.time()
+        time.sleep(duration)
+        after = backend_metrics(base_url)
+        elapsed = time.time() - started
+    finally:
+        fleet.stop()
+
+    stats = fleet.stats
+    with stats.lock:
+        return {
+            'controllers': len(junction_ids),
+            'fetches_per_s': stats.fetches / elapsed,
+            'not_modified_pct': 100.0 * stats.not_modified / max(stats.fetches, 1),
+            'fetch_ms': {k: (v * 1000 if v is not None else None)
+                         for k, v in stats.fetch_latency.summary().items() if k in ('p50', 'p95', 'p99')},
+            'propagation_s': stats.propagation.summary(),
+            'unresolved_injections': len(fleet.injected),
+            'reports_per_s': stats.reports / elapsed,
+            'fallback_pct': 100.0 * stats.fallbacks / max(stats.reports, 1),
+            'missing': stats.missing,
+            'errors': stats.errors,
+            'backend_cpu_pct': 100.0 * (after['cpu_seconds'] - before['cpu_seconds']) / elapsed,
+            'db_statements_per_s': (after['db_statements'] - before['db_statements']) / elapsed,
+            'db_ms_per_s': 1000.0 * (after['db_seconds'] - before['db_seconds']) / elapsed,
+        }
+
+
+def print_results(results: List[Dict]):
+    def fmt(value, pattern):
+        return pattern.format(value) if value is not None else "-"
+
+    print("\n{:>11} {:>9} {:>6} {:>9} {:>9} {:>9} {:>9} {:>8} {:>8} {:>10} {:>9} {:>7}".format(
+        "Controllers", "Fetch/s", "304%", "Fetch p95", "Prop p50", "Prop p95", "Prop max",
+        "Fallback", "CPU%", "DB stmt/s", "DB ms/s", "Errors"))
+    print("-" * 118)
+    for r in results:
+        propagation = r['propagation_s']
+        print("{:>11} {:>9.1f} {:>5.1f}% {:>9} {:>9} {:>9} {:>9} {:>7.1f}% {:>7.1f}% {:>10.1f} {:>9.1f} {:>7}".format(
+            r['controllers'], r['fetches_per_s'], r['not_modified_pct'], fmt(r['fetch_ms']['p95'], "{:.1f}ms"),
+            fmt(propagation['p50'], "{:.2f}s"), fmt(propagation['p95'], "{:.2f}s"),
+            fmt(propagation['max'], "{:.2f}s"), r['fallback_pct'], r['backend_cpu_pct'],
+            r['db_statements_per_s'], r['db_ms_per_s'], r['errors']))
+    print("\nPropagation: count posted to /traffic-data-record -> first controller fetch of a timeline "
+          "generated after it.")
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Simulated signal-controller fleet load test')
+    parser.add_argument('--base-url', type=str, default='http://localhost:8000', help='Backend URL')
+    parser.add_argument('--controllers', type=int, nargs='+', default=[100, 1000],
+                        help='Fleet sizes to measure, one run each (default: 100 1000)')
+    parser.add_argument('--duration', type=float, default=60.0, help='Measured seconds per run (default: 60)')
+    parser.add_argument('--warmup', type=float, default=10.0, help='Unmeasured seconds before each run')
+    parser.add_argument('--workers', type=int, default=32, help='Threads the controllers share (default: 32)')
+    parser.add_argument('--fetch-interval', type=float, default=5.0, help='Seconds between timeline fetches')
+    parser.add_argument('--report-interval', type=float, default=10.0, help='Seconds between state reports')
+    parser.add_argument('--inject-rate', type=float, default=5.0, help='Count records posted per second')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    parser.add_argument('--seed-junctions', type=int, default=None,
+                        help=f'Create this many {SIM_PREFIX}xxxxx test junctions and exit')
+    parser.add_argument('--cleanup', action='store_true', help=f'Delete the {SIM_PREFIX}xxxxx test junctions and exit')
+    args = parser.parse_args()
+
+    if args.cleanup:
+        logging.info(f"Removed {cleanup_junctions()} simulated junction(s)")
+        return 0
+    if args.seed_junctions:
+        created = seed_junctions(args.seed_junctions, seed=args.seed)
+        logging.info(f"Created {created} simulated junction(s); the backend timeline picks them up "
+                     f"within {Config.SCHEDULE_CACHE_TTL_SECONDS}s")
+        return 0
+
+    available = controlled_junctions()
+    if not available:
+        logging.error("No junctions with signal phases; create some with --seed-junctions")
+        return 1
+
+    results = []
+    for count in args.controllers:
+        if count > len(available):
+            logging.warning(f"Only {len(available)} junctions with signal phases; running {len(available)} "
+                            f"controllers instead of {count}")
+            count = len(available)
+        logging.info(f"Running {count} controller(s) for {args.warmup:.0f}s warm-up + {args.duration:.0f}s")
+        results.append(run_step(args.base_url, available[:count], args.duration, args.warmup,
+                                workers=args.workers, fetch_interval=args.fetch_interval,
+                                report_interval=args.report_interval, inject_rate=args.inject_rate,
+                                seed=args.seed))
+    print_results(results)
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,64 @@
+# controller_state.py
+"""
+In-memory store of the state signal controllers report back.
+
+Controllers POST their state (timeline version they run, current phase and
+light, how far ahead their buffer reaches) to /controllers/{junction_id}/state.
+Only the latest report per junction is kept; /controllers/state summarizes
+the fleet, flagging controllers that stopped reporting or run low on buffer.
+"""
+
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+from config import Config
+
+
+class ControllerStateStore:
+    """
+    Latest reported state per junction controller
+    """
+
+    def __init__(self, stale_after_seconds: float = Config.CONTROLLER_STALE_SECONDS):
+        """
+        Initialize the store
+
+        Args:
+            stale_after_seconds: Controllers silent for longer are counted as stale
+        """
+        self.stale_after_seconds = stale_after_seconds
+        self.lock = threading.Lock()
+        self.states: Dict[str, Dict] = {}
+        self.reports = 0
+
+    def report(self, junction_id: str, state: Dict):
+        """Record a controller's report (stamped with the receive time)"""
+        entry = dict(state, junction_id=junction_id, received_at=time.time())
+        with self.lock:
+            self.states[junction_id] = entry
+            self.reports += 1
+
+    def get(self, junction_id: str) -> Optional[Dict]:
+        with self.lock:
+            return self.states.get(junction_id)
+
+    def summary(self) -> Dict:
+        """Fleet overview: controllers, stale ones, lights shown and minimum buffer ahead"""
+        now = time.time()
+        with self.lock:
+            states = list(self.states.values())
+            reports = self.reports
+        fresh = [s for s in states if now - s['received_at'] <= self.stale_after_seconds]
+        ahead = [s['buffered_until'] - now for s in fresh if s.get('buffered_until') is not None]
+        return {
+            'controllers': len(states),
+            'stale': len(states) - len(fresh),
+            'reports': reports,
+            'lights': dict(Counter(s.get('light') or 'unknown' for s in fresh)),
+            'min_buffer_seconds': round(min(ahead), 1) if ahead else None,
+        }
+
+
+controller_states = ControllerStateStore()
@@ -0,0 +1,218 @@
+# corridor_planner.py
+"""
+Emergency green-corridor planner.
+
+Builds an in-memory road graph from Junction coordinates and SignalAdjacency
+links (treated as two-way, weighted by great-circle distance) and runs A*
+with a great-circle heuristic from the junction nearest a start point to the
+junction nearest the destination - by default the nearest_hospital_* of the
+closest listed hospital. Returns the ordered junctions with preemption
+timings for each signal, so corridors are planned offline in milliseconds.
+
+Planned paths are kept in an LRU keyed by (start junction, goal junction);
+committed adjacency or junction changes (green_wave graph listener) rebuild
+the graph and clear it.
+"""
+
+import heapq
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import Config
+from database import SessionLocal
+from green_wave import add_graph_listener, haversine_m
+from models import Junction, SignalAdjacency
+
+
+class CorridorPlanner:
+    """
+    A* corridor planner over the signal adjacency graph with an LRU of planned paths
+    """
+
+    def __init__(self, speed_kmh: float = Config.CORRIDOR_SPEED_KMH,
+                 cache_size: int = Config.CORRIDOR_CACHE_SIZE):
+        """
+        Initialize the planner
+
+        Args:
+            speed_kmh: Emergency vehicle speed used for arrival times
+            cache_size: Planned paths kept in the LRU
+        """
+        self.speed_ms = speed_kmh / 3.6
+        self.cache_size = cache_size
+        self.lock = threading.Lock()
+
+        self.graph_dirty = True
+        self.ids: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.names: List[str] = []
+        self.coords = np.zeros((0, 2))
+        self.edges: List[List] = []                 # node -> [(neighbour, meters)]
+        self.hospitals: List[Dict] = []
+
+        self.paths: OrderedDict = OrderedDict()     # (start, goal) -> (nodes, cumulative meters)
+        self.hits = 0
+        self.misses = 0
+
+    def plan(self, start_lat: float, start_lon: float,
+             dest_lat: Optional[float] = None, dest_lon: Optional[float] = None) -> Dict:
+        """
+        Plan a corridor from a start point to a destination (default: nearest listed hospital)
+
+        Returns:
+            {'destination', 'distance_m', 'duration_s', 'junctions': [{junction_id, name,
+             latitude, longitude, from_junction_id, eta_seconds, preempt_at_seconds,
+             release_at_seconds}, ...]}
+
+        Raises:
+            ValueError: If there are no junctions with coordinates or no route exists
+        """
+        with self.lock:
+            if self.graph_dirty:
+                self._load_graph()
+            if not self.ids:
+                raise ValueError("No junctions with coordinates")
+
+            if dest_lat is None or dest_lon is None:
+                destination = self._nearest_hospital(start_lat, start_lon)
+            else:
+                destination = {'name': None, 'latitude': dest_lat, 'longitude': dest_lon}
+
+            start = self._nearest_node(start_lat, start_lon)
+            goal = self._nearest_node(destination['latitude'], destination['longitude'])
+
+            key = (start, goal)
+            if key in self.paths:
+                self.paths.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+                self.paths[key] = self._astar(start, goal)
+                if len(self.paths) > self.cache_size:
+                    self.paths.popitem(last=False)
+            nodes, cumulative = self.paths[key]
+            ids, names, coords = self.ids, self.names, self.coords
+
+        if nodes is None:
+            raise ValueError(f"No route from {ids[start]} to {ids[goal]}")
+
+        # Leg from the start point to the first signal, and from the last signal on
+        lead_in = float(haversine_m(start_lat, start_lon, *coords[start]))
+        lead_out = float(haversine_m(*coords[goal], destination['latitude'], destination['longitude']))
+
+        junctions = []
+        for position, node in enumerate(nodes):
+            eta = (lead_in + cumulative[position]) / self.speed_ms
+            junctions.append({
+                'junction_id': ids[node],
+                'name': names[node],
+                'latitude': float(coords[node][0]),
+                'longitude': float(coords[node][1]),
+                'from_junction_id': ids[nodes[position - 1]] if position else None,
+                'eta_seconds': round(eta, 1),
+                'preempt_at_seconds': round(max(0.0, eta - Config.CORRIDOR_PREEMPT_LEAD_SECONDS), 1),
+                'release_at_seconds': round(eta + Config.CORRIDOR_RELEASE_AFTER_SECONDS, 1),
+            })
+
+        distance = lead_in + cumulative[-1] + lead_out
+        return {
+            'destination': destination,
+            'distance_m': round(distance, 1),
+            'duration_s': round(distance / self.speed_ms, 1),
+            'junctions': junctions,
+        }
+
+    def invalidate(self):
+        """Adjacency or junctions changed: rebuild the graph and drop planned paths"""
+        with self.lock:
+            self.graph_dirty = True
+            self.paths.clear()
+
+    def stats(self) -> Dict:
+        """Planner counters"""
+        with self.lock:
+            return {'junctions': len(self.ids), 'cached_paths': len(self.paths),
+                    'hits': self.hits, 'misses': self.misses}
+
+    def _load_graph(self):
+        db = SessionLocal()
+        try:
+            junctions = db.query(Junction).filter(
+                Junction.latitude.isnot(None), Junction.longitude.isnot(None)
+            ).order_by(Junction.id).all()
+            links = db.query(SignalAdjacency.from_junction_id, SignalAdjacency.to_junction_id).all()
+        finally:
+            db.close()
+
+        self.ids = [j.id for j in junctions]
+        self.names = [j.name for j in junctions]
+        self.index = {junction_id: i for i, junction_id in enumerate(self.ids)}
+        self.coords = np.array([[float(j.latitude), float(j.longitude)] for j in junctions]).reshape(-1, 2)
+        self.hospitals = [
+            {'name': j.nearest_hospital_name, 'latitude': float(j.nearest_hospital_latitude),
+             'longitude': float(j.nearest_hospital_longitude)}
+            for j in junctions
+            if j.nearest_hospital_latitude is not None and j.nearest_hospital_longitude is not None
+        ]
+
+        self.edges = [[] for _ in self.ids]
+        pairs = {tuple(sorted((self.index[a], self.index[b]))) for a, b in links
+                 if a in self.index and b in self.index and a != b}
+        if pairs:
+            a, b = np.array(sorted(pairs)).T
+            meters = haversine_m(self.coords[a, 0], self.coords[a, 1], self.coords[b, 0], self.coords[b, 1])
+            for u, v, d in zip(a.tolist(), b.tolist(), meters.tolist()):
+                self.edges[u].append((v, d))
+                self.edges[v].append((u, d))
+
+        self.paths.clear()
+        self.graph_dirty = False
+
+    def _nearest_node(self, lat: float, lon: float) -> int:
+        return int(np.argmin(haversine_m(lat, lon, self.coords[:, 0], self.coords[:, 1])))
+
+    def _nearest_hospital(self, lat: float, lon: float) -> Dict:
+        if not self.hospitals:
+            raise ValueError("No hospital locations recorded on junctions")
+        distances = haversine_m(lat, lon, [h['latitude'] for h in self.hospitals],
+                                [h['longitude'] for h in self.hospitals])
+        return dict(self.hospitals[int(np.argmin(distances))])
+
+    def _astar(self, start: int, goal: int):
+        """Shortest path by A*; returns (nodes, cumulative meters) or (None, None)"""
+        # Straight-line distance to the goal for every node at once (admissible: edges are straight lines)
+        heuristic = haversine_m(self.coords[:, 0], self.coords[:, 1], *self.coords[goal])
+        best = {start: 0.0}
+        parent = {start: None}
+        heap = [(heuristic[start], 0.0, start)]
+        closed = set()
+
+        while heap:
+            _, cost, node = heapq.heappop(heap)
+            if node == goal:
+                break
+            if node in closed:
+                continue
+            closed.add(node)
+            for neighbour, meters in self.edges[node]:
+                candidate = cost + meters
+                if candidate < best.get(neighbour, float('inf')):
+                    best[neighbour] = candidate
+                    parent[neighbour] = node
+                    heapq.heappush(heap, (candidate + heuristic[neighbour], candidate, neighbour))
+        else:
+            if goal not in best:
+                return None, None
+
+        nodes = [goal]
+        while parent[nodes[-1]] is not None:
+            nodes.append(parent[nodes[-1]])
+        nodes.reverse()
+        return nodes, [best[n] for n in nodes]
+
+
+corridor_planner = CorridorPlanner()
+add_graph_listener(corridor_planner.invalidate)
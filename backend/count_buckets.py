@@ -0,0 +1,177 @@
+# count_buckets.py
+"""
+Time-bucketed vehicle count aggregation.
+
+Counts are accumulated into fixed buckets (e.g. 15 s / 1 min) keyed on the
+video timeline rather than wall-clock time. When a bucket closes it becomes a
+traffic_data row; closed rows are handed to a writer callable in batches, so
+database writes happen at a constant rate regardless of frame rate.
+
+A batch is written once it is full or flush_interval seconds (video time)
+after its first bucket closed. A failed write is retried after another
+flush_interval, and at most max_pending unwritten buckets are kept; beyond
+that the oldest are dropped and logged.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from config import Config
+
+# Detector vehicle classes -> traffic_data columns
+CLASS_COLUMNS = {
+    'two_wheeler': 'two_wheelers',
+    'light_motor': 'light_vehicles',
+    'heavy_motor': 'heavy_vehicles',
+}
+
+
+class CountBucketAggregator:
+    """
+    Aggregates vehicle counts for one junction phase into fixed time buckets
+    """
+
+    def __init__(
+        self,
+        junction_id: str,
+        phase_number: int,
+        start_time: datetime,
+        writer: Callable[[List[Dict]], bool],
+        bucket_seconds: float = Config.COUNT_BUCKET_SECONDS,
+        flush_batch_size: int = Config.COUNT_FLUSH_BATCH_SIZE,
+        flush_interval: float = Config.COUNT_FLUSH_INTERVAL_SECONDS,
+        max_pending: int = Config.COUNT_MAX_PENDING_BUCKETS
+    ):
+        """
+        Initialize the aggregator
+
+        Args:
+            junction_id: Junction ID (e.g., 'J-001')
+            phase_number: Phase number (e.g., 1, 2, 3, 4)
+            start_time: Timestamp of elapsed time 0 on the video timeline
+            writer: Callable that persists a list of rows, returning True on success
+            bucket_seconds: Bucket length in seconds
+            flush_batch_size: Number of closed buckets to collect before writing
+            flush_interval: Seconds (video time) after which closed buckets are written anyway,
+                            and between retries of a failed write
+            max_pending: Unwritten buckets kept while writes fail (oldest dropped first)
+        """
+        if bucket_seconds <= 0:
+            raise ValueError("bucket_seconds must be positive")
+
+        self.junction_id = junction_id
+        self.phase_number = phase_number
+        self.start_time = start_time
+        self.writer = writer
+        self.bucket_seconds = float(bucket_seconds)
+        self.flush_batch_size = max(1, int(flush_batch_size))
+        self.flush_interval = max(0.0, float(flush_interval))
+        self.max_pending = max(self.flush_batch_size, int(max_pending))
+
+        self.bucket_index = 0
+        self.current = self._empty_counts()
+        self.pending: List[Dict] = []
+        self.next_flush_at: Optional[float] = None  # Video time the pending buckets are due
+        self.retrying = False  # Last write failed; wait for next_flush_at instead of a full batch
+        self.totals = self._empty_counts()
+        self.buckets_written = 0
+        self.buckets_dropped = 0
+
+        logging.info(f"CountBucketAggregator initialized: junction={junction_id}, phase={phase_number}, "
+                     f"bucket={self.bucket_seconds:.0f}s, batch={self.flush_batch_size}, "
+                     f"flush every {self.flush_interval:.0f}s")
+
+    @staticmethod
+    def _empty_counts() -> Dict[str, int]:
+        return {column: 0 for column in CLASS_COLUMNS.values()}
+
+    def add(self, elapsed_seconds: float, vehicle_class: str):
+        """
+        Count one vehicle at a point on the video timeline
+
+        Args:
+            elapsed_seconds: Seconds since start_time on the video timeline
+            vehicle_class: Detector class ('two_wheeler', 'light_motor', 'heavy_motor')
+        """
+        self.advance(elapsed_seconds)
+
+        column = CLASS_COLUMNS.get(vehicle_class)
+        if column is None:
+            return
+        self.current[column] += 1
+        self.totals[column] += 1
+
+    def advance(self, elapsed_seconds: float):
+        """
+        Close every bucket that ended at or before elapsed_seconds
+
+        Buckets without vehicles are still emitted as zero rows so demand
+        decays when traffic stops.
+        """
+        target_index = int(elapsed_seconds // self.bucket_seconds)
+        while self.bucket_index < target_index:
+            self._close_bucket()
+
+        if not self.pending:
+            return
+        if self.next_flush_at is None:
+            self.next_flush_at = elapsed_seconds + self.flush_interval
+        if elapsed_seconds >= self.next_flush_at or (len(self.pending) >= self.flush_batch_size and not self.retrying):
+            self.retrying = not self.flush()
+            self.next_flush_at = elapsed_seconds + self.flush_interval if self.retrying else None
+
+    def _close_bucket(self):
+        """Move the current bucket to the pending batch and start the next one"""
+        bucket_start = self.start_time + timedelta(seconds=self.bucket_index * self.bucket_seconds)
+        row = {
+            'junction_id': self.junction_id,
+            'phase_number': self.phase_number,
+            'timestamp': bucket_start,
+            **self.current
+        }
+        self.pending.append(row)
+        logging.debug(f"Closed bucket {self.bucket_index} ({bucket_start.isoformat()}): {self.current}")
+
+        if len(self.pending) > self.max_pending:
+            dropped = self.pending.pop(0)
+            self.buckets_dropped += 1
+            counts = {column: dropped[column] for column in CLASS_COLUMNS.values()}
+            logging.warning(f"{self.max_pending} buckets unwritten, dropping junction={self.junction_id} "
+                            f"phase={self.phase_number} bucket {dropped['timestamp'].isoformat()}: {counts}")
+
+        self.bucket_index += 1
+        self.current = self._empty_counts()
+
+    def flush(self) -> bool:
+        """
+        Write all pending buckets in one batch
+
+        Returns:
+            True if nothing is left pending, False if the write failed (rows are kept for retry)
+        """
+        if not self.pending:
+            return True
+
+        if not self.writer(self.pending):
+            logging.warning(f"Failed to write {len(self.pending)} bucket(s); will retry on next flush")
+            return False
+
+        self.buckets_written += len(self.pending)
+        self.pending = []
+        return True
+
+    def close(self, elapsed_seconds: float) -> bool:
+        """
+        Close the final (possibly partial) bucket and flush everything
+
+        Args:
+            elapsed_seconds: Seconds since start_time at end of stream
+
+        Returns:
+            True if all buckets were written
+        """
+        self.advance(elapsed_seconds)
+        if elapsed_seconds > self.bucket_index * self.bucket_seconds or any(self.current.values()):
+            self._close_bucket()
+        return self.flush()
@@ -1,6 +1,8 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 import os
 from dotenv import load_dotenv
 
@@ -40,14 +42,38 @@ def get_database_url():
 
 SQLALCHEMY_DATABASE_URL = get_database_url()
 
+# Connection pool sized for the API worker threads (Config.API_THREADPOOL_SIZE): every thread
+# running a handler can hold a connection without waiting on the pool
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+
+
+def pool_options(database_url):
+    """
+    Pool sizing arguments for create_engine
+
+    Only QueuePool takes pool_size/max_overflow; in-memory SQLite uses
+    SingletonThreadPool, which rejects them.
+    """
+    url = make_url(database_url)
+    if not issubclass(url.get_dialect().get_pool_class(url), QueuePool):
+        return {}
+    return {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW}
+
+
 # Create engine with appropriate settings
 if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
     engine = create_engine(
         SQLALCHEMY_DATABASE_URL, 
-        connect_args={"check_same_thread": False}  # Required for SQLite
+        connect_args={"check_same_thread": False},  # Required for SQLite
+        **pool_options(SQLALCHEMY_DATABASE_URL)
     )
 else:
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    engine = create_engine(
+        SQLALCHEMY_DATABASE_URL,
+        pool_pre_ping=True,  # Drop connections the server closed while idle in the pool
+        **pool_options(SQLALCHEMY_DATABASE_URL)
+    )
 
 # Verify connection on startup
 try:
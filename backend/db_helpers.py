@@ -4,6 +4,9 @@ Database helper functions for vehicle detection script
 from database import SessionLocal
 from models import SignalPhase, TrafficData
 from sqlalchemy import func
+from roi_mask import parse_polygon, rect_to_polygon
+from line_counter import parse_lines, default_exit_line
+import demand_forecast  # Registers the demand forecast update on TrafficData inserts
 import logging
 
 logger = logging.getLogger(__name__)
@@ -17,7 +20,9 @@ def get_phase_config(junction_id: str, phase_number: int):
         phase_number: Phase number (e.g., 1, 2, 3, 4)
     
     Returns:
-        dict with keys: roi_coordinates (tuple), video_source (str)
+        dict with keys: roi_coordinates (tuple), roi_polygon (list of [x, y]),
+        count_lines (list of [x1, y1, x2, y2]), video_source (str), lane_count,
+        default_timer_sec
         Returns None if not found
     """
     db = SessionLocal()
@@ -31,18 +36,31 @@ def get_phase_config(junction_id: str, phase_number: int):
             logger.error(f"No phase found for junction {junction_id}, phase {phase_number}")
             return None
         
-        # Validate ROI coordinates exist
-        if None in [phase.roi_x1, phase.roi_y1, phase.roi_x2, phase.roi_y2]:
+        # Validate ROI exists (polygon takes precedence over the rectangle)
+        roi_polygon = parse_polygon(phase.roi_polygon)
+        has_rect = None not in [phase.roi_x1, phase.roi_y1, phase.roi_x2, phase.roi_y2]
+        if roi_polygon is None and not has_rect:
             logger.error(f"ROI coordinates not set for junction {junction_id}, phase {phase_number}")
             return None
         
+        if roi_polygon is None:
+            roi_polygon = rect_to_polygon((phase.roi_x1, phase.roi_y1, phase.roi_x2, phase.roi_y2))
+        
+        xs = [p[0] for p in roi_polygon]
+        ys = [p[1] for p in roi_polygon]
+        roi_coordinates = (min(xs), min(ys), max(xs), max(ys))
+        
+        count_lines = parse_lines(phase.count_lines) or [default_exit_line(roi_coordinates)]
+        
         # Validate video source exists
         if not phase.video_source:
             logger.error(f"Video source not set for junction {junction_id}, phase {phase_number}")
             return None
         
         return {
-            'roi_coordinates': (phase.roi_x1, phase.roi_y1, phase.roi_x2, phase.roi_y2),
+            'roi_coordinates': roi_coordinates,
+            'roi_polygon': roi_polygon,
+            'count_lines': count_lines,
             'video_source': phase.video_source,
             'lane_count': phase.lane_count,
             'default_timer_sec': phase.default_timer_sec
@@ -98,3 +116,46 @@ def save_traffic_count(junction_id: str, phase_number: int,
         return False
     finally:
         db.close()
+
+
+def save_traffic_counts(rows: list):
+    """
+    Save a batch of bucketed vehicle counts to traffic_data in one transaction
+    
+    Args:
+        rows: List of dicts with keys junction_id, phase_number, two_wheelers,
+              light_vehicles, heavy_vehicles and timestamp (bucket start)
+    
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    if not rows:
+        return True
+    
+    db = SessionLocal()
+    try:
+        db.add_all([
+            TrafficData(
+                junction_id=row['junction_id'],
+                phase=row['phase_number'],
+                two_wheelers=row['two_wheelers'],
+                light_vehicles=row['light_vehicles'],
+                heavy_vehicles=row['heavy_vehicles'],
+                total_count=row['two_wheelers'] + row['light_vehicles'] + row['heavy_vehicles'],
+                avg_wait_time=None,
+                timestamp=row['timestamp']
+            )
+            for row in rows
+        ])
+        db.commit()
+        
+        logger.info(f"✓ Saved {len(rows)} traffic bucket(s): Junction={rows[0]['junction_id']}, "
+                   f"Phase={rows[0]['phase_number']}, up to {rows[-1]['timestamp'].isoformat()}")
+        return True
+    
+    except Exception as e:
+        db.rollback()
+        logger.error(f"✗ Database error saving traffic buckets: {e}")
+        return False
+    finally:
+        db.close()
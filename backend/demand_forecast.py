@@ -0,0 +1,261 @@
+# demand_forecast.py
+"""
+Incremental demand forecasting per junction phase.
+
+Each (junction, phase) keeps a damped Holt forecaster (level + trend) with
+additive time-of-day seasonality over Config.FORECAST_SLOT_MINUTES slots,
+separately for two-wheelers, light and heavy vehicles. The state lives in the
+demand_forecasts table and is updated in O(1) whenever a TrafficData row is
+inserted (session event, same transaction), so forecasts never rescan history.
+
+Schedules use the forecast with demand='forecast'
+(traffic_cycle.calculate_schedules, /schedule?demand=forecast); phases with too
+few observations fall back to their latest count.
+
+The state row is created with an insert that ignores conflicts and then
+loaded with SELECT ... FOR UPDATE, so concurrent writers (API, CV runners)
+neither duplicate nor overwrite it; (junction_id, phase) is unique.
+
+Rebuild the state from existing history (e.g. after changing the settings):
+    python demand_forecast.py --rebuild
+    python demand_forecast.py --rebuild --junction J-001
+"""
+
+import argparse
+import json
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from config import Config
+from models import DemandForecast, TrafficData
+
+NUM_CLASSES = 3  # two_wheelers, light_vehicles, heavy_vehicles
+SLOTS_PER_DAY = (24 * 60) // Config.FORECAST_SLOT_MINUTES
+
+
+def season_slot(timestamp: datetime) -> int:
+    """Time-of-day slot of a timestamp (local time for timezone-aware timestamps)"""
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone()
+    return ((timestamp.hour * 60 + timestamp.minute) // Config.FORECAST_SLOT_MINUTES) % SLOTS_PER_DAY
+
+
+def new_state(junction_id: str, phase: int) -> DemandForecast:
+    """Empty forecaster state for a junction phase"""
+    return DemandForecast(**_empty_state_values(junction_id, phase))
+
+
+def _empty_state_values(junction_id: str, phase: int) -> Dict:
+    return {
+        'junction_id': junction_id,
+        'phase': phase,
+        'level': json.dumps([0.0] * NUM_CLASSES),
+        'trend': json.dumps([0.0] * NUM_CLASSES),
+        'seasonal': json.dumps([None] * SLOTS_PER_DAY),
+        'samples': 0,
+    }
+
+
+def update_state(state: DemandForecast, counts, timestamp: datetime):
+    """
+    Fold one observation into the forecaster state (O(1))
+
+    Args:
+        state: DemandForecast row, updated in place
+        counts: (two_wheelers, light_vehicles, heavy_vehicles)
+        timestamp: Time of the observation
+    """
+    alpha, beta, gamma = Config.FORECAST_ALPHA, Config.FORECAST_BETA, Config.FORECAST_GAMMA
+    phi = Config.FORECAST_TREND_DAMPING
+
+    observed = [float(c or 0) for c in counts]
+    level = json.loads(state.level)
+    trend = json.loads(state.trend)
+    seasonal = json.loads(state.seasonal)
+    if len(seasonal) != SLOTS_PER_DAY:
+        # Slot length changed since the state was written
+        seasonal = [None] * SLOTS_PER_DAY
+    slot = season_slot(timestamp)
+
+    if not state.samples:
+        level = observed
+        trend = [0.0] * NUM_CLASSES
+        seasonal[slot] = [0.0] * NUM_CLASSES
+    else:
+        season = seasonal[slot] or [0.0] * NUM_CLASSES
+        new_level = [alpha * (y - s) + (1 - alpha) * (l + phi * t)
+                     for y, s, l, t in zip(observed, season, level, trend)]
+        trend = [beta * (nl - l) + (1 - beta) * phi * t
+                 for nl, l, t in zip(new_level, level, trend)]
+        if seasonal[slot] is None:
+            seasonal[slot] = [y - nl for y, nl in zip(observed, new_level)]
+        else:
+            seasonal[slot] = [gamma * (y - nl) + (1 - gamma) * s
+                              for y, nl, s in zip(observed, new_level, season)]
+        level = new_level
+
+    state.level = json.dumps(level)
+    state.trend = json.dumps(trend)
+    state.seasonal = json.dumps(seasonal)
+    state.samples = (state.samples or 0) + 1
+    if state.last_timestamp is None or _comparable(timestamp) > _comparable(state.last_timestamp):
+        state.last_timestamp = timestamp
+
+
+def forecast_counts(state: DemandForecast, at: Optional[datetime] = None) -> List[float]:
+    """
+    One-step-ahead demand forecast for the time-of-day slot of `at`
+
+    Returns:
+        [two_wheelers, light_vehicles, heavy_vehicles] (non-negative, fractional)
+    """
+    at = at or datetime.now().astimezone()
+    phi = Config.FORECAST_TREND_DAMPING
+    level = json.loads(state.level)
+    trend = json.loads(state.trend)
+    seasonal = json.loads(state.seasonal)
+    slot = season_slot(at)
+    season = (seasonal[slot] if slot < len(seasonal) else None) or [0.0] * NUM_CLASSES
+    return [max(0.0, l + phi * t + s) for l, t, s in zip(level, trend, season)]
+
+
+def forecast_phase_counts(db, junction_ids, at: Optional[datetime] = None,
+                          min_samples: int = Config.FORECAST_MIN_SAMPLES) -> Dict[Tuple[str, int], List[float]]:
+    """
+    Forecast demand of every phase of these junctions in one query
+
+    Returns:
+        (junction_id, phase) -> forecast counts, for phases with at least min_samples observations
+    """
+    states = db.query(DemandForecast).filter(
+        DemandForecast.junction_id.in_(list(junction_ids)),
+        DemandForecast.samples >= min_samples
+    ).all()
+    return {(state.junction_id, state.phase): forecast_counts(state, at) for state in states}
+
+
+def _comparable(timestamp: datetime) -> datetime:
+    """Timestamps as aware datetimes (naive ones are local time) so they can be compared"""
+    return timestamp.astimezone() if timestamp.tzinfo is None else timestamp
+
+
+def _lock_state(session, junction_id: str, phase: int) -> Optional[DemandForecast]:
+    """Load a junction phase's state, locked until commit and refreshed from the database"""
+    return session.query(DemandForecast).filter(
+        DemandForecast.junction_id == junction_id,
+        DemandForecast.phase == phase
+    ).populate_existing().with_for_update().one_or_none()
+
+
+def _insert_state(session, junction_id: str, phase: int) -> bool:
+    """
+    Insert an empty state unless one exists (ON CONFLICT DO NOTHING)
+
+    Returns:
+        False if the dialect has no conflict-ignoring insert
+    """
+    dialect = {'postgresql': postgresql, 'sqlite': sqlite}.get(session.get_bind().dialect.name)
+    if dialect is None:
+        return False
+    statement = dialect.insert(DemandForecast).values(**_empty_state_values(junction_id, phase))
+    session.execute(statement.on_conflict_do_nothing(index_elements=['junction_id', 'phase']))
+    return True
+
+
+def _observe(session, states: Dict, row: TrafficData):
+    """Update the state of the row's junction phase (created on first observation)"""
+    key = (row.junction_id, row.phase)
+    state = states.get(key)
+    if state is None:
+        with session.no_autoflush:
+            state = _lock_state(session, row.junction_id, row.phase)
+            if state is None and _insert_state(session, row.junction_id, row.phase):
+                state = _lock_state(session, row.junction_id, row.phase)
+        if state is None:
+            state = new_state(row.junction_id, row.phase)
+            session.add(state)
+        states[key] = state
+
+    timestamp = row.timestamp or datetime.now().astimezone()
+    update_state(state, (row.two_wheelers, row.light_vehicles, row.heavy_vehicles), timestamp)
+
+
+@event.listens_for(Session, "before_flush")
+def _update_forecasts(session, flush_context, instances):
+    rows = [obj for obj in session.new if isinstance(obj, TrafficData) and obj.junction_id is not None]
+    if not rows:
+        return
+
+    # Oldest first, so batched buckets are folded in time order
+    rows.sort(key=lambda r: _comparable(r.timestamp) if r.timestamp else datetime.now().astimezone())
+    states: Dict = {}
+    for row in rows:
+        _observe(session, states, row)
+
+
+def rebuild(junction_id: Optional[str] = None) -> int:
+    """
+    Rebuild forecaster states by replaying the stored traffic history
+
+    Args:
+        junction_id: Junction to rebuild, or None for all
+
+    Returns:
+        Number of observations replayed
+    """
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        state_query = db.query(DemandForecast)
+        history = db.query(TrafficData).order_by(TrafficData.timestamp, TrafficData.id)
+        if junction_id:
+            state_query = state_query.filter(DemandForecast.junction_id == junction_id)
+            history = history.filter(TrafficData.junction_id == junction_id)
+        state_query.delete(synchronize_session=False)
+
+        states: Dict = {}
+        replayed = 0
+        for row in history.yield_per(1000):
+            key = (row.junction_id, row.phase)
+            if key not in states:
+                states[key] = new_state(row.junction_id, row.phase)
+                db.add(states[key])
+            update_state(states[key], (row.two_wheelers, row.light_vehicles, row.heavy_vehicles),
+                         row.timestamp or datetime.now().astimezone())
+            replayed += 1
+
+        db.commit()
+        return replayed
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Per-phase demand forecaster state')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='Rebuild forecaster states from the stored traffic history')
+    parser.add_argument('--junction', type=str, default=None,
+                        help='Limit the rebuild to one junction (e.g. J-001)')
+    args = parser.parse_args()
+
+    if not args.rebuild:
+        parser.print_help()
+        return 1
+
+    replayed = rebuild(args.junction)
+    logging.info(f"Rebuilt demand forecasts from {replayed} traffic record(s)")
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -4,21 +4,25 @@ Processes video feeds using YOLO to detect accidents and saves results to databa
 Designed for automated surveillance without GUI display.
 """
 
-import cv2
 import os
-import time
 import logging
 import argparse
-import json
 from datetime import datetime
 from pathlib import Path
 from typing import Optional
-from decimal import Decimal
 
 from ultralytics import YOLO
 from database import SessionLocal
-from models import SignalPhase, Accident, Junction
+from models import SignalPhase, Junction
 from sqlalchemy.orm import Session
+from pipeline_clock import PipelineClock, parse_start_time
+from frame_pipeline import FramePipeline
+from incident_tracker import IncidentTracker, Incident
+from evidence_writer import EvidenceWriter, accident_record
+from clip_buffer import ClipRecorder
+from evidence_storage import CLIP_DIR
+from anomaly_trigger import AnomalyTrigger
+from config import Config
 
 # Configure logging
 logging.basicConfig(
@@ -31,18 +35,53 @@ logging.basicConfig(
 )
 
 
+def load_model(model_path: str):
+    """
+    Load the accident detection model
+    
+    Returns:
+        YOLO model, or None if it could not be loaded
+    """
+    if not os.path.exists(model_path):
+        logging.error(f"Model not found at {model_path}")
+        return None
+        
+    try:
+        logging.info(f"Loading YOLO model from {model_path}...")
+        model = YOLO(model_path)
+        logging.info("Model loaded successfully")
+        return model
+    except Exception as e:
+        logging.error(f"Error loading model: {e}")
+        return None
+
+
+def crop_regions(frame, regions: list) -> list:
+    """Crops of the frame for the given regions (None means the full frame)"""
+    return [frame if region is None else frame[region[1]:region[3], region[0]:region[2]]
+            for region in regions]
+
+
 class AccidentMonitor:
     """
     Headless accident monitoring system using YOLO
     Fetches video from database and saves detections
     """
     
+    EVIDENCE_DIR = Path("accident_evidence")
+    
     def __init__(
         self,
         junction_id: str,
         model_path: str = 'best.pt',
         confidence_threshold: float = 0.75,
-        camera_id: Optional[str] = None
+        camera_id: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+        record_clips: bool = True,
+        trigger: Optional[AnomalyTrigger] = None,
+        phase_number: int = 1,
+        model=None,
+        evidence_writer: Optional[EvidenceWriter] = None
     ):
         """
         Initialize accident monitor
@@ -52,48 +91,68 @@ class AccidentMonitor:
             model_path: Path to trained YOLO model
             confidence_threshold: Minimum confidence for detection (0.0-1.0)
             camera_id: Optional camera ID
+            start_time: Timestamp of the first video frame (defaults to now)
+            record_clips: Save a pre/post-event video clip per incident
+            trigger: Anomaly trigger deciding when and where the model runs
+                     (None runs it on every full frame)
+            phase_number: Signal phase whose video source is monitored
+            model: Already loaded YOLO model to share between monitors (loaded from model_path if None)
+            evidence_writer: Evidence writer to share between monitors (one is created if None)
         """
         self.junction_id = junction_id
+        self.phase_number = phase_number
         self.camera_id = camera_id
         self.confidence_threshold = confidence_threshold
         self.model_path = model_path
-        self.model = None
+        self.model = model
         self.video_source = None
         self.db_session: Optional[Session] = None
         
-        # Create evidence directory
-        self.evidence_dir = Path("accident_evidence")
+        # Pipeline clock (video timestamps), created when the video is opened
+        self.start_time = start_time
+        self.clock: Optional[PipelineClock] = None
+        
+        # Create evidence directory; images and records are written off the frame loop
+        self.evidence_dir = self.EVIDENCE_DIR
         self.evidence_dir.mkdir(exist_ok=True)
+        self.owns_writer = evidence_writer is None
+        self.evidence_writer = evidence_writer or EvidenceWriter(self.evidence_dir)
+        
+        # Pre/post-event clips, created once the video source is known
+        self.record_clips = record_clips
+        self.clip_recorder: Optional[ClipRecorder] = None
         
         # Accident class IDs (from trained model)
         self.accident_class_ids = [1, 2, 3, 4]
         
-        # Cooldown to prevent duplicate saves
-        self.last_save_time = 0
-        self.save_cooldown = 5.0  # seconds
+        # Frame-pipeline head state
+        self.trigger = trigger
+        self.model_runs = 0
+        self.frame_count = 0
+        self.accident_count = 0
+        
+        # Detections are clustered into incidents; one record per incident
+        self.incident_tracker = IncidentTracker()
+        self.update_min_gain = Config.INCIDENT_UPDATE_MIN_GAIN
         
-        logging.info(f"Initializing Accident Monitor for junction {junction_id}")
+        logging.info(f"Initializing Accident Monitor for junction {junction_id}, phase {phase_number}")
         logging.info(f"Confidence threshold: {confidence_threshold}")
         
-    def initialize(self) -> bool:
+    def initialize(self, video_source: Optional[str] = None) -> bool:
         """
         Initialize model and database connection
         
+        Args:
+            video_source: Video source to use; fetched from the database if omitted
+        
         Returns:
             True if successful, False otherwise
         """
-        # Load YOLO model
-        if not os.path.exists(self.model_path):
-            logging.error(f"Model not found at {self.model_path}")
-            return False
-            
-        try:
-            logging.info(f"Loading YOLO model from {self.model_path}...")
-            self.model = YOLO(self.model_path)
-            logging.info("Model loaded successfully")
-        except Exception as e:
-            logging.error(f"Error loading model: {e}")
-            return False
+        # Load YOLO model (unless one is shared with other monitors)
+        if self.model is None:
+            self.model = load_model(self.model_path)
+            if self.model is None:
+                return False
             
         # Initialize database session
         try:
@@ -103,10 +162,17 @@ class AccidentMonitor:
             logging.error(f"Error creating database session: {e}")
             return False
             
-        # Fetch video source from database
-        if not self.fetch_video_source():
+        self.evidence_writer.start()
+            
+        # Video source is shared when running as a head of a frame pipeline
+        if video_source:
+            self.video_source = video_source
+        elif not self.fetch_video_source():
             return False
             
+        if self.record_clips:
+            self.clip_recorder = ClipRecorder(self.video_source, self.evidence_dir / CLIP_DIR)
+            
         return True
         
     def fetch_video_source(self) -> bool:
@@ -126,10 +192,10 @@ class AccidentMonitor:
                 logging.error(f"Junction {self.junction_id} not found in database")
                 return False
                 
-            # Try to get video source from signal_phases (phase 1 by default)
+            # Get video source from signal_phases for the monitored phase
             phase = self.db_session.query(SignalPhase).filter(
                 SignalPhase.junction_id == self.junction_id,
-                SignalPhase.phase_number == 1
+                SignalPhase.phase_number == self.phase_number
             ).first()
             
             if phase and phase.video_source:
@@ -143,7 +209,7 @@ class AccidentMonitor:
                     
                 return True
             else:
-                logging.error(f"No video source found for junction {self.junction_id}")
+                logging.error(f"No video source found for junction {self.junction_id}, phase {self.phase_number}")
                 logging.info("Please set video_source in signal_phases table")
                 return False
                 
@@ -176,191 +242,271 @@ class AccidentMonitor:
         frame,
         confidence: float,
         detected_class: str,
-        bbox_data: list
+        bbox_data: list,
+        incident: Optional[Incident] = None
     ) -> Optional[str]:
         """
-        Save evidence photo and create database record
+        Queue the evidence photo and database record for the background writer
         
         Args:
-            frame: Video frame with accident
+            frame: Raw video frame with accident (boxes are drawn by the writer)
             confidence: Detection confidence
             detected_class: Detected class name
             bbox_data: Bounding box data
+            incident: Incident the record belongs to; later updates are routed by its ID
             
         Returns:
-            Path to saved evidence file, or None if failed
+            Path the evidence file will be written to, or None if it could not be queued
         """
-        try:
-            # Generate filename with junction, timestamp, and confidence
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            conf_str = f"{confidence:.2f}".replace('.', '_')
-            class_str = detected_class.replace(' ', '_')
-            filename = f"{self.junction_id}_{timestamp}_conf_{conf_str}_{class_str}.jpg"
-            filepath = self.evidence_dir / filename
+        # Generate filename with junction, video timestamp, and confidence
+        detected_at = self.clock.now()
+        timestamp = detected_at.strftime("%Y%m%d_%H%M%S")
+        conf_str = f"{confidence:.2f}".replace('.', '_')
+        class_str = detected_class.replace(' ', '_')
+        incident_str = f"_p{self.phase_number}_inc_{incident.id}" if incident else ""
+        filename = f"{self.junction_id}_{timestamp}{incident_str}_conf_{conf_str}_{class_str}.jpg"
+        
+        record = accident_record(
+            confidence,
+            filename=filename,
+            junction_id=self.junction_id,
+            camera_id=self.camera_id,
+            severity=(incident.severity if incident else None) or self.determine_severity(confidence, len(bbox_data)),
+            description=f"{detected_class} detected with {confidence:.2%} confidence",
+            bounding_boxes=bbox_data,
+            detection_metadata={
+                'model_path': self.model_path,
+                'detected_class': detected_class,
+                'detection_time': timestamp,
+                'incident': incident.to_metadata() if incident else None
+            },
+            status='active',
+            detected_at=detected_at
+        )
+        
+        key = self.incident_key(incident) if incident else f"{self.junction_id}_p{self.phase_number}_frame_{self.clock.frame_index}"
+        if not self.evidence_writer.submit_create(key, frame, list(bbox_data), record):
+            return None
             
-            # Save image
-            cv2.imwrite(str(filepath), frame)
-            logging.info(f"Evidence photo saved: {filepath}")
+        if incident:
+            incident.persisted = True
+            incident.persisted_confidence = confidence
             
-            # Create database record
-            accident = Accident(
-                junction_id=self.junction_id,
-                camera_id=self.camera_id,
-                confidence_score=Decimal(str(confidence)),
-                severity=self.determine_severity(confidence, len(bbox_data)),
-                description=f"{detected_class} detected with {confidence:.2%} confidence",
-                image_path=str(filepath.absolute()),
-                bounding_boxes=json.dumps(bbox_data),
-                detection_metadata=json.dumps({
-                    'model_path': self.model_path,
-                    'detected_class': detected_class,
-'detection_time': timestamp
-                }),
-                status='active'
-            )
+            # Clip around the first sighting; its path is added to the record once written
+            if self.clip_recorder:
+                self.clip_recorder.request_clip(
+                    Path(filename).stem,
+                    incident.first_seen,
+                    on_done=lambda path, key=key: self.evidence_writer.submit_update(
+                        key, {'video_path': f"{CLIP_DIR}/{Path(path).name}"}, block=True
+                    )
+                )
             
-            self.db_session.add(accident)
-            self.db_session.commit()
+        return str(self.evidence_dir / filename)
+        
+    def update_accident_record(self, incident: Incident) -> bool:
+        """
+        Queue an update of an incident's existing accident record instead of inserting a new one
+        
+        Args:
+            incident: Incident whose evidence was already queued
             
-            logging.info(f"✅ Accident record created in database (ID: {accident.id})")
-            logging.info(f"   Severity: {accident.severity} | Confidence: {confidence:.2%}")
+        Returns:
+            True if queued, False otherwise
+        """
+        if not incident.persisted:
+            return False
             
-            return str(filepath)
+        confidence = incident.confidence
+        record = accident_record(
+            confidence,
+            severity=incident.severity or self.determine_severity(confidence, len(incident.detections)),
+            description=f"{incident.detected_class} detected with {confidence:.2%} confidence",
+            bounding_boxes=incident.detections,
+            detection_metadata={
+                'model_path': self.model_path,
+                'detected_class': incident.detected_class,
+                'detection_time': self.clock.at(incident.first_seen).strftime("%Y%m%d_%H%M%S"),
+                'incident': incident.to_metadata()
+            }
+        )
+        
+        if not self.evidence_writer.submit_update(self.incident_key(incident), record):
+            return False
             
-        except Exception as e:
-            logging.error(f"Error saving accident evidence: {e}")
-            if self.db_session:
-                self.db_session.rollback()
-            return None
+        incident.persisted_confidence = confidence
+        logging.info(f"Accident record update queued (incident {incident.id}, "
+                     f"{incident.frames_seen} frames, confidence {confidence:.2%})")
+        return True
             
-    def process_video(self, max_frames: Optional[int] = None) -> int:
+    def incident_key(self, incident: Incident) -> tuple:
+        """Key routing an incident's record updates through a (possibly shared) evidence writer"""
+        return (self.junction_id, self.phase_number, incident.id)
+        
+    def process_frame(self, frame, clock: PipelineClock):
         """
-        Process video feed for accident detection
+        Run accident detection on one full frame (frame-pipeline head)
         
         Args:
-            max_frames: Maximum frames to process (None for entire video)
-            
+            frame: Full video frame
+            clock: Pipeline clock positioned at this frame
+        """
+        regions = self.select_regions(frame, clock)
+        results = []
+        if regions:
+            # Run YOLO inference (one batched call for all regions)
+            results = self.model(crop_regions(frame, regions), conf=self.confidence_threshold, verbose=False)
+        self.process_results(frame, clock, regions, results)
+        
+    def select_regions(self, frame, clock: PipelineClock) -> list:
+        """
+        Decide where the accident model runs on this frame
+        
         Returns:
-            Number of accidents detected
+            List of regions [x1, y1, x2, y2] (None for the full frame); empty to skip the model
         """
-        logging.info(f"Opening video source: {self.video_source}")
+        # Cheap signals decide whether, and on which regions, the accident model runs
+        return self.trigger.evaluate(frame, clock) if self.trigger else [None]
         
-        cap = cv2.VideoCapture(self.video_source)
+    def process_results(self, frame, clock: PipelineClock, regions: list, results: list):
+        """
+        Turn model results for the selected regions into incidents and evidence
         
-        if not cap.isOpened():
-            logging.error(f"Could not open video file: {self.video_source}")
-            return 0
-            
-        # Get video properties
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        logging.info(f"Video properties: {total_frames} frames @ {fps:.2f} FPS")
+        Detections are clustered into incidents, which must be confirmed by
+        N-of-M voting before anything is persisted. A confirmed incident saves
+        evidence and inserts a record; while it stays visible its record is only
+        updated when confidence improves, and once more when it closes.
         
-        frame_count = 0
-        accident_count = 0
-        start_time = time.time()
+        Args:
+            frame: Full video frame
+            clock: Pipeline clock positioned at this frame
+            regions: Regions returned by select_regions
+            results: One YOLO result per region
+        """
+        self.clock = clock
+        self.frame_count += 1
+        self.model_runs += len(regions)
         
-        logging.info("Starting headless accident detection...")
-        logging.info(f"Confidence threshold: {self.confidence_threshold}")
+        # Collect significant accident detections, in full-frame coordinates
+        detections = []
+        for region, result in zip(regions, results):
+            offset_x, offset_y = (0, 0) if region is None else (region[0], region[1])
+            boxes = result.boxes
+            if boxes is not None:
+                for box in boxes:
+                    cls_id = int(box.cls[0])
+                    confidence = float(box.conf[0])
+                    
+                    if cls_id in self.accident_class_ids and confidence >= self.confidence_threshold:
+                        detected_class = self.model.names[cls_id]
+                        
+                        # Ignore 'minor' class detections - only process 'moderate' or 'severe'
+                        if 'minor' in detected_class.lower():
+                            logging.debug(f"Minor class accident detected at frame {clock.frame_index + 1} - Ignoring")
+                            continue
+                            
+                        x1, y1, x2, y2 = box.xyxy[0].tolist()
+                        detections.append({
+                            'class': detected_class,
+                            'confidence': confidence,
+                            'bbox': [x1 + offset_x, y1 + offset_y, x2 + offset_x, y2 + offset_y]
+                        })
+                        
+        # Per-detection severity, voted on by the incident
+        for detection in detections:
+            detection['severity'] = self.determine_severity(detection['confidence'], len(detections))
+            
+        new_incidents, seen_incidents, closed_incidents = self.incident_tracker.update(
+            detections, clock.elapsed, evaluated=bool(regions)
+        )
         
-        while True:
-            success, frame = cap.read()
-            if not success:
-                logging.info("End of video stream")
-                break
+        # Keep evaluating open incidents (candidates included) until they are confirmed or close
+        if self.trigger:
+            for incident in self.incident_tracker.open_incidents:
+                self.trigger.hold(incident.bbox, frame.shape, clock.elapsed)
                 
-            frame_count += 1
+        # Confirmed incidents: evidence photo + record (rendered and written in the background)
+        for incident in new_incidents:
+            logging.warning(f"⚠️ ACCIDENT DETECTED at frame {clock.frame_index + 1} (incident {incident.id})!")
+            logging.info(f"Class: {incident.detected_class} | Confidence: {incident.confidence:.2%} "
+                         f"({sum(incident.hits)} of last {len(incident.hits)} evaluations)")
             
-            # Check max frames limit
-            if max_frames and frame_count > max_frames:
-                logging.info(f"Reached maximum frame limit: {max_frames}")
-                break
+            evidence_path = self.save_accident_evidence(
+                frame,
+                incident.confidence,
+                incident.detected_class,
+                incident.detections,
+                incident
+            )
+            if evidence_path:
+                self.accident_count += 1
                 
-            # Run YOLO inference
-            results = self.model(frame, conf=self.confidence_threshold, verbose=False)
+        # Incidents still visible: update only when confidence improves noticeably
+        for incident in seen_incidents:
+            if incident.confidence >= incident.persisted_confidence + self.update_min_gain:
+                self.update_accident_record(incident)
+                
+        # Closed incidents: final update with duration and frame count
+        for incident in closed_incidents:
+            logging.info(f"Incident {incident.id} closed after {incident.frames_seen} frames")
+            self.update_accident_record(incident)
             
-            # Check for accidents
-            accident_detected = False
-            detected_class = ""
-            max_confidence = 0.0
-            bbox_list = []
+        # Progress logging every 100 frames
+        if self.frame_count % 100 == 0:
+            writer = self.evidence_writer.metrics()
+            logging.info(f"Accident head: {self.frame_count} frames | Incidents: {self.accident_count} "
+                         f"({len(self.incident_tracker.open_incidents)} open) | Model runs: {self.model_runs} | "
+                         f"Evidence queue: {writer['queue_depth']} | "
+                         f"Write latency: {writer['avg_latency_ms']:.1f} ms avg")
+            
+    def finish(self, clock: PipelineClock):
+        """Close open incidents and print the final report (frame-pipeline head)"""
+        for incident in self.incident_tracker.close_all():
+            self.update_accident_record(incident)
             
-            for result in results:
-                boxes = result.boxes
-                if boxes is not None:
-                    for box in boxes:
-                        cls_id = int(box.cls[0])
-                        confidence = float(box.conf[0])
-                        
-                        if cls_id in self.accident_class_ids and confidence >= self.confidence_threshold:
-                            accident_detected = True
-                            detected_class = self.model.names[cls_id]
-                            max_confidence = max(max_confidence, confidence)
-                            
-                            # Store bbox data
-                            bbox = box.xyxy[0].tolist()
-                            bbox_list.append({
-                                'class': detected_class,
-                                'confidence': confidence,
-                                'bbox': bbox
-                            })
-                            
-            # Save evidence if accident detected and cooldown passed
-            if accident_detected:
-                current_time = time.time()
-                if current_time - self.last_save_time > self.save_cooldown:
-                    # Ignore 'minor' class detections - only process 'moderate' or 'severe'
-                    if 'minor' in detected_class.lower():
-                        logging.info(f"Minor class accident detected at frame {frame_count} - Ignoring")
-                        continue
-                    
-                    logging.warning(f"⚠️ ACCIDENT DETECTED at frame {frame_count}!")
-                    logging.info(f"Class: {detected_class} | Confidence: {max_confidence:.2%}")
-                    
-                    # Get annotated frame
-                    annotated_frame = results[0].plot()
-                    
-                    # Save evidence
-                    evidence_path = self.save_accident_evidence(
-                        annotated_frame,
-                        max_confidence,
-                        detected_class,
-                        bbox_list
-                    )
-                    
-                    if evidence_path:
-                        accident_count += 1
-                        self.last_save_time = current_time
-                        
-                        # Stop after first significant accident
-                        logging.info("🛑 Stopping detection after first significant accident")
-                        break
-                        
-            # Progress logging every 100 frames
-            if frame_count % 100 == 0:
-                elapsed = time.time() - start_time
-                current_fps = frame_count / elapsed if elapsed > 0 else 0
-                progress = (frame_count / total_frames) * 100 if total_frames > 0 else 0
-                logging.info(f"Progress: {frame_count}/{total_frames} frames ({progress:.1f}%) | "
-                           f"FPS: {current_fps:.1f} | Accidents detected: {accident_count}")
-                    
-        cap.release()
-        
-        # Final report
-        elapsed_time = time.time() - start_time
         logging.info("="*60)
         logging.info("ACCIDENT DETECTION COMPLETED")
         logging.info("="*60)
-        logging.info(f"Frames processed: {frame_count}")
-        logging.info(f"Total accidents detected: {accident_count}")
-        logging.info(f"Processing time: {elapsed_time:.2f} seconds")
-        logging.info(f"Average FPS: {frame_count/elapsed_time:.2f}")
+        logging.info(f"Frames processed: {self.frame_count}")
+        logging.info(f"Accident model runs: {self.model_runs}")
+        if self.trigger:
+            logging.info(f"Anomaly trigger: {self.trigger.stats()}")
+        logging.info(f"Total accidents detected: {self.accident_count}")
+        logging.info(f"Unconfirmed candidates discarded: {self.incident_tracker.rejected_count}")
+        logging.info(f"Evidence writer: {self.evidence_writer.metrics()}")
         logging.info("="*60)
         
-        return accident_count
+    def process_video(self, max_frames: Optional[int] = None, every_n_frames: int = 1) -> int:
+        """
+        Process video feed for accident detection
+        
+        Args:
+            max_frames: Maximum frames to process (None for entire video)
+            every_n_frames: Run the accident model on every Nth frame
+            
+        Returns:
+            Number of accidents detected
+        """
+        logging.info("Starting headless accident detection...")
+        logging.info(f"Confidence threshold: {self.confidence_threshold}")
+        
+        pipeline = FramePipeline(self.video_source, start_time=self.start_time)
+        if self.clip_recorder:
+            # Every frame goes to the clip buffer before the detector sees it
+            pipeline.add_head(self.clip_recorder, name='clip_buffer')
+        pipeline.add_head(self, every_n_frames=every_n_frames, name='accident_detection')
+        pipeline.run(max_frames=max_frames)
+        
+        return self.accident_count
         
     def cleanup(self):
         """Cleanup resources"""
+        # Write pending clips and drain pending evidence before exiting
+        if self.clip_recorder:
+            self.clip_recorder.finish()
+        if self.owns_writer:
+            self.evidence_writer.stop()
+        
         if self.db_session:
             self.db_session.close()
             logging.info("Database session closed")
@@ -391,6 +537,13 @@ Examples:
         help='Junction ID to monitor (e.g., J-002)'
     )
     
+    parser.add_argument(
+        '--phase',
+        type=int,
+        default=1,
+        help='Signal phase whose video source is monitored (default: 1)'
+    )
+    
     parser.add_argument(
         '--camera',
         type=str,
@@ -417,14 +570,36 @@ Examples:
         help='Maximum frames to process (for testing)'
     )
     
+    parser.add_argument(
+        '--no-clips',
+        action='store_true',
+        help='Do not save pre/post-event video clips'
+    )
+    
+    parser.add_argument(
+        '--no-trigger',
+        action='store_true',
+        help='Run the accident model on every full frame instead of gating it with the motion trigger'
+    )
+    
+    parser.add_argument(
+        '--start-time',
+        type=str,
+        help='ISO 8601 timestamp of the first video frame, for backfills (default: now)'
+    )
+    
     args = parser.parse_args()
     
     # Create monitor instance
     monitor = AccidentMonitor(
         junction_id=args.junction,
+        phase_number=args.phase,
         model_path=args.model,
         confidence_threshold=args.confidence,
-        camera_id=args.camera
+        camera_id=args.camera,
+        start_time=parse_start_time(args.start_time),
+        record_clips=not args.no_clips,
+        trigger=None if args.no_trigger else AnomalyTrigger()
     )
     
     # Initialize
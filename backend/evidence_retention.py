@@ -0,0 +1,138 @@
+"""
+Evidence Retention - compacts old accident evidence
+Resolved and false-positive accidents older than the retention period keep a
+downscaled, lower-quality image (plus their thumbnail); the full-size image
+and the video clip are deleted once no other record references them.
+
+Run periodically (e.g. daily from cron):
+    python evidence_retention.py
+    python evidence_retention.py --days 14 --dry-run
+"""
+
+import argparse
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import cv2
+
+from config import Config
+from database import SessionLocal
+from models import Accident
+from evidence_storage import COMPACT_DIR, encode_jpeg, resolve_path, store_bytes
+
+COMPACTABLE_STATUSES = ('resolved', 'false_positive')
+
+
+def is_referenced(db, column, path: str) -> bool:
+    """Whether any accident record still points at the file"""
+    return db.query(Accident.id).filter(column == path).first() is not None
+
+
+def delete_if_unreferenced(db, evidence_dir: Path, column, path: str) -> int:
+    """Delete an evidence file no record references any more; returns bytes freed"""
+    filepath = resolve_path(evidence_dir, path)
+    if not filepath.exists() or is_referenced(db, column, path):
+        return 0
+    size = filepath.stat().st_size
+    filepath.unlink()
+    return size
+
+
+def compact_evidence(evidence_dir: Path, days: int = Config.EVIDENCE_RETENTION_DAYS,
+                     dry_run: bool = False) -> dict:
+    """
+    Compact evidence of resolved/false-positive accidents older than the retention period
+
+    Args:
+        evidence_dir: Evidence root directory
+        days: Retention period in days
+        dry_run: Report what would change without writing
+
+    Returns:
+        Summary with counts and bytes freed
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    summary = {'accidents': 0, 'images_compacted': 0, 'clips_removed': 0, 'bytes_freed': 0}
+    stale = []  # (column, old path) of replaced files
+
+    db = SessionLocal()
+    try:
+        accidents = db.query(Accident).filter(
+            Accident.status.in_(COMPACTABLE_STATUSES),
+            Accident.detected_at < cutoff
+        ).all()
+
+        for accident in accidents:
+            changed = False
+            old_image = accident.image_path
+
+            if old_image and not old_image.startswith(f"{COMPACT_DIR}/"):
+                source = resolve_path(evidence_dir, old_image)
+                image = cv2.imread(str(source)) if source.exists() else None
+                if image is not None:
+                    data = encode_jpeg(image, Config.EVIDENCE_COMPACT_QUALITY, Config.EVIDENCE_COMPACT_MAX_SIDE)
+                    if dry_run:
+                        summary['bytes_freed'] += max(0, source.stat().st_size - len(data))
+                    else:
+                        accident.image_path = store_bytes(evidence_dir, COMPACT_DIR, data)
+                        summary['bytes_freed'] -= len(data)
+                        stale.append((Accident.image_path, old_image))
+                    summary['images_compacted'] += 1
+                    changed = True
+
+            old_clip = accident.video_path
+            if old_clip:
+                clip_file = resolve_path(evidence_dir, old_clip)
+                if dry_run:
+                    summary['bytes_freed'] += clip_file.stat().st_size if clip_file.exists() else 0
+                else:
+                    accident.video_path = None
+                    stale.append((Accident.video_path, old_clip))
+                summary['clips_removed'] += 1
+                changed = True
+
+            if changed:
+                summary['accidents'] += 1
+                if not dry_run:
+                    metadata = json.loads(accident.detection_metadata or '{}')
+                    metadata['compacted_at'] = datetime.now(timezone.utc).isoformat()
+                    accident.detection_metadata = json.dumps(metadata)
+
+        if not dry_run:
+            db.commit()
+
+            # Files are only removed once the records no longer point at them
+            for column, path in stale:
+                summary['bytes_freed'] += delete_if_unreferenced(db, evidence_dir, column, path)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    return summary
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Compact evidence of resolved/false-positive accidents')
+    parser.add_argument('--days', type=int, default=Config.EVIDENCE_RETENTION_DAYS,
+                        help=f'Retention period in days (default: {Config.EVIDENCE_RETENTION_DAYS})')
+    parser.add_argument('--evidence-dir', type=str, default='accident_evidence',
+                        help='Evidence root directory (default: accident_evidence)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Report what would be compacted without changing anything')
+    args = parser.parse_args()
+
+    summary = compact_evidence(Path(args.evidence_dir), days=args.days, dry_run=args.dry_run)
+    prefix = "[dry run] " if args.dry_run else ""
+    logging.info(f"{prefix}Compacted {summary['accidents']} accident(s): "
+                 f"{summary['images_compacted']} image(s) recompressed, {summary['clips_removed']} clip(s) removed, "
+                 f"{summary['bytes_freed'] / (1024 * 1024):.1f} MB freed")
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,88 @@
+# evidence_storage.py
+"""
+Tiered, content-hashed storage for accident evidence images.
+
+Each evidence image is stored twice under accident_evidence/:
+    full/<aa>/<bb>/<sha256>.jpg     full-size annotated frame
+    thumbs/<aa>/<bb>/<sha256>.jpg   small thumbnail for list views
+Names are the hash of the encoded bytes, so identical images are stored once
+and URLs never change content (safe to cache forever). The database keeps
+paths relative to the evidence directory; they map directly to /evidence/ URLs.
+
+Resolved and false-positive evidence is later compacted by evidence_retention.py
+into compact/ (downscaled, lower quality).
+"""
+
+import hashlib
+import os
+from pathlib import Path
+from typing import Optional, Tuple
+
+import cv2
+
+from config import Config
+
+FULL_DIR = "full"
+THUMB_DIR = "thumbs"
+COMPACT_DIR = "compact"
+CLIP_DIR = "clips"
+
+
+def encode_jpeg(image, quality: int, max_side: Optional[int] = None) -> bytes:
+    """Encode an image as JPEG, downscaling it first so its longest side is at most max_side"""
+    if max_side:
+        height, width = image.shape[:2]
+        scale = max_side / max(height, width)
+        if scale < 1.0:
+            image = cv2.resize(image, (max(1, int(width * scale)), max(1, int(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+    ok, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise IOError("JPEG encoding failed")
+    return encoded.tobytes()
+
+
+def store_bytes(evidence_dir: Path, tier: str, data: bytes, suffix: str = '.jpg') -> str:
+    """
+    Store bytes under a content-hashed name
+
+    Args:
+        evidence_dir: Evidence root directory
+        tier: Sub-directory (FULL_DIR, THUMB_DIR, COMPACT_DIR)
+        data: File content
+        suffix: File extension
+
+    Returns:
+        Path relative to evidence_dir, e.g. 'full/3f/a2/3fa2....jpg'
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    relative = f"{tier}/{digest[:2]}/{digest[2:4]}/{digest}{suffix}"
+    filepath = Path(evidence_dir) / relative
+
+    # Same content, same name: an existing file is already correct
+    if not filepath.exists():
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = filepath.with_suffix(suffix + '.tmp')
+        temp_path.write_bytes(data)
+        os.replace(temp_path, filepath)
+    return relative
+
+
+def store_evidence_image(evidence_dir: Path, image,
+                         quality: int = Config.EVIDENCE_JPEG_QUALITY) -> Tuple[str, str, int]:
+    """
+    Store an annotated evidence frame as full image plus thumbnail
+
+    Returns:
+        (full image relative path, thumbnail relative path, bytes encoded)
+    """
+    full = encode_jpeg(image, quality)
+    thumb = encode_jpeg(image, Config.EVIDENCE_THUMBNAIL_QUALITY, Config.EVIDENCE_THUMBNAIL_SIZE)
+    return (store_bytes(evidence_dir, FULL_DIR, full),
+            store_bytes(evidence_dir, THUMB_DIR, thumb),
+            len(full) + len(thumb))
+
+
+def resolve_path(evidence_dir: Path, path: str) -> Path:
+    """Filesystem path of a stored evidence path (relative, or absolute for older records)"""
+    return Path(path) if os.path.isabs(path) else Path(evidence_dir) / path
@@ -0,0 +1,273 @@
+# evidence_writer.py
+"""
+Asynchronous accident evidence writer.
+
+The inference loop only enqueues the raw frame and box data. A background
+thread renders the annotation, encodes the JPEG and its thumbnail, writes
+them to the content-hashed evidence store (evidence_storage.py) and
+creates/updates the accident record, retrying transient failures. The queue
+is bounded so a slow disk or database cannot grow memory without limit.
+"""
+
+import json
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, Optional
+
+import cv2
+
+from config import Config
+from database import SessionLocal
+from evidence_storage import store_evidence_image
+from models import Accident
+
+_STOP = object()
+
+
+def render_detections(frame, detections: list):
+    """Draw accident boxes and labels on a copy of the frame"""
+    annotated = frame.copy()
+    for detection in detections:
+        x1, y1, x2, y2 = [int(v) for v in detection['bbox']]
+        label = f"{detection['class']} {detection['confidence']:.2f}"
+        cv2.rectangle(annotated, (x1, y1), (x2, y2), (0, 0, 255), 2)
+        label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
+        cv2.rectangle(annotated, (x1, y1 - 25), (x1 + label_size[0], y1), (0, 0, 255), -1)
+        cv2.putText(annotated, label, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+    return annotated
+
+
+class EvidenceWriter:
+    """
+    Background writer for accident evidence images and database records
+    """
+
+    def __init__(
+        self,
+        evidence_dir: Path,
+        max_queue: int = Config.EVIDENCE_QUEUE_SIZE,
+        max_retries: int = Config.EVIDENCE_MAX_RETRIES,
+        retry_backoff: float = 0.5,
+        jpeg_quality: int = Config.EVIDENCE_JPEG_QUALITY,
+        max_tracked_incidents: int = Config.EVIDENCE_MAX_TRACKED_INCIDENTS
+    ):
+        """
+        Initialize the writer
+
+        Args:
+            evidence_dir: Directory for evidence images
+            max_queue: Maximum queued jobs; further updates are dropped, creates wait briefly
+            max_retries: Attempts per job before it is counted as failed
+            retry_backoff: Base delay between attempts in seconds (doubles each retry)
+            jpeg_quality: JPEG quality for evidence images (0-100)
+            max_tracked_incidents: Incidents whose record ID is kept for updates; the least
+                                   recently written is forgotten first
+        """
+        self.evidence_dir = Path(evidence_dir)
+        self.evidence_dir.mkdir(exist_ok=True)
+        self.max_retries = max(1, max_retries)
+        self.retry_backoff = retry_backoff
+        self.jpeg_quality = jpeg_quality
+        self.max_tracked_incidents = max(1, max_tracked_incidents)
+
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self.thread: Optional[threading.Thread] = None
+        self.db_session = None
+
+        # Incident key -> accident record ID (LRU, bounded), owned by the writer thread
+        self.accident_ids: OrderedDict = OrderedDict()
+
+        # Metrics
+        self.lock = threading.Lock()
+        self.jobs_enqueued = 0
+        self.jobs_written = 0
+        self.jobs_failed = 0
+        self.jobs_dropped = 0
+        self.retries = 0
+        self.max_queue_depth = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.last_latency = 0.0
+
+    def start(self):
+        """Start the background thread"""
+        if self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self._run, name="evidence-writer", daemon=True)
+        self.thread.start()
+        logging.info(f"Evidence writer started (queue size {self.queue.maxsize})")
+
+    def stop(self, timeout: Optional[float] = 30.0):
+        """Drain the queue and stop the background thread"""
+        if self.thread is None:
+            return
+        self.queue.put(_STOP)
+        self.thread.join(timeout)
+        if self.thread.is_alive():
+            logging.warning(f"Evidence writer did not drain within {timeout}s "
+                            f"({self.queue.qsize()} job(s) left)")
+        self.thread = None
+        logging.info(f"Evidence writer stopped: {self.metrics()}")
+
+    def submit_create(self, key, frame, detections: list, record: Dict) -> bool:
+        """
+        Queue evidence rendering and a new accident record
+
+        Args:
+            key: Incident key used to route later updates to this record
+            frame: Raw (unannotated) frame
+            detections: List of {'class', 'confidence', 'bbox'} to draw
+            record: Accident column values plus 'filename'
+
+        Returns:
+            True if queued
+        """
+        job = {'action': 'create', 'key': key, 'frame': frame, 'detections': detections, 'record': record}
+        return self._enqueue(job, block=True)
+
+    def submit_update(self, key, record: Dict, block: bool = False) -> bool:
+        """
+        Queue an update to the accident record of an incident
+
+        Args:
+            key: Incident key given to submit_create
+            record: Accident column values to overwrite
+            block: Wait briefly for queue space; by default updates are dropped
+                   rather than stall the frame loop
+
+        Returns:
+            True if queued
+        """
+        job = {'action': 'update', 'key': key, 'record': record}
+        return self._enqueue(job, block=block)
+
+    def _enqueue(self, job: Dict, block: bool) -> bool:
+        job['enqueued_at'] = time.perf_counter()
+        try:
+            self.queue.put(job, block=block, timeout=Config.EVIDENCE_ENQUEUE_TIMEOUT if block else None)
+        except queue.Full:
+            with self.lock:
+                self.jobs_dropped += 1
+            logging.warning(f"Evidence queue full, dropped {job['action']} job for incident {job['key']}")
+            return False
+
+        with self.lock:
+            self.jobs_enqueued += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+        return True
+
+    def metrics(self) -> Dict:
+        """Queue depth and write latency metrics"""
+        with self.lock:
+            written = self.jobs_written
+            return {
+                'queue_depth': self.queue.qsize(),
+                'max_queue_depth': self.max_queue_depth,
+                'enqueued': self.jobs_enqueued,
+                'written': written,
+                'failed': self.jobs_failed,
+                'dropped': self.jobs_dropped,
+                'retries': self.retries,
+                'last_latency_ms': round(self.last_latency * 1000, 1),
+                'avg_latency_ms': round(self.total_latency / written * 1000, 1) if written else 0.0,
+                'max_latency_ms': round(self.max_latency * 1000, 1),
+            }
+
+    def _run(self):
+        """Writer thread: process jobs until the stop marker"""
+        self.db_session = SessionLocal()
+        try:
+            while True:
+                job = self.queue.get()
+                if job is _STOP:
+                    break
+                self._process(job)
+        finally:
+            self.db_session.close()
+
+    def _process(self, job: Dict):
+        """Run one job with retries and record its latency"""
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                if job['action'] == 'create':
+                    self._write_create(job)
+                else:
+                    self._write_update(job)
+                break
+            except Exception as e:
+                self.db_session.rollback()
+                if attempt == self.max_retries:
+                    with self.lock:
+                        self.jobs_failed += 1
+                    logging.error(f"Evidence {job['action']} for incident {job['key']} failed "
+                                  f"after {attempt} attempt(s): {e}")
+                    return
+                with self.lock:
+                    self.retries += 1
+                logging.warning(f"Evidence {job['action']} attempt {attempt} failed: {e}; retrying")
+                time.sleep(self.retry_backoff * (2 ** (attempt - 1)))
+
+        latency = time.perf_counter() - job['enqueued_at']
+        with self.lock:
+            self.jobs_written += 1
+            self.last_latency = latency
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+
+    def _write_create(self, job: Dict):
+        """Render, encode and save the evidence image and thumbnail, then insert the accident record"""
+        record = dict(job['record'])
+        name = record.pop('filename')
+
+        annotated = render_detections(job['frame'], job['detections'])
+        image_path, thumbnail_path, size = store_evidence_image(self.evidence_dir, annotated, self.jpeg_quality)
+        logging.info(f"Evidence photo saved: {name} -> {image_path} ({size / 1024:.0f} KB with thumbnail)")
+
+        accident = Accident(image_path=image_path, thumbnail_path=thumbnail_path, **record)
+        self.db_session.add(accident)
+        self.db_session.commit()
+        self._remember(job['key'], accident.id)
+
+        logging.info(f"✅ Accident record created in database (ID: {accident.id})")
+        logging.info(f"   Severity: {accident.severity} | Confidence: {float(accident.confidence_score):.2%}")
+
+    def _remember(self, key, accident_id: int):
+        """Map an incident to its record, forgetting the least recently written beyond the cap"""
+        self.accident_ids[key] = accident_id
+        self.accident_ids.move_to_end(key)
+        while len(self.accident_ids) > self.max_tracked_incidents:
+            old_key, old_id = self.accident_ids.popitem(last=False)
+            logging.debug(f"Forgot accident record {old_id} of incident {old_key}")
+
+    def _write_update(self, job: Dict):
+        """Apply an update to the incident's accident record"""
+        accident_id = self.accident_ids.get(job['key'])
+        if accident_id is None:
+            logging.warning(f"No accident record for incident {job['key']}; update skipped")
+            return
+        self.accident_ids.move_to_end(job['key'])
+
+        accident = self.db_session.query(Accident).filter(Accident.id == accident_id).first()
+        if not accident:
+            logging.error(f"Accident record {accident_id} not found")
+            return
+
+        for column, value in job['record'].items():
+            setattr(accident, column, value)
+        self.db_session.commit()
+        logging.info(f"Accident record {accident_id} updated (incident {job['key']})")
+
+
+def accident_record(confidence: float, **columns) -> Dict:
+    """Accident column values with JSON fields serialized and confidence as Decimal"""
+    record = dict(columns)
+    record['confidence_score'] = Decimal(str(confidence))
+    for field in ('bounding_boxes', 'detection_metadata'):
+        if field in record and not isinstance(record[field], str):
+            record[field] = json.dumps(record[field])
+    return record
@@ -0,0 +1,148 @@
+# frame_pipeline.py
+"""
+Single-decode multi-model frame pipeline.
+
+A video source is opened and decoded once; every decoded frame is fanned out
+to any number of model "heads" (vehicle counting on the phase ROI, accident
+detection on the full frame, ...). Each head has its own cadence, e.g.
+accidents on every 3rd frame, so one camera costs one decode and one process.
+
+A head is any object with:
+    process_frame(frame, clock)   called on the head's cadence
+    finish(clock)                 optional, called once at end of stream
+    finished                      optional attribute; True stops feeding the head
+"""
+
+import logging
+import time
+from typing import List, Optional
+
+import cv2
+
+from pipeline_clock import PipelineClock
+
+
+class PipelineHead:
+    """Registration of one model head with its cadence and timing stats"""
+
+    def __init__(self, head, every_n_frames: int = 1, name: Optional[str] = None):
+        self.head = head
+        self.every_n_frames = max(1, int(every_n_frames))
+        self.name = name or type(head).__name__
+        self.frames_processed = 0
+        self.busy_seconds = 0.0
+
+    def due(self, frame_index: int) -> bool:
+        """Whether this head runs on the given frame"""
+        return frame_index % self.every_n_frames == 0 and not getattr(self.head, 'finished', False)
+
+
+class FramePipeline:
+    """
+    Decodes a video source once and fans frames out to model heads
+    """
+
+    def __init__(self, video_source: str, start_time=None):
+        """
+        Initialize the pipeline
+
+        Args:
+            video_source: Path to video file or camera stream URL
+            start_time: Timestamp of the first frame for the pipeline clock (defaults to now)
+        """
+        self.video_source = video_source
+        self.start_time = start_time
+        self.heads: List[PipelineHead] = []
+        self.clock: Optional[PipelineClock] = None
+        self.frames_decoded = 0
+
+    def add_head(self, head, every_n_frames: int = 1, name: Optional[str] = None) -> "FramePipeline":
+        """
+        Register a model head
+
+        Args:
+            head: Object implementing process_frame(frame, clock)
+            every_n_frames: Run the head on every Nth decoded frame
+            name: Name used in logs (defaults to the head's class name)
+        """
+        registration = PipelineHead(head, every_n_frames, name)
+        self.heads.append(registration)
+        logging.info(f"Pipeline head '{registration.name}' added (every {registration.every_n_frames} frame(s))")
+        return self
+
+    def run(self, max_frames: Optional[int] = None) -> int:
+        """
+        Decode the source and feed every head on its cadence
+
+        Args:
+            max_frames: Maximum frames to decode (None for entire video)
+
+        Returns:
+            Number of frames decoded
+        """
+        logging.info(f"Opening video source: {self.video_source}")
+        video = cv2.VideoCapture(self.video_source)
+
+        if not video.isOpened():
+            logging.error(f"Could not open video source: {self.video_source}")
+            return 0
+
+        fps = video.get(cv2.CAP_PROP_FPS)
+        total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+        logging.info(f"Video properties: {total_frames} frames @ {fps:.2f} FPS")
+
+        # Event times follow the video timestamps, so replays faster than real time stay correct
+        self.clock = PipelineClock.for_capture(video, start_time=self.start_time)
+
+        log_interval = max(1, total_frames // 10) if total_frames > 0 else 1000
+        start_time = time.time()
+
+        try:
+            while True:
+                if max_frames and self.frames_decoded >= max_frames:
+                    logging.info(f"Reached maximum frame limit: {max_frames}")
+                    break
+
+                ret, frame = video.read()
+                if not ret:
+                    logging.info("End of video stream.")
+                    break
+
+                frame_index = self.frames_decoded
+                self.frames_decoded += 1
+                self.clock.tick(video)
+
+                for registration in self.heads:
+                    if registration.due(frame_index):
+                        head_start = time.perf_counter()
+                        registration.head.process_frame(frame, self.clock)
+                        registration.busy_seconds += time.perf_counter() - head_start
+                        registration.frames_processed += 1
+
+                if self.heads and all(getattr(r.head, 'finished', False) for r in self.heads):
+                    logging.info("All pipeline heads finished.")
+                    break
+
+                if self.frames_decoded % log_interval == 0:
+                    elapsed = time.time() - start_time
+                    current_fps = self.frames_decoded / elapsed if elapsed > 0 else 0
+                    progress = f" ({self.frames_decoded / total_frames * 100:.1f}%)" if total_frames > 0 else ""
+                    logging.info(f"Progress: {self.frames_decoded}/{total_frames} frames{progress} | "
+                                 f"Decode FPS: {current_fps:.1f}")
+        finally:
+            video.release()
+
+        for registration in self.heads:
+            finish = getattr(registration.head, 'finish', None)
+            if finish is not None:
+                finish(self.clock)
+
+        elapsed_time = time.time() - start_time
+        logging.info(f"Pipeline decoded {self.frames_decoded} frames in {elapsed_time:.2f}s")
+        for registration in self.heads:
+            per_frame_ms = (registration.busy_seconds / registration.frames_processed * 1000
+                            if registration.frames_processed else 0.0)
+            logging.info(f"  - {registration.name}: {registration.frames_processed} frames, "
+                         f"{per_frame_ms:.1f} ms/frame")
+
+        return self.frames_decoded
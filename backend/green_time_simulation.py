@@ -3,6 +3,8 @@
 import math
 import random # Kept for potential future random generation or if 'x' values vary randomly
 
+import numpy as np
+
 # --- Constants ---
 YELLOW_TIME = 3.0
 ALL_RED_TIME = 1.0 # Time for all lights to be red between phases (clearance)
@@ -10,6 +12,9 @@ ALL_RED_TIME = 1.0 # Time for all lights to be red between phases (clearance)
 # Typical saturation flow rate for a single lane in PCU per second (e.g., 1800 PCU/hour / 3600 sec/hour = 0.5 PCU/sec)
 SATURATION_FLOW_RATE_PER_LANE = 0.5 # PCU per second per lane
 
+# Maximum green time per phase (seconds); the cycle cap is n_phases * this
+MAX_GREEN_PER_PHASE = 150.0
+
 # Start-up lost time per phase (in seconds). This accounts for the initial delay for vehicles to start moving efficiently.
 START_UP_LOST_TIME_PER_PHASE = 3.0 # seconds (typical range 2-4 seconds)
 
@@ -34,6 +39,10 @@ PCE_VALUES = {
     'heavy_motor_vehicle': 2.5
 }
 
+# Class order of the last axis of count arrays used by the aggregated path
+COUNT_CLASSES = ('two_wheeler', 'light_motor_vehicle', 'heavy_motor_vehicle')
+PCE_VECTOR = np.array([PCE_VALUES[c] for c in COUNT_CLASSES])
+
 
 # --- Functions ---
 
@@ -84,7 +93,7 @@ def compute_green_time(vehicles, p, T_red, num_lanes):
     return G, N_tot, N_targ
 
 
-def enforce_cycle_cap(green_times_info, n_phases, max_per_phase=150):
+def enforce_cycle_cap(green_times_info, n_phases, max_per_phase=MAX_GREEN_PER_PHASE):
     """
     Enforces a global cycle time cap on the sum of green times.
     'green_times_info' is a list of (G_val, N_tot, N_targ) tuples.
@@ -107,7 +116,7 @@ def enforce_cycle_cap(green_times_info, n_phases, max_per_phase=150):
             scaled_greens_info.append((scaled_G, N_tot, N_targ))
         return scaled_greens_info
 
-def schedule_phases(phases_data, p, T_red, num_lanes_per_phase, max_per_phase=150):
+def schedule_phases(phases_data, p, T_red, num_lanes_per_phase, max_per_phase=MAX_GREEN_PER_PHASE):
     """
     Schedules the green, yellow, red, and all-red times for all traffic phases,
     incorporating all-red clearance intervals.
@@ -211,6 +220,115 @@ def run_cycle(phases_data, p, T_red, num_lanes_per_phase):
     return schedule_phases(phases_data, p, T_red, num_lanes_per_phase)
 
 
+# --- Aggregated (count-based) path ---
+# G depends only on the PCE-weighted demand of each phase, so schedules can be
+# computed straight from per-class counts without building per-vehicle dicts.
+# Results are identical to schedule_phases() on convert_raw_to_vehicle_data().
+
+def schedule_batch(counts, num_lanes, phase_mask=None, p=0.8, T_red=60.0, max_per_phase=MAX_GREEN_PER_PHASE):
+    """
+    Computes schedules for many junctions at once from per-class counts.
+
+    Args:
+        counts (array): Shape (J, P, 3) vehicle counts per junction, phase and class
+                        (two-wheelers, light motor vehicles, heavy motor vehicles).
+        num_lanes (array): Shape (J, P) number of lanes per phase.
+        phase_mask (array): Shape (J, P) booleans marking real phases, for junctions
+                            with fewer than P phases. Defaults to all phases present.
+        p (float): The target service fraction.
+        T_red (float): The red interval time (not used in G, kept for parity).
+        max_per_phase (float): Maximum allowed green time per phase.
+
+    Returns:
+        tuple: Arrays (G, Y, R, percentage_clearance), each of shape (J, P).
+               Entries for masked-out phases are 0.
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    num_lanes = np.asarray(num_lanes, dtype=np.float64)
+    mask = np.ones(counts.shape[:2], dtype=bool) if phase_mask is None else np.asarray(phase_mask, dtype=bool)
+    n_phases = mask.sum(axis=1).astype(np.float64)
+
+    # compute_green_time for every phase
+    N_equiv = (counts * PCE_VECTOR).sum(axis=2) * mask
+    N_tot = N_equiv + N_equiv
+    N_targ = np.minimum(N_tot, p * N_tot)
+    serviceable = (N_targ > 0) & (num_lanes > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        G = np.where(serviceable, START_UP_LOST_TIME_PER_PHASE + N_targ / (SATURATION_FLOW_RATE_PER_LANE * num_lanes), 0.0)
+    G = np.maximum(G, 0.0)
+    clearance = np.where(N_tot > 0, p * 100, 0.0)
+
+    # enforce_cycle_cap
+    capped = np.minimum(G, max_per_phase)
+    total_capped = _sum_phases(capped)
+    cap = n_phases * max_per_phase
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scale = np.where(total_capped > cap, cap / total_capped, 1.0)
+    greens = np.where((total_capped <= cap)[:, None], capped, G * scale[:, None]) * mask
+
+    total_cycle = _sum_phases(greens) + (n_phases * YELLOW_TIME) + (n_phases * ALL_RED_TIME)
+    Y = np.where(mask, YELLOW_TIME, 0.0)
+    R = np.where(mask, total_cycle[:, None] - greens - YELLOW_TIME - ALL_RED_TIME, 0.0)
+
+    # Special case: only one phase has demand
+    active = (N_equiv > 0) & mask
+    single = active.sum(axis=1) == 1
+    if single.any():
+        single_G = np.where(active, G, 0.0).sum(axis=1)
+        others_R = single_G + YELLOW_TIME + (n_phases - 1) * ALL_RED_TIME
+        is_active = active & single[:, None]
+        is_other = ~active & mask & single[:, None]
+        greens = np.where(is_active, G, np.where(is_other, 0.0, greens))
+        Y = np.where(is_other, 0.0, Y)
+        R = np.where(is_active, 0.0, np.where(is_other, others_R[:, None], R))
+        clearance = np.where(is_other, 0.0, clearance)
+
+    return greens, Y, R, np.where(mask, clearance, 0.0)
+
+
+def _sum_phases(values):
+    """Left-to-right sum over the phase axis (same rounding as Python's sum())"""
+    total = np.zeros(values.shape[0])
+    for k in range(values.shape[1]):
+        total = total + values[:, k]
+    return total
+
+
+def schedule_from_counts(phase_counts, p, T_red, num_lanes_per_phase, max_per_phase=MAX_GREEN_PER_PHASE):
+    """
+    Schedules one junction directly from per-class counts, in O(phases).
+
+    Args:
+        phase_counts (list): Per phase (two_wheelers, light_motor_vehicles, heavy_motor_vehicles).
+        p (float): The target service fraction.
+        T_red (float): The red interval time.
+        num_lanes_per_phase (list): List of integers, number of lanes for each phase.
+        max_per_phase (float): Maximum allowed green time per phase.
+
+    Returns:
+        list: The calculated schedule for all phases (same format as schedule_phases).
+    """
+    if not phase_counts:
+        return []
+    counts = np.asarray(phase_counts, dtype=np.float64).reshape(1, -1, 3)
+    G, Y, R, clearance = schedule_batch(counts, [num_lanes_per_phase], None, p, T_red, max_per_phase)
+    return schedule_rows(G[0], Y[0], R[0], clearance[0])
+
+
+def schedule_rows(G, Y, R, clearance):
+    """Converts one junction's schedule arrays into the schedule list format"""
+    return [
+        {
+            'traffic_light_no': i + 1,
+            'G': float(G[i]),
+            'Y': float(Y[i]),
+            'R': float(R[i]),
+            'percentage_clearance': float(clearance[i])
+        }
+        for i in range(len(G))
+    ]
+
+
 # Helper function to convert raw counts to the expected vehicle data structure
 def convert_raw_to_vehicle_data(d_value, two_wheelers, light_motor_vehicles, heavy_motor_vehicles):
     """
@@ -0,0 +1,269 @@
+# green_wave.py
+"""
+Green-wave offset coordination over the signal adjacency network.
+
+Junctions linked by SignalAdjacency form connected components. Every junction
+of a component runs a common cycle (the longest cycle of its members), and
+offsets are set along a spanning tree from the critical junction (the one
+with the longest cycle): a junction's cycle starts the travel time after its
+upstream neighbour's, so a platoon leaving on green meets green downstream.
+Travel times come from the great-circle distance between junction
+coordinates at Config.GREEN_WAVE_SPEED_KMH.
+
+Recomputation is incremental: schedule cache invalidations mark junctions
+stale; the next lookup refreshes only their cycles and re-solves only the
+components whose common cycle changed. Adjacency or coordinate changes
+rebuild the graph, which for a whole city takes milliseconds.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import traffic_cycle
+from config import Config
+from database import SessionLocal
+from models import Junction, SignalAdjacency
+from schedule_cache import schedule_cache
+
+EARTH_RADIUS_M = 6371000.0
+
+_graph_listeners = []  # Called after every commit that changed junctions or adjacency
+
+
+def haversine_m(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Great-circle distance in meters (elementwise over arrays, degrees in)"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def add_graph_listener(listener):
+    """Register a callable notified (no arguments) after commits that change Junction or SignalAdjacency rows"""
+    _graph_listeners.append(listener)
+
+
+def schedule_cycle(schedule: List[Dict]) -> float:
+    """Cycle length of a schedule in the traffic_cycle format"""
+    return max(row['G'] + row['Y'] + row['R'] for row in schedule) if schedule else 0.0
+
+
+class GreenWaveCoordinator:
+    """
+    Computes and incrementally maintains green-wave offsets for the whole network
+    """
+
+    def __init__(self, speed_kmh: float = Config.GREEN_WAVE_SPEED_KMH,
+                 max_age_seconds: float = Config.SCHEDULE_CACHE_TTL_SECONDS):
+        """
+        Initialize the coordinator
+
+        Args:
+            speed_kmh: Progression speed used for travel times between junctions
+            max_age_seconds: Recompute everything when the state is older than this
+                             (covers writes made by other processes); 0 or less disables it
+        """
+        self.speed_ms = speed_kmh / 3.6
+        self.max_age_seconds = max_age_seconds
+        self.lock = threading.RLock()
+
+        self.graph_dirty = True
+        self.neighbours: Dict[str, List] = {}       # junction_id -> [(neighbour, signed travel time)]
+        self.component_of: Dict[str, int] = {}
+        self.components: List[List[str]] = []
+        self.cycles: Dict[str, float] = {}           # junction_id -> own cycle length
+        self.common_cycles: List[float] = []         # per component
+        self.offsets: Dict[str, float] = {}
+        self.roots: List[str] = []
+        self.stale = set()
+        self.computed_at = 0.0
+
+        self.full_recomputes = 0
+        self.component_recomputes = 0
+
+    # --- Public API ---
+
+    def offsets_for(self, junction_ids: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Offsets of the given junctions (default: all coordinated junctions)
+
+        Returns:
+            List of {'junction_id', 'cycle', 'common_cycle', 'offset', 'reference_junction_id'}
+        """
+        with self.lock:
+            self._refresh()
+            ids = sorted(self.component_of) if junction_ids is None else [j for j in junction_ids if j in self.component_of]
+            return [self._entry(junction_id) for junction_id in ids]
+
+    def mark_stale(self, junction_ids):
+        """Junction schedules changed (called from schedule cache invalidation)"""
+        with self.lock:
+            self.stale.update(junction_ids)
+
+    def mark_graph_dirty(self):
+        """Adjacency or junction coordinates changed"""
+        with self.lock:
+            self.graph_dirty = True
+
+    # --- Computation ---
+
+    def _refresh(self):
+        expired = self.max_age_seconds > 0 and time.monotonic() - self.computed_at > self.max_age_seconds
+        if self.graph_dirty or expired:
+            self._recompute_all()
+        elif self.stale:
+            self._recompute_stale()
+
+    def _recompute_all(self):
+        """Rebuild the graph and solve every component"""
+        db = SessionLocal()
+        try:
+            schedules = traffic_cycle.calculate_schedules(None, db=db)
+            junctions = db.query(Junction.id, Junction.latitude, Junction.longitude).all()
+            edges = db.query(SignalAdjacency.from_junction_id, SignalAdjacency.to_junction_id).all()
+        finally:
+            db.close()
+
+        self.cycles = {junction_id: schedule_cycle(schedule) for junction_id, schedule in schedules.items()}
+        self._build_graph(junctions, edges)
+        self.common_cycles = [0.0] * len(self.components)
+        self.roots = [None] * len(self.components)
+        for index in range(len(self.components)):
+            self._solve_component(index)
+
+        self.stale.clear()
+        self.graph_dirty = False
+        self.computed_at = time.monotonic()
+        self.full_recomputes += 1
+        logging.info(f"Green wave recomputed: {len(self.cycles)} junctions, {len(self.components)} components")
+
+    def _recompute_stale(self):
+        """Refresh the cycles of stale junctions and re-solve only components whose common cycle changed"""
+        stale = list(self.stale)
+        self.stale.clear()
+        schedules = traffic_cycle.calculate_schedules(stale)
+
+        # Junctions gaining or losing their phases change the graph itself
+        if any((j in schedules) != (j in self.component_of) for j in stale):
+            self._recompute_all()
+            return
+        # Junctions without phases (counts recorded for them anyway) are not coordinated
+        stale = [j for j in stale if j in self.component_of]
+
+        affected = set()
+        for junction_id in stale:
+            cycle = schedule_cycle(schedules.get(junction_id, []))
+            if cycle != self.cycles.get(junction_id):
+                self.cycles[junction_id] = cycle
+                affected.add(self.component_of[junction_id])
+
+        for index in affected:
+            previous = (self.common_cycles[index], self.roots[index])
+            members = self.components[index]
+            if (max(self.cycles[j] for j in members), self._root(members)) != previous:
+                self._solve_component(index)
+
+    def _build_graph(self, junctions, edges):
+        """Adjacency lists with signed travel times, and connected components"""
+        coords = {j: (float(lat), float(lon)) for j, lat, lon in junctions if lat is not None and lon is not None}
+        usable = [(a, b) for a, b in edges
+                  if a != b and a in coords and b in coords and a in self.cycles and b in self.cycles]
+
+        self.neighbours = {junction_id: [] for junction_id in self.cycles}
+        if usable:
+            lat1, lon1 = np.array([coords[a] for a, _ in usable]).T
+            lat2, lon2 = np.array([coords[b] for _, b in usable]).T
+            travel = haversine_m(lat1, lon1, lat2, lon2) / self.speed_ms
+            for (a, b), seconds in zip(usable, travel.tolist()):
+                # Forward along the adjacency direction, backward against it
+                self.neighbours[a].append((b, seconds))
+                self.neighbours[b].append((a, -seconds))
+        for entries in self.neighbours.values():
+            # Prefer forward links, so two-way pairs progress along the recorded direction
+            entries.sort(key=lambda entry: (entry[1] < 0, entry[0]))
+
+        self.component_of = {}
+        self.components = []
+        for start in sorted(self.neighbours):
+            if start in self.component_of:
+                continue
+            index = len(self.components)
+            members = [start]
+            self.component_of[start] = index
+            queue = deque([start])
+            while queue:
+                node = queue.popleft()
+                for neighbour, _ in self.neighbours[node]:
+                    if neighbour not in self.component_of:
+                        self.component_of[neighbour] = index
+                        members.append(neighbour)
+                        queue.append(neighbour)
+            self.components.append(members)
+
+    def _root(self, members: List[str]) -> str:
+        """Critical junction of a component: longest cycle, then lowest ID"""
+        return min(members, key=lambda j: (-self.cycles[j], j))
+
+    def _solve_component(self, index: int):
+        """Common cycle and offsets of one component (BFS spanning tree from the root)"""
+        members = self.components[index]
+        root = self._root(members)
+        common = max(self.cycles[j] for j in members)
+        self.common_cycles[index] = common
+        self.roots[index] = root
+
+        offsets = {root: 0.0}
+        queue = deque([root])
+        while queue:
+            node = queue.popleft()
+            for neighbour, seconds in self.neighbours[node]:
+                if neighbour not in offsets:
+                    offsets[neighbour] = offsets[node] + seconds
+                    queue.append(neighbour)
+
+        for junction_id, offset in offsets.items():
+            self.offsets[junction_id] = round(offset % common, 1) if common > 0 else 0.0
+        self.component_recomputes += 1
+
+    def _entry(self, junction_id: str) -> Dict:
+        index = self.component_of[junction_id]
+        return {
+            'junction_id': junction_id,
+            'cycle': self.cycles[junction_id],
+            'common_cycle': self.common_cycles[index],
+            'offset': self.offsets.get(junction_id, 0.0),
+            'reference_junction_id': self.roots[index],
+        }
+
+
+green_wave = GreenWaveCoordinator()
+schedule_cache.add_invalidation_listener(green_wave.mark_stale)
+add_graph_listener(green_wave.mark_graph_dirty)
+
+
+# --- Graph invalidation from committed writes (shared by every graph listener) ---
+
+@event.listens_for(Session, "before_flush")
+def _collect_graph_changes(session, flush_context, instances):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (SignalAdjacency, Junction)):
+            session.info['signal_graph_changed'] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_graph(session):
+    if session.info.pop('signal_graph_changed', False):
+        for listener in _graph_listeners:
+            listener()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_graph_changes(session):
+    session.info.pop('signal_graph_changed', None)
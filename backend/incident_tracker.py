@@ -0,0 +1,210 @@
+# incident_tracker.py
+"""
+Spatio-temporal clustering of accident detections into incidents.
+
+Detections that overlap an open incident (IoU) and arrive within a time gap of
+its last sighting are merged into it; anything else opens a new incident. An
+incident is closed once it has not been seen for max_gap_seconds. Callers
+persist one record per incident and update it while it stays visible, so DB
+and disk writes scale with incidents rather than frames.
+
+Incidents start as candidates and are only reported once confirmed: detected
+in at least K of the last M model evaluations (N-of-M voting). Confirmed
+incidents carry the averaged confidence and a majority class/severity vote, so
+a single spurious frame never reaches the disk, the database or the alerts.
+"""
+
+import logging
+from collections import Counter, deque
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from config import Config
+
+
+def box_iou(boxes_a, boxes_b) -> np.ndarray:
+    """
+    Pairwise IoU between two sets of [x1, y1, x2, y2] boxes
+
+    Returns:
+        Array of shape (len(boxes_a), len(boxes_b))
+    """
+    a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 4)
+
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0.0)
+
+
+SEVERITY_ORDER = ['low', 'medium', 'high', 'critical']
+
+
+class Incident:
+    """One accident incident: a cluster of overlapping detections over time"""
+
+    def __init__(self, incident_id: int, detection: Dict, now: float, window: int):
+        self.id = incident_id
+        self.bbox = list(detection['bbox'])
+        self.max_confidence = detection['confidence']
+        self.first_seen = now
+        self.last_seen = now
+        self.frames_seen = 0
+        self.detections: List[Dict] = []  # Detections merged in the latest frame
+        self.hits = deque(maxlen=window)  # Hit/miss of the last M model evaluations
+        self.confirmed = False
+        self.confidence_sum = 0.0
+        self.class_votes: Counter = Counter()
+        self.severity_votes: Counter = Counter()
+        self.persisted = False  # Evidence and record queued for writing
+        self.persisted_confidence = 0.0  # Confidence last queued for the database
+        self.merge(detection, now)
+
+    def merge(self, detection: Dict, now: float):
+        """Merge a detection from the current frame into this incident"""
+        if now != self.last_seen or not self.detections:
+            self.frames_seen += 1
+            self.detections = []
+        self.detections.append(detection)
+        self.last_seen = now
+
+        self.max_confidence = max(self.max_confidence, detection['confidence'])
+        self.confidence_sum += detection['confidence']
+        self.class_votes[detection['class']] += 1
+        if 'severity' in detection:
+            self.severity_votes[detection['severity']] += 1
+        self.bbox = list(detection['bbox'])
+
+    @property
+    def confidence(self) -> float:
+        """Average confidence over all merged detections"""
+        return self.confidence_sum / max(1, sum(self.class_votes.values()))
+
+    @property
+    def detected_class(self) -> str:
+        """Majority class vote"""
+        return self.class_votes.most_common(1)[0][0]
+
+    @property
+    def severity(self):
+        """Majority severity vote (ties go to the more severe level), or None without votes"""
+        if not self.severity_votes:
+            return None
+        return max(self.severity_votes, key=lambda level: (self.severity_votes[level], SEVERITY_ORDER.index(level)))
+
+    def to_metadata(self) -> Dict:
+        """Incident summary stored in the accident record's detection_metadata"""
+        return {
+            'incident_id': self.id,
+            'first_seen_sec': round(self.first_seen, 3),
+            'last_seen_sec': round(self.last_seen, 3),
+            'frames_seen': self.frames_seen,
+            'avg_confidence': round(self.confidence, 4),
+            'max_confidence': self.max_confidence,
+            'class_votes': dict(self.class_votes),
+            'severity_votes': dict(self.severity_votes),
+        }
+
+
+class IncidentTracker:
+    """
+    Clusters per-frame accident detections into incidents by IoU and time proximity
+    """
+
+    def __init__(self, iou_threshold: float = Config.INCIDENT_IOU_THRESHOLD,
+                 max_gap_seconds: float = Config.INCIDENT_MAX_GAP_SECONDS,
+                 confirm_hits: int = Config.INCIDENT_CONFIRM_HITS,
+                 confirm_window: int = Config.INCIDENT_CONFIRM_WINDOW):
+        """
+        Initialize the tracker
+
+        Args:
+            iou_threshold: Minimum IoU between a detection and an incident to merge them
+            max_gap_seconds: Close an incident after this long (video time) without detections
+            confirm_hits: K - detections needed to confirm an incident...
+            confirm_window: M - ...within this many consecutive model evaluations
+        """
+        self.iou_threshold = iou_threshold
+        self.max_gap_seconds = max_gap_seconds
+        self.confirm_hits = max(1, confirm_hits)
+        self.confirm_window = max(self.confirm_hits, confirm_window)
+        self.open_incidents: List[Incident] = []
+        self.next_incident_id = 1
+        self.rejected_count = 0  # Candidates closed without confirmation
+        logging.info(f"IncidentTracker initialized with iou_threshold={iou_threshold}, "
+                     f"max_gap_seconds={max_gap_seconds}, confirm={self.confirm_hits} of {self.confirm_window}")
+
+    def update(self, detections: List[Dict], now: float,
+               evaluated: bool = True) -> Tuple[List[Incident], List[Incident], List[Incident]]:
+        """
+        Merge the current frame's detections into incidents
+
+        Args:
+            detections: List of {'class', 'confidence', 'bbox': [x1, y1, x2, y2]}, optionally 'severity'
+            now: Current video time in seconds
+            evaluated: Whether the model ran on this frame; only evaluated frames count as misses
+
+        Returns:
+            (incidents confirmed this frame, confirmed incidents seen again this frame,
+             confirmed incidents closed this frame)
+        """
+        expired = [i for i in self.open_incidents if now - i.last_seen > self.max_gap_seconds]
+        if expired:
+            self.open_incidents = [i for i in self.open_incidents if i not in expired]
+        closed = [i for i in expired if i.confirmed]
+        self.rejected_count += len(expired) - len(closed)
+
+        hit: List[Incident] = []
+
+        # Strongest detections first, so they define new incidents
+        for detection in sorted(detections, key=lambda d: d['confidence'], reverse=True):
+            best = None
+            if self.open_incidents:
+                ious = box_iou([detection['bbox']], [i.bbox for i in self.open_incidents])[0]
+                best_index = int(np.argmax(ious))
+                if ious[best_index] >= self.iou_threshold:
+                    best = self.open_incidents[best_index]
+
+            if best is None:
+                best = Incident(self.next_incident_id, detection, now, self.confirm_window)
+                self.next_incident_id += 1
+                self.open_incidents.append(best)
+            else:
+                best.merge(detection, now)
+            if best not in hit:
+                hit.append(best)
+
+        # N-of-M vote: every evaluation is a hit or a miss for each open incident
+        confirmed: List[Incident] = []
+        seen: List[Incident] = []
+        for incident in self.open_incidents:
+            if incident in hit:
+                incident.hits.append(True)
+            elif evaluated:
+                incident.hits.append(False)
+            else:
+                continue
+
+            if incident.confirmed:
+                if incident in hit:
+                    seen.append(incident)
+            elif sum(incident.hits) >= self.confirm_hits:
+                incident.confirmed = True
+                confirmed.append(incident)
+
+        return confirmed, seen, closed
+
+    def close_all(self) -> List[Incident]:
+        """Close every open incident (end of stream); returns the confirmed ones"""
+        closed = [i for i in self.open_incidents if i.confirmed]
+        self.rejected_count += len(self.open_incidents) - len(closed)
+        self.open_incidents = []
+        return closed
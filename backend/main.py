@@ -1,28 +1,48 @@
-from fastapi import FastAPI, HTTPException, Depends, status, UploadFile, File
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response, status, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Literal, Optional
 import os
 import json
 import traffic_cycle
+from schedule_cache import schedule_cache
+from green_wave import green_wave
+from corridor_planner import corridor_planner
+from schedule_timeline import schedule_timeline
+from controller_state import controller_states
+from backend_metrics import backend_metrics
+from config import Config
 from sqlalchemy.orm import Session
+from anyio import to_thread
 from database import SessionLocal, engine, get_db
 import models
+from schema_upgrade import upgrade_schema
 from passlib.context import CryptContext
 from decimal import Decimal
 from datetime import datetime
 
-# Create tables
+# Create tables, then add columns that create_all does not add to existing tables
 models.Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
 
 app = FastAPI(title="IRIS Backend", description="Backend for Intelligent Roadway Infrastructure System")
 
+class EvidenceStaticFiles(StaticFiles):
+    """Evidence files; content-hashed images never change, so clients may cache them for good"""
+
+    def file_response(self, full_path, *args, **kwargs):
+        response = super().file_response(full_path, *args, **kwargs)
+        parts = os.path.normpath(str(full_path)).split(os.sep)
+        if any(tier in parts for tier in ("full", "thumbs", "compact")):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
 # Mount static files for accident evidence images
 evidence_dir = os.path.join(os.path.dirname(__file__), "accident_evidence")
 if not os.path.exists(evidence_dir):
     os.makedirs(evidence_dir)
-app.mount("/evidence", StaticFiles(directory=evidence_dir), name="evidence")
+app.mount("/evidence", EvidenceStaticFiles(directory=evidence_dir), name="evidence")
 
 # Security
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -78,7 +98,54 @@ class ScheduleItem(BaseModel):
     R: float
     percentage_clearance: float
 
+class JunctionSchedule(BaseModel):
+    junction_id: str
+    schedule: List[ScheduleItem]
+
+class ControllerStateReport(BaseModel):
+    version: Optional[int] = None           # Timeline version the controller runs
+    phase: Optional[int] = None             # Phase currently green or yellow
+    light: Optional[str] = None             # 'green', 'yellow', 'red' or 'fallback'
+    buffered_until: Optional[float] = None  # Epoch end of the last buffered cycle
+    reported_at: Optional[float] = None     # Controller clock at the time of the report
+
+class CorridorJunction(BaseModel):
+    junction_id: str
+    name: str
+    latitude: float
+    longitude: float
+    from_junction_id: Optional[str] = None
+    eta_seconds: float
+    preempt_at_seconds: float
+    release_at_seconds: float
+
+class CorridorDestination(BaseModel):
+    name: Optional[str] = None
+    latitude: float
+    longitude: float
+
+class CorridorResponse(BaseModel):
+    destination: CorridorDestination
+    distance_m: float
+    duration_s: float
+    junctions: List[CorridorJunction]
+
+class GreenWaveOffset(BaseModel):
+    junction_id: str
+    cycle: float
+    common_cycle: float
+    offset: float
+    reference_junction_id: str
+
 # --- Endpoints ---
+# Handlers that touch the database or compute schedules are plain `def`: FastAPI runs them on
+# its worker thread pool, so blocking SQLAlchemy calls never stall the event loop. Only
+# handlers that never block may be `async def`.
+
+@app.on_event("startup")
+async def configure_threadpool():
+    # Worker threads for `def` handlers; keep it at or below the database connection pool
+    to_thread.current_default_thread_limiter().total_tokens = Config.API_THREADPOOL_SIZE
 
 @app.on_event("startup")
 def startup_event():
@@ -98,8 +165,15 @@ def startup_event():
     finally:
         db.close()
 
+    if Config.TIMELINE_ENABLED:
+        schedule_timeline.start()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    schedule_timeline.stop()
+
 @app.post("/token", response_model=Token)
-async def login(request: LoginRequest, db: Session = Depends(get_db)):
+def login(request: LoginRequest, db: Session = Depends(get_db)):
     try:
         print(f"Login attempt for: {request.username}")
         # Authenticate against DB
@@ -134,7 +208,7 @@ async def login(request: LoginRequest, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/traffic-data", response_model=List[PhaseData])
-async def get_traffic_data():
+def get_traffic_data():
     """
     Reads the latest vehicle counts from vehicle_data.txt
     """
@@ -163,21 +237,115 @@ async def get_traffic_data():
     return phases
 
 @app.get("/schedule", response_model=List[ScheduleItem])
-async def get_schedule(junction_id: str = "J-001"):
+def get_schedule(junction_id: str = "J-001", demand: Literal["latest", "forecast"] = "latest",
+                 method: Literal["formula", "optimize"] = "formula"):
     """
     Calculates and returns the traffic light schedule based on latest database data.
+    Served from the schedule cache until new counts or phase changes arrive.
     
     Args:
         junction_id: Junction ID to calculate schedule for (default: J-001)
+        demand: 'latest' counts or the per-phase demand 'forecast' (default: latest)
+        method: 'formula' green times or the cycle/split 'optimize'r (default: formula)
     """
     try:
-        schedule = traffic_cycle.calculate_schedule(junction_id=junction_id)
-        return schedule
+        return schedule_cache.get(junction_id, demand, method)
     except ValueError as e:
          raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error calculating schedule: {str(e)}")
 
+@app.get("/schedules", response_model=List[JunctionSchedule])
+def get_schedules(junction_ids: Optional[List[str]] = Query(None),
+                  demand: Literal["latest", "forecast"] = "latest",
+                  method: Literal["formula", "optimize"] = "formula", db: Session = Depends(get_db)):
+    """
+    Calculates the schedules of many junctions in one request (constant number of queries).
+    
+    Args:
+        junction_ids: Junction IDs to schedule, e.g. ?junction_ids=J-001&junction_ids=J-002
+                      (default: every junction with signal phases)
+        demand: 'latest' counts or the per-phase demand 'forecast' (default: latest)
+        method: 'formula' green times or the cycle/split 'optimize'r (default: formula)
+    """
+    try:
+        schedules = traffic_cycle.calculate_schedules(junction_ids, db=db, demand=demand, method=method)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error calculating schedules: {str(e)}")
+    return [{"junction_id": junction_id, "schedule": schedule} for junction_id, schedule in schedules.items()]
+
+@app.get("/green-wave", response_model=List[GreenWaveOffset])
+def get_green_wave(junction_ids: Optional[List[str]] = Query(None)):
+    """
+    Green-wave offsets of coordinated junctions (common cycle per adjacency component).
+    Only components whose schedules changed are recomputed.
+    
+    Args:
+        junction_ids: Junction IDs to return (default: all junctions with signal phases)
+    """
+    try:
+        return green_wave.offsets_for(junction_ids)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error calculating green wave: {str(e)}")
+
+@app.get("/corridor", response_model=CorridorResponse)
+def get_corridor(start_lat: float, start_lng: float,
+                 dest_lat: Optional[float] = None, dest_lng: Optional[float] = None):
+    """
+    Plans an emergency green corridor over the signal adjacency graph (A*, cached paths).
+    
+    Args:
+        start_lat, start_lng: Start point of the emergency vehicle
+        dest_lat, dest_lng: Destination (default: the nearest hospital listed on a junction)
+    """
+    try:
+        return corridor_planner.plan(start_lat, start_lng, dest_lat, dest_lng)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error planning corridor: {str(e)}")
+
+@app.get("/timeline/{junction_id}")
+def get_timeline(junction_id: str, request: Request):
+    """
+    Precomputed ring buffer of a junction's next cycles (absolute epoch start times of
+    every phase's green, yellow and red), served from memory.
+    
+    Send the last ETag in If-None-Match; 304 means the held timeline is still current.
+    """
+    entry = schedule_timeline.get(junction_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"No timeline for junction {junction_id}")
+    etag, body = entry
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.post("/controllers/{junction_id}/state", status_code=204)
+def report_controller_state(junction_id: str, state: ControllerStateReport):
+    """Latest state reported by a junction's signal controller (kept in memory)"""
+    controller_states.report(junction_id, state.dict())
+    return Response(status_code=204)
+
+@app.get("/controllers/state")
+def get_controller_states():
+    """Summary of the reporting controller fleet"""
+    return controller_states.summary()
+
+@app.get("/metrics")
+def get_metrics():
+    """
+    Cumulative process CPU and database statement counters, plus cache, timeline and
+    controller summaries. Rates come from the difference of two calls.
+    """
+    return {
+        **backend_metrics.snapshot(),
+        'schedule_cache': schedule_cache.stats(),
+        'timeline': schedule_timeline.stats(),
+        'controllers': controller_states.summary(),
+    }
+
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
@@ -197,13 +365,13 @@ from schemas import (
 
 # Junction Endpoints
 @app.get("/junctions", response_model=List[JunctionResponse])
-async def get_junctions(db: Session = Depends(get_db)):
+def get_junctions(db: Session = Depends(get_db)):
     """Get all junctions"""
     junctions = db.query(models.Junction).all()
     return junctions
 
 @app.get("/junctions/{junction_id}", response_model=JunctionResponse)
-async def get_junction(junction_id: str, db: Session = Depends(get_db)):
+def get_junction(junction_id: str, db: Session = Depends(get_db)):
     """Get a specific junction by ID"""
     junction = db.query(models.Junction).filter(models.Junction.id == junction_id).first()
     if not junction:
@@ -211,7 +379,7 @@ async def get_junction(junction_id: str, db: Session = Depends(get_db)):
     return junction
 
 @app.post("/junctions", response_model=JunctionResponse)
-async def create_junction(junction: JunctionCreate, db: Session = Depends(get_db)):
+def create_junction(junction: JunctionCreate, db: Session = Depends(get_db)):
     """Create a new junction"""
     db_junction = models.Junction(**junction.dict())
     db.add(db_junction)
@@ -220,7 +388,7 @@ async def create_junction(junction: JunctionCreate, db: Session = Depends(get_db
     return db_junction
 
 @app.put("/junctions/{junction_id}", response_model=JunctionResponse)
-async def update_junction(junction_id: str, junction: JunctionCreate, db: Session = Depends(get_db)):
+def update_junction(junction_id: str, junction: JunctionCreate, db: Session = Depends(get_db)):
     """Update a junction"""
     db_junction = db.query(models.Junction).filter(models.Junction.id == junction_id).first()
     if not db_junction:
@@ -234,7 +402,7 @@ async def update_junction(junction_id: str, junction: JunctionCreate, db: Sessio
     return db_junction
 
 @app.delete("/junctions/{junction_id}")
-async def delete_junction(junction_id: str, db: Session = Depends(get_db)):
+def delete_junction(junction_id: str, db: Session = Depends(get_db)):
     """Delete a junction"""
     db_junction = db.query(models.Junction).filter(models.Junction.id == junction_id).first()
     if not db_junction:
@@ -247,7 +415,7 @@ async def delete_junction(junction_id: str, db: Session = Depends(get_db)):
 
 # Camera Endpoints
 @app.get("/cameras", response_model=List[CameraResponse])
-async def get_cameras(junction_id: Optional[str] = None, db: Session = Depends(get_db)):
+def get_cameras(junction_id: Optional[str] = None, db: Session = Depends(get_db)):
     """Get all cameras, optionally filtered by junction"""
     query = db.query(models.Camera)
     if junction_id:
@@ -255,7 +423,7 @@ async def get_cameras(junction_id: Optional[str] = None, db: Session = Depends(g
     return query.all()
 
 @app.get("/cameras/{camera_id}", response_model=CameraResponse)
-async def get_camera(camera_id: str, db: Session = Depends(get_db)):
+def get_camera(camera_id: str, db: Session = Depends(get_db)):
     """Get a specific camera"""
     camera = db.query(models.Camera).filter(models.Camera.id == camera_id).first()
     if not camera:
@@ -265,7 +433,7 @@ async def get_camera(camera_id: str, db: Session = Depends(get_db)):
 
 # Alert Endpoints
 @app.get("/alerts", response_model=List[AlertResponse])
-async def get_alerts(status: Optional[str] = None, limit: int = 50, db: Session = Depends(get_db)):
+def get_alerts(status: Optional[str] = None, limit: int = 50, db: Session = Depends(get_db)):
     """Get alerts, optionally filtered by status"""
     query = db.query(models.Alert).order_by(models.Alert.created_at.desc())
     if status:
@@ -273,7 +441,7 @@ async def get_alerts(status: Optional[str] = None, limit: int = 50, db: Session
     return query.limit(limit).all()
 
 @app.post("/alerts", response_model=AlertResponse)
-async def create_alert(alert: AlertCreate, db: Session = Depends(get_db)):
+def create_alert(alert: AlertCreate, db: Session = Depends(get_db)):
     """Create a new alert"""
     db_alert = models.Alert(**alert.dict())
     db.add(db_alert)
@@ -282,7 +450,7 @@ async def create_alert(alert: AlertCreate, db: Session = Depends(get_db)):
     return db_alert
 
 @app.patch("/alerts/{alert_id}/resolve")
-async def resolve_alert(alert_id: int, db: Session = Depends(get_db)):
+def resolve_alert(alert_id: int, db: Session = Depends(get_db)):
     """Mark an alert as resolved"""
     from datetime import datetime
     alert = db.query(models.Alert).filter(models.Alert.id == alert_id).first()
@@ -297,7 +465,7 @@ async def resolve_alert(alert_id: int, db: Session = Depends(get_db)):
 
 # Signal Timing Endpoints
 @app.get("/signal-timings/{junction_id}", response_model=List[SignalTimingResponse])
-async def get_signal_timings(junction_id: str, db: Session = Depends(get_db)):
+def get_signal_timings(junction_id: str, db: Session = Depends(get_db)):
     """Get signal timings for a junction"""
     timings = db.query(models.SignalTiming).filter(
         models.SignalTiming.junction_id == junction_id,
@@ -306,7 +474,7 @@ async def get_signal_timings(junction_id: str, db: Session = Depends(get_db)):
     return timings
 
 @app.post("/signal-timings", response_model=SignalTimingResponse)
-async def create_signal_timing(timing: SignalTimingCreate, db: Session = Depends(get_db)):
+def create_signal_timing(timing: SignalTimingCreate, db: Session = Depends(get_db)):
     """Create or update signal timing"""
     db_timing = models.SignalTiming(**timing.dict())
     db.add(db_timing)
@@ -317,7 +485,7 @@ async def create_signal_timing(timing: SignalTimingCreate, db: Session = Depends
 
 # Traffic Data Endpoints
 @app.post("/traffic-data-record", response_model=TrafficDataResponse)
-async def record_traffic_data(data: TrafficDataCreate, db: Session = Depends(get_db)):
+def record_traffic_data(data: TrafficDataCreate, db: Session = Depends(get_db)):
     """Record new traffic data"""
     db_data = models.TrafficData(**data.dict())
     db.add(db_data)
@@ -326,7 +494,7 @@ async def record_traffic_data(data: TrafficDataCreate, db: Session = Depends(get
     return db_data
 
 @app.get("/traffic-data-history/{junction_id}")
-async def get_traffic_history(
+def get_traffic_history(
     junction_id: str,
     limit: int = 100,
     db: Session = Depends(get_db)
@@ -340,7 +508,7 @@ async def get_traffic_history(
 
 # System Stats Endpoint
 @app.get("/system-stats", response_model=SystemStatsResponse)
-async def get_system_stats(db: Session = Depends(get_db)):
+def get_system_stats(db: Session = Depends(get_db)):
     """Get current system statistics"""
     stats = db.query(models.SystemStats).first()
     if not stats:
@@ -362,7 +530,7 @@ async def get_system_stats(db: Session = Depends(get_db)):
 # which processes video feeds and saves results to the database automatically.
 
 @app.get("/accidents", response_model=List[AccidentResponse])
-async def get_accidents(
+def get_accidents(
     junction_id: Optional[str] = None,
     camera_id: Optional[str] = None,
     status: Optional[str] = None,
@@ -401,7 +569,7 @@ async def get_accidents(
 
 
 @app.get("/accidents/{accident_id}", response_model=AccidentResponse)
-async def get_accident(accident_id: int, db: Session = Depends(get_db)):
+def get_accident(accident_id: int, db: Session = Depends(get_db)):
     """
     Get a specific accident record by ID
     
@@ -419,7 +587,7 @@ async def get_accident(accident_id: int, db: Session = Depends(get_db)):
 
 
 @app.patch("/accidents/{accident_id}/resolve")
-async def resolve_accident(
+def resolve_accident(
     accident_id: int,
     resolved_by: Optional[str] = None,
     db: Session = Depends(get_db)
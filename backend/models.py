@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DECIMAL, DateTime, Date, Text, ForeignKey, ARRAY
+from sqlalchemy import Column, Integer, String, Boolean, DECIMAL, DateTime, Date, Text, ForeignKey, ARRAY, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -103,6 +103,8 @@ class SignalPhase(Base):
     roi_y1 = Column(Integer, nullable=True)  # Top-left Y coordinate
     roi_x2 = Column(Integer, nullable=True)  # Bottom-right X coordinate
     roi_y2 = Column(Integer, nullable=True)  # Bottom-right Y coordinate
+    roi_polygon = Column(Text, nullable=True)  # JSON array of [x, y] vertices; overrides the rectangle when set
+    count_lines = Column(Text, nullable=True)  # JSON array of [x1, y1, x2, y2] count lines; defaults to the exit line
     
     # Video source (file path or stream URL)
     video_source = Column(String, nullable=True)  # Path to video file or camera stream URL
@@ -145,6 +147,27 @@ class TrafficData(Base):
     # Relationships
     junction = relationship("Junction", back_populates="traffic_data")
 
+    # Latest row per (junction, phase) lookups for schedule computation
+    __table_args__ = (Index('ix_traffic_data_junction_phase_time', 'junction_id', 'phase', 'timestamp'),)
+
+
+class DemandForecast(Base):
+    """Incremental per-phase demand forecaster state (Holt level/trend plus time-of-day seasonality)"""
+    __tablename__ = "demand_forecasts"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    junction_id = Column(String, ForeignKey('junctions.id', ondelete='CASCADE'), nullable=False)
+    phase = Column(Integer, nullable=False)  # Phase number
+    level = Column(Text, nullable=False)  # JSON [two_wheelers, light_vehicles, heavy_vehicles]
+    trend = Column(Text, nullable=False)  # JSON per-class trend per observation
+    seasonal = Column(Text, nullable=False)  # JSON list of per-slot [2W, LV, HV] offsets (null until seen)
+    samples = Column(Integer, default=0)  # Observations folded into the state
+    last_timestamp = Column(DateTime(timezone=True), nullable=True)  # Timestamp of the latest observation
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # One state per junction phase; concurrent writers upsert and lock it (demand_forecast._observe)
+    __table_args__ = (UniqueConstraint('junction_id', 'phase', name='uq_demand_forecasts_junction_phase'),)
+
 
 class Alert(Base):
     __tablename__ = "alerts"
@@ -202,6 +225,7 @@ class Accident(Base):
     
     # Media paths
     image_path = Column(String, nullable=True)  # Path to saved image
+    thumbnail_path = Column(String, nullable=True)  # Path to saved thumbnail (list views)
     video_path = Column(String, nullable=True)  # Path to saved video clip
     
     # Detection results (stored as JSON string)
@@ -0,0 +1,370 @@
+"""
+Multi-Source Accident Monitor - Headless Backend Mode
+Monitors every camera/phase of one or more junctions in a single process.
+
+One accident model is loaded and shared. Sources are read round-robin, one
+frame per source per round, and the frames due for inference are sent to the
+model together in batches. Each source keeps its own clock, anomaly trigger,
+incident tracker and clip buffer, and its records carry its own phase and
+camera_id.
+"""
+
+import argparse
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import cv2
+
+from config import Config
+from database import SessionLocal
+from models import Camera, SignalPhase
+from pipeline_clock import PipelineClock, parse_start_time
+from evidence_writer import EvidenceWriter
+from anomaly_trigger import AnomalyTrigger
+from detect_accident import AccidentMonitor, load_model, crop_regions
+
+
+def resolve_video_source(video_source: str) -> str:
+    """Resolve a relative video path against the backend directory"""
+    if os.path.isabs(video_source) or '://' in video_source:
+        return video_source
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), video_source)
+
+
+def fetch_sources(junction_ids: List[str]) -> List[Dict]:
+    """
+    Fetch every monitorable phase/camera of the given junctions
+
+    A phase's video_source is used when set, otherwise the stream_url of the
+    camera assigned to that phase. Cameras with a stream but no signal phase
+    row are included as well.
+
+    Returns:
+        List of {'junction_id', 'phase_number', 'camera_id', 'video_source'}
+    """
+    db = SessionLocal()
+    try:
+        phases = db.query(SignalPhase).filter(
+            SignalPhase.junction_id.in_(junction_ids)
+        ).order_by(SignalPhase.junction_id, SignalPhase.phase_number).all()
+        cameras = db.query(Camera).filter(Camera.junction_id.in_(junction_ids)).all()
+    finally:
+        db.close()
+
+    # Prefer online cameras when several monitor the same phase
+    camera_by_phase = {}
+    for camera in sorted(cameras, key=lambda c: c.status == 'online'):
+        camera_by_phase[(camera.junction_id, camera.phase)] = camera
+
+    sources = []
+    covered = set()
+    for phase in phases:
+        key = (phase.junction_id, phase.phase_number)
+        camera = camera_by_phase.get(key)
+        video_source = phase.video_source or (camera.stream_url if camera else None)
+        if not video_source:
+            logging.warning(f"No video source for junction {phase.junction_id}, phase {phase.phase_number} - skipped")
+            continue
+        covered.add(key)
+        sources.append({
+            'junction_id': phase.junction_id,
+            'phase_number': phase.phase_number,
+            'camera_id': camera.id if camera else None,
+            'video_source': resolve_video_source(video_source),
+        })
+
+    for key, camera in sorted(camera_by_phase.items()):
+        if key not in covered and camera.stream_url:
+            sources.append({
+                'junction_id': camera.junction_id,
+                'phase_number': camera.phase,
+                'camera_id': camera.id,
+                'video_source': resolve_video_source(camera.stream_url),
+            })
+
+    return sources
+
+
+class VideoSource:
+    """Per-source capture, clock and accident monitor"""
+
+    def __init__(self, config: Dict, monitor: AccidentMonitor):
+        self.config = config
+        self.monitor = monitor
+        self.name = f"{config['junction_id']}/P{config['phase_number']}"
+        self.capture: Optional[cv2.VideoCapture] = None
+        self.clock: Optional[PipelineClock] = None
+        self.frames_decoded = 0
+        self.active = False
+
+
+class MultiSourceAccidentMonitor:
+    """
+    Accident monitoring for many video sources with one shared model
+    """
+
+    def __init__(
+        self,
+        junction_ids: List[str],
+        model_path: str = Config.ACCIDENT_MODEL,
+        confidence_threshold: float = Config.ACCIDENT_CONFIDENCE_THRESHOLD,
+        every_n_frames: int = Config.ACCIDENT_EVERY_N_FRAMES,
+        batch_size: int = Config.ACCIDENT_BATCH_SIZE,
+        start_time: Optional[datetime] = None,
+        record_clips: bool = True,
+        use_trigger: bool = True
+    ):
+        """
+        Initialize the monitor
+
+        Args:
+            junction_ids: Junctions whose phases/cameras are monitored
+            model_path: Path to trained YOLO model
+            confidence_threshold: Minimum confidence for detection (0.0-1.0)
+            every_n_frames: Run the accident model on every Nth frame of each source
+            batch_size: Maximum crops per model call
+            start_time: Timestamp of the first video frame of every source (defaults to now)
+            record_clips: Save a pre/post-event video clip per incident
+            use_trigger: Gate the model with the motion anomaly trigger
+        """
+        self.junction_ids = junction_ids
+        self.model_path = model_path
+        self.confidence_threshold = confidence_threshold
+        self.every_n_frames = max(1, every_n_frames)
+        self.batch_size = max(1, batch_size)
+        self.start_time = start_time
+        self.record_clips = record_clips
+        self.use_trigger = use_trigger
+
+        self.model = None
+        self.evidence_writer: Optional[EvidenceWriter] = None
+        self.sources: List[VideoSource] = []
+
+        self.model_calls = 0
+        self.crops_inferred = 0
+
+        logging.info(f"Initializing Multi-Source Accident Monitor for junctions {', '.join(junction_ids)}")
+
+    def initialize(self) -> bool:
+        """
+        Load the shared model and create one accident monitor per source
+
+        Returns:
+            True if at least one source is ready, False otherwise
+        """
+        self.model = load_model(self.model_path)
+        if self.model is None:
+            return False
+
+        source_configs = fetch_sources(self.junction_ids)
+        if not source_configs:
+            logging.error(f"No video sources found for junctions {', '.join(self.junction_ids)}")
+            return False
+
+        self.evidence_writer = EvidenceWriter(AccidentMonitor.EVIDENCE_DIR)
+        self.evidence_writer.start()
+
+        for config in source_configs:
+            monitor = AccidentMonitor(
+                junction_id=config['junction_id'],
+                phase_number=config['phase_number'],
+                camera_id=config['camera_id'],
+                model_path=self.model_path,
+                confidence_threshold=self.confidence_threshold,
+                start_time=self.start_time,
+                record_clips=self.record_clips,
+                trigger=AnomalyTrigger() if self.use_trigger else None,
+                model=self.model,
+                evidence_writer=self.evidence_writer
+            )
+            if not monitor.initialize(video_source=config['video_source']):
+                logging.error(f"Failed to initialize source {config['video_source']}")
+                monitor.cleanup()
+                continue
+            self.sources.append(VideoSource(config, monitor))
+
+        logging.info(f"{len(self.sources)} source(s) ready:")
+        for source in self.sources:
+            logging.info(f"  - {source.name} (camera {source.config['camera_id']}): {source.config['video_source']}")
+
+        return bool(self.sources)
+
+    def run(self, max_frames: Optional[int] = None) -> int:
+        """
+        Read all sources round-robin and run batched accident inference
+
+        Args:
+            max_frames: Maximum frames to read per source (None for entire videos)
+
+        Returns:
+            Total number of accidents detected
+        """
+        for source in self.sources:
+            source.capture = cv2.VideoCapture(source.config['video_source'])
+            if not source.capture.isOpened():
+                logging.error(f"Could not open video source: {source.config['video_source']}")
+                continue
+            source.clock = PipelineClock.for_capture(source.capture, start_time=self.start_time)
+            source.active = True
+
+        start = time.time()
+        rounds = 0
+        try:
+            while any(source.active for source in self.sources):
+                due = []
+                for source in self.sources:
+                    if not source.active:
+                        continue
+                    if max_frames and source.frames_decoded >= max_frames:
+                        self._finish_source(source)
+                        continue
+
+                    ret, frame = source.capture.read()
+                    if not ret:
+                        logging.info(f"End of video stream: {source.name}")
+                        self._finish_source(source)
+                        continue
+
+                    source.frames_decoded += 1
+                    source.clock.tick(source.capture)
+
+                    monitor = source.monitor
+                    if monitor.clip_recorder:
+                        monitor.clip_recorder.process_frame(frame, source.clock)
+
+                    if (source.frames_decoded - 1) % self.every_n_frames == 0:
+                        due.append((source, frame, monitor.select_regions(frame, source.clock)))
+
+                self._infer(due)
+
+                rounds += 1
+                if rounds % 500 == 0:
+                    elapsed = time.time() - start
+                    logging.info(f"Round {rounds} | {len(self.sources)} sources | "
+                                 f"{self.crops_inferred} crops in {self.model_calls} model calls | "
+                                 f"{sum(s.frames_decoded for s in self.sources) / max(elapsed, 1e-9):.1f} frames/s total")
+        finally:
+            for source in self.sources:
+                if source.active:
+                    self._finish_source(source)
+
+        return sum(source.monitor.accident_count for source in self.sources)
+
+    def _infer(self, due: list):
+        """Run the shared model on the crops of all due sources, in batches, and dispatch results"""
+        crops = []
+        for _, frame, regions in due:
+            crops.extend(crop_regions(frame, regions))
+
+        results = []
+        for offset in range(0, len(crops), self.batch_size):
+            batch = crops[offset:offset + self.batch_size]
+            results.extend(self.model(batch, conf=self.confidence_threshold, verbose=False))
+            self.model_calls += 1
+        self.crops_inferred += len(crops)
+
+        offset = 0
+        for source, frame, regions in due:
+            source_results = results[offset:offset + len(regions)]
+            offset += len(regions)
+            source.monitor.process_results(frame, source.clock, regions, source_results)
+
+    def _finish_source(self, source: VideoSource):
+        source.active = False
+        if source.capture is not None:
+            source.capture.release()
+        if source.clock is not None:
+            source.monitor.finish(source.clock)
+
+    def cleanup(self):
+        """Write pending clips, drain the shared evidence writer and close sessions"""
+        for source in self.sources:
+            source.monitor.cleanup()
+        if self.evidence_writer:
+            self.evidence_writer.stop()
+
+        logging.info("="*60)
+        logging.info("MULTI-SOURCE ACCIDENT DETECTION COMPLETED")
+        logging.info("="*60)
+        for source in self.sources:
+            logging.info(f"{source.name} (camera {source.config['camera_id']}): {source.frames_decoded} frames, "
+                         f"{source.monitor.model_runs} model runs, {source.monitor.accident_count} accident(s)")
+        logging.info(f"Model calls: {self.model_calls} | Crops inferred: {self.crops_inferred}")
+        logging.info("="*60)
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description='Multi-Source Accident Monitor - every phase/camera of one or more junctions',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Monitor all four approaches of junction J-002 with one model
+  python multi_source_monitor.py --junctions J-002
+
+  # Several junctions in one process
+  python multi_source_monitor.py --junctions J-001 J-002 J-003
+        """
+    )
+
+    parser.add_argument('--junctions', type=str, nargs='+', required=True,
+                        help='Junction IDs to monitor (e.g., J-001 J-002)')
+    parser.add_argument('--confidence', type=float, default=Config.ACCIDENT_CONFIDENCE_THRESHOLD,
+                        help=f'Confidence threshold for detection (default: {Config.ACCIDENT_CONFIDENCE_THRESHOLD})')
+    parser.add_argument('--model', type=str, default=Config.ACCIDENT_MODEL,
+                        help='Path to YOLO model weights')
+    parser.add_argument('--every-n-frames', type=int, default=Config.ACCIDENT_EVERY_N_FRAMES,
+                        help=f'Run the model on every Nth frame of each source (default: {Config.ACCIDENT_EVERY_N_FRAMES})')
+    parser.add_argument('--batch-size', type=int, default=Config.ACCIDENT_BATCH_SIZE,
+                        help=f'Maximum crops per model call (default: {Config.ACCIDENT_BATCH_SIZE})')
+    parser.add_argument('--max-frames', type=int,
+                        help='Maximum frames to process per source (for testing)')
+    parser.add_argument('--no-clips', action='store_true',
+                        help='Do not save pre/post-event video clips')
+    parser.add_argument('--no-trigger', action='store_true',
+                        help='Run the model on every full frame instead of gating it with the motion trigger')
+    parser.add_argument('--start-time', type=str,
+                        help='ISO 8601 timestamp of the first video frame, for backfills (default: now)')
+
+    args = parser.parse_args()
+
+    monitor = MultiSourceAccidentMonitor(
+        junction_ids=args.junctions,
+        model_path=args.model,
+        confidence_threshold=args.confidence,
+        every_n_frames=args.every_n_frames,
+        batch_size=args.batch_size,
+        start_time=parse_start_time(args.start_time),
+        record_clips=not args.no_clips,
+        use_trigger=not args.no_trigger
+    )
+
+    if not monitor.initialize():
+        logging.error("Failed to initialize multi-source accident monitor")
+        monitor.cleanup()
+        return 1
+
+    try:
+        monitor.run(max_frames=args.max_frames)
+        return 0
+
+    except KeyboardInterrupt:
+        logging.info("\nMonitoring interrupted by user")
+        return 0
+
+    except Exception as e:
+        logging.error(f"Fatal error: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+    finally:
+        monitor.cleanup()
+
+
+if __name__ == '__main__':
+    exit(main())
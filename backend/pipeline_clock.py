@@ -0,0 +1,104 @@
+# pipeline_clock.py
+"""
+Video-timestamp-driven pipeline clock.
+
+All event times in the CV runners (count buckets, accident incident timing,
+evidence names, detected_at) come from this clock instead of the wall clock.
+Time is the source's presentation timestamp (PTS) when available, otherwise
+frame_index / fps, added to a configured start time. Replaying a recording
+faster than real time therefore still produces a correct timeline.
+
+PTS is taken relative to the first positive PTS seen, since live/RTSP streams
+start at an arbitrary nonzero PTS. When the PTS goes backwards (the stream
+restarted after a reconnect) the offset is re-anchored so the clock keeps
+running from where it was instead of freezing.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+import cv2
+
+
+def parse_start_time(value: Optional[str]) -> datetime:
+    """
+    Parse a pipeline start time
+
+    Args:
+        value: ISO 8601 timestamp (e.g. '2026-01-18T04:00:00+05:30'), or None for now.
+               Naive timestamps are taken as local time.
+
+    Returns:
+        Timezone-aware datetime
+    """
+    if not value:
+        return datetime.now().astimezone()
+
+    return datetime.fromisoformat(value).astimezone()
+
+
+class PipelineClock:
+    """
+    Clock driven by the video source's timestamps
+    """
+
+    def __init__(self, start_time: Optional[datetime] = None, fps: float = 0.0):
+        """
+        Initialize the clock
+
+        Args:
+            start_time: Timestamp of the first frame (defaults to now, local time)
+            fps: Nominal frame rate, used when the source has no usable PTS
+        """
+        self.start_time = start_time or datetime.now().astimezone()
+        self.fps = fps if fps and fps > 0 else 30.0
+        self.frame_index = -1
+        self.elapsed = 0.0
+        self.pts_origin: Optional[float] = None  # source PTS that maps to pts_base
+        self.pts_base = 0.0
+        self.last_pts: Optional[float] = None
+
+        logging.info(f"PipelineClock started at {self.start_time.isoformat()} (fallback {self.fps:.2f} FPS)")
+
+    @classmethod
+    def for_capture(cls, capture: cv2.VideoCapture, start_time: Optional[datetime] = None) -> "PipelineClock":
+        """Create a clock using the capture's nominal frame rate"""
+        return cls(start_time=start_time, fps=capture.get(cv2.CAP_PROP_FPS))
+
+    def tick(self, capture: Optional[cv2.VideoCapture] = None) -> float:
+        """
+        Advance to the frame just read
+
+        Args:
+            capture: Capture the frame was read from; its PTS is used when available
+
+        Returns:
+            Seconds since start_time for this frame (never decreasing)
+        """
+        self.frame_index += 1
+        elapsed = self.frame_index / self.fps
+
+        if capture is not None:
+            pts_seconds = capture.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+            if pts_seconds > 0:
+                if self.pts_origin is None:
+                    self.pts_origin, self.pts_base = pts_seconds, elapsed
+                elif pts_seconds < self.last_pts:
+                    # Stream restarted: continue one frame after the last timestamp
+                    logging.info(f"PipelineClock: PTS went back from {self.last_pts:.3f}s to "
+                                 f"{pts_seconds:.3f}s, re-anchoring at {self.elapsed:.3f}s")
+                    self.pts_origin, self.pts_base = pts_seconds, self.elapsed + 1.0 / self.fps
+                self.last_pts = pts_seconds
+                elapsed = self.pts_base + (pts_seconds - self.pts_origin)
+
+        self.elapsed = max(self.elapsed, elapsed)
+        return self.elapsed
+
+    def now(self) -> datetime:
+        """Timestamp of the current frame"""
+        return self.start_time + timedelta(seconds=self.elapsed)
+
+    def at(self, elapsed_seconds: float) -> datetime:
+        """Timestamp of a point on the video timeline"""
+        return self.start_time + timedelta(seconds=elapsed_seconds)
@@ -1,15 +1,18 @@
 # prototype_headless.py - Headless vehicle detection for multi-junction traffic system
-import cv2
 import logging
-import time
 import argparse
 import sys
+import numpy as np
 
 # Import the custom classes and config
 from vehicle_detector import VehicleDetector
 from vehicle_tracker import VehicleTracker
 from config import Config
-from db_helpers import get_phase_config, save_traffic_count
+from db_helpers import get_phase_config, save_traffic_counts
+from line_counter import LineCrossingCounter
+from count_buckets import CountBucketAggregator
+from pipeline_clock import PipelineClock, parse_start_time
+from frame_pipeline import FramePipeline
 
 # Configure logging
 logging.basicConfig(level=Config.LOG_LEVEL, format='%(asctime)s - %(levelname)s - %(message)s',
@@ -23,147 +26,153 @@ def parse_arguments():
                         help='Junction ID (e.g., J-001)')
     parser.add_argument('--phase_number', type=int, required=True, 
                         help='Phase number (e.g., 1, 2, 3, 4)')
+    parser.add_argument('--bucket_seconds', type=float, default=Config.COUNT_BUCKET_SECONDS,
+                        help=f'Length of each traffic_data count bucket in seconds (default: {Config.COUNT_BUCKET_SECONDS})')
+    parser.add_argument('--start_time', type=str, default=None,
+                        help='ISO 8601 timestamp of the first video frame, for backfills (default: now)')
     return parser.parse_args()
 
-def main():
-    """
-    Main function to run headless vehicle detection, tracking, and counting.
-    """
-    # Parse command-line arguments
-    args = parse_arguments()
-    junction_id = args.junction_id
-    phase_number = args.phase_number
-    
-    logger.info(f"Starting headless vehicle detection for Junction={junction_id}, Phase={phase_number}")
-    
-    # Load configuration from database
+
+def load_phase_config(junction_id: str, phase_number: int) -> dict:
+    """Load and log the phase configuration, exiting if it is incomplete"""
     config = get_phase_config(junction_id, phase_number)
     if not config:
         logger.error(f"Failed to load configuration for Junction={junction_id}, Phase={phase_number}")
         logger.error("Please ensure ROI coordinates and video source are set in the database.")
         sys.exit(1)
     
-    roi_coordinates = config['roi_coordinates']
-    video_source = config['video_source']
-    
     logger.info(f"Loaded configuration from database:")
-    logger.info(f"  - ROI coordinates: {roi_coordinates}")
-    logger.info(f"  - Video source: {video_source}")
+    logger.info(f"  - ROI coordinates: {config['roi_coordinates']}")
+    logger.info(f"  - ROI polygon: {config['roi_polygon']}")
+    logger.info(f"  - Count lines: {config['count_lines']}")
+    logger.info(f"  - Video source: {config['video_source']}")
     logger.info(f"  - Lane count: {config['lane_count']}")
     logger.info(f"  - Default timer: {config['default_timer_sec']}s")
+    return config
+
+
+class PhaseCountingHead:
+    """
+    Pipeline head that detects, tracks and counts vehicles for one phase ROI,
+    streaming time-bucketed counts to traffic_data
+    """
     
-    # Initialize VehicleDetector
-    detector = VehicleDetector(model_path=Config.DEFAULT_MODEL)
-    logger.info(f"Detector initialized using model: {detector.model_path}")
-    
-    # Set ROI from database
-    roi_x1, roi_y1, roi_x2, roi_y2 = roi_coordinates
-    detector.set_roi(roi_coordinates, enabled=True)
-    logger.info(f"ROI set for detection: {roi_coordinates}")
-    
-    # Open video
-    video = cv2.VideoCapture(video_source)
-    
-    if not video.isOpened():
-        logger.error(f"Error: Could not open video source: {video_source}")
-        sys.exit(1)
-    
-    # Initialize VehicleTracker
-    tracker = VehicleTracker(max_track_age=Config.MAX_TRACK_AGE, min_hits=Config.MIN_HITS)
-    
-    logger.info("Starting headless video processing...")
-    
-    # For FPS calculation
-    frame_count = 0
-    start_time = time.time()
-    
-    # Initialize final counts
-    final_two_wheeler_count = 0
-    final_light_motor_count = 0
-    final_heavy_motor_count = 0
-    
-    total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
-    logger.info(f"Total frames to process: {total_frames}")
-    
-    processed_frames = 0
-    log_interval = max(1, total_frames // 10)  # Log progress every 10%
-    
-    while True:
-        ret, frame = video.read()
-        if not ret:
-            logger.info("End of video stream.")
-            break
+    def __init__(self, junction_id: str, phase_number: int, config: dict, start_time,
+                 bucket_seconds: float = Config.COUNT_BUCKET_SECONDS):
+        """
+        Initialize the head
+        
+        Args:
+            junction_id: Junction ID (e.g., J-001)
+            phase_number: Phase number (e.g., 1, 2, 3, 4)
+            config: Phase configuration from get_phase_config
+            start_time: Timestamp of the first frame (same as the pipeline clock)
+            bucket_seconds: Length of each count bucket in seconds
+        """
+        self.junction_id = junction_id
+        self.phase_number = phase_number
+        self.bucket_seconds = bucket_seconds
         
-        processed_frames += 1
+        # Initialize VehicleDetector
+        self.detector = VehicleDetector(model_path=Config.DEFAULT_MODEL)
+        logger.info(f"Detector initialized using model: {self.detector.model_path}")
         
-        # Log progress periodically
-        if processed_frames % log_interval == 0:
-            progress = (processed_frames / total_frames) * 100
-            logger.info(f"Progress: {progress:.1f}% ({processed_frames}/{total_frames} frames)")
+        # Set ROI from database (rasterized once into a lookup mask)
+        self.detector.set_roi_polygon(config['roi_polygon'], enabled=True)
+        self.roi = self.detector.roi
+        logger.info(f"ROI set for detection: bbox={self.roi.bbox}")
+        
+        # Initialize VehicleTracker and count lines
+        self.tracker = VehicleTracker(max_track_age=Config.MAX_TRACK_AGE, min_hits=Config.MIN_HITS)
+        self.line_counter = LineCrossingCounter(config['count_lines'])
+        self.latest_tracks = {}
+        
+        # Counts are bucketed on the video timeline and flushed as buckets close
+        self.aggregator = CountBucketAggregator(
+            junction_id=junction_id,
+            phase_number=phase_number,
+            start_time=start_time,
+            writer=save_traffic_counts,
+            bucket_seconds=bucket_seconds
+        )
+        self.saved = False
+    
+    def process_frame(self, frame, clock: PipelineClock):
+        """Detect, track and count vehicles in one frame"""
+        video_seconds = clock.elapsed
         
         # 1. Detect Vehicles
-        detections = detector.detect_vehicles(frame)
+        detections = self.detector.detect_vehicles(frame)
         
         # 2. Update Tracker
-        tracked_objects = tracker.update_tracks(detections)
-        
-        # 3. Count vehicles within ROI
-        current_two_wheeler_count = 0
-        current_light_motor_count = 0
-        current_heavy_motor_count = 0
+        tracked_objects = self.tracker.update_tracks(detections)
+        self.latest_tracks = tracked_objects
         
-        for track_id, track_data in tracked_objects.items():
-            center_x, center_y = track_data['center']
-            vehicle_class = track_data['vehicle_class']
-            
-            # Check if the tracked vehicle's center is within ROI
-            if roi_x1 < center_x < roi_x2 and roi_y1 < center_y < roi_y2:
-                if vehicle_class == "two_wheeler":
-                    current_two_wheeler_count += 1
-                elif vehicle_class == "light_motor":
-                    current_light_motor_count += 1
-                elif vehicle_class == "heavy_motor":
-                    current_heavy_motor_count += 1
+        # 3. Count line crossings, keeping only tracks inside the ROI (one vectorized mask lookup)
+        events = self.line_counter.update(tracked_objects)
+        if events:
+            centers = np.array([tracked_objects[e['track_id']]['center'] for e in events],
+                               dtype=np.float64).reshape(-1, 2)
+            for event, inside in zip(events, self.roi.contains(centers)):
+                track_data = tracked_objects[event['track_id']]
+                if inside and not track_data.get('counted'):
+                    track_data['counted'] = True
+                    self.aggregator.add(video_seconds, event['vehicle_class'])
         
-        # Update final counts
-        final_two_wheeler_count = current_two_wheeler_count
-        final_light_motor_count = current_light_motor_count
-        final_heavy_motor_count = current_heavy_motor_count
+        # 4. Close (and batch-write) any buckets that ended on the video timeline
+        self.aggregator.advance(video_seconds)
+    
+    def finish(self, clock: PipelineClock):
+        """Write the final partial bucket and anything still pending"""
+        logger.info("Saving remaining traffic buckets to database...")
+        self.saved = self.aggregator.close(clock.elapsed if clock else 0.0)
         
-        # Calculate FPS
-        frame_count += 1
-        if frame_count % 30 == 0:  # Log FPS every 30 frames
-            elapsed_time = time.time() - start_time
-            if elapsed_time > 0:
-                current_fps = frame_count / elapsed_time
-                logger.debug(f"Processing FPS: {current_fps:.2f}")
+        # Calculate final statistics
+        totals = self.aggregator.totals
+        total_vehicles = sum(totals.values())
+        logger.info("="*60)
+        logger.info("FINAL VEHICLE COUNTS:")
+        logger.info(f"  Junction: {self.junction_id}")
+        logger.info(f"  Phase: {self.phase_number}")
+        logger.info(f"  Two-Wheelers: {totals['two_wheelers']}")
+        logger.info(f"  Light Motor Vehicles: {totals['light_vehicles']}")
+        logger.info(f"  Heavy Motor Vehicles: {totals['heavy_vehicles']}")
+        logger.info(f"  TOTAL: {total_vehicles}")
+        logger.info(f"  Buckets written: {self.aggregator.buckets_written} x {self.bucket_seconds:.0f}s")
+        if self.aggregator.buckets_dropped:
+            logger.warning(f"  Buckets dropped (writes failing): {self.aggregator.buckets_dropped}")
+        logger.info("="*60)
+
+
+def main():
+    """
+    Main function to run headless vehicle detection, tracking, and counting.
+    """
+    # Parse command-line arguments
+    args = parse_arguments()
+    junction_id = args.junction_id
+    phase_number = args.phase_number
     
-    video.release()
-    logger.info("Video processing completed.")
+    logger.info(f"Starting headless vehicle detection for Junction={junction_id}, Phase={phase_number}")
     
-    # Calculate final statistics
-    total_vehicles = final_two_wheeler_count + final_light_motor_count + final_heavy_motor_count
-    logger.info("="*60)
-    logger.info("FINAL VEHICLE COUNTS:")
-    logger.info(f"  Junction: {junction_id}")
-    logger.info(f"  Phase: {phase_number}")
-    logger.info(f"  Two-Wheelers: {final_two_wheeler_count}")
-    logger.info(f"  Light Motor Vehicles: {final_light_motor_count}")
-    logger.info(f"  Heavy Motor Vehicles: {final_heavy_motor_count}")
-    logger.info(f"  TOTAL: {total_vehicles}")
-    logger.info("="*60)
+    # Load configuration from database
+    config = load_phase_config(junction_id, phase_number)
+    
+    # Pipeline time comes from the video timestamps, not the wall clock
+    start_time = parse_start_time(args.start_time)
+    counting_head = PhaseCountingHead(junction_id, phase_number, config, start_time,
+                                      bucket_seconds=args.bucket_seconds)
+    
+    logger.info("Starting headless video processing...")
+    pipeline = FramePipeline(config['video_source'], start_time=start_time)
+    pipeline.add_head(counting_head, name='vehicle_counting')
+    if pipeline.run() == 0:
+        logger.error(f"Error: Could not process video source: {config['video_source']}")
+        sys.exit(1)
     
-    # Save to database
-    logger.info("Saving traffic data to database...")
-    success = save_traffic_count(
-        junction_id=junction_id,
-        phase_number=phase_number,
-        two_wheelers=final_two_wheeler_count,
-        light_vehicles=final_light_motor_count,
-        heavy_vehicles=final_heavy_motor_count
-    )
+    logger.info("Video processing completed.")
     
-    if success:
+    if counting_head.saved:
         logger.info("✓ Successfully saved traffic data to database")
     else:
         logger.error("✗ Failed to save traffic data to database")
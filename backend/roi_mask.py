@@ -0,0 +1,138 @@
+# roi_mask.py
+"""
+Polygon Region of Interest (ROI) support.
+
+A phase ROI is stored as a polygon (list of [x, y] vertices). The polygon is
+rasterized once into a binary mask covering its tight bounding box, so that:
+- the detector only crops the bounding box and blanks pixels outside the polygon
+- point-in-ROI tests for all track centers are a single vectorized mask lookup
+"""
+
+import json
+import logging
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+
+def parse_polygon(value) -> Optional[List[List[int]]]:
+    """
+    Parse a polygon from a JSON string or a sequence of [x, y] points
+
+    Args:
+        value: JSON string like "[[x1, y1], [x2, y2], ...]" or a list of points
+
+    Returns:
+        List of [x, y] integer vertices, or None if the value is empty/invalid
+    """
+    if value is None or value == "":
+        return None
+
+    try:
+        points = json.loads(value) if isinstance(value, str) else value
+        polygon = [[int(round(float(p[0]))), int(round(float(p[1])))] for p in points]
+    except (TypeError, ValueError, IndexError) as e:
+        logging.error(f"Invalid ROI polygon {value!r}: {e}")
+        return None
+
+    if len(polygon) < 3:
+        logging.error(f"ROI polygon needs at least 3 vertices, got {len(polygon)}")
+        return None
+
+    return polygon
+
+
+def rect_to_polygon(coordinates: Sequence[int]) -> List[List[int]]:
+    """Convert [x1, y1, x2, y2] rectangle coordinates to a 4-vertex polygon"""
+    x1, y1, x2, y2 = [int(c) for c in coordinates]
+    return [[x1, y1], [x2, y1], [x2, y2], [x1, y2]]
+
+
+class PolygonROI:
+    """
+    Polygon ROI rasterized into a lookup mask over its bounding box
+    """
+
+    def __init__(self, polygon: Sequence[Sequence[int]]):
+        """
+        Build the ROI mask
+
+        Args:
+            polygon: List of [x, y] vertices in frame coordinates
+        """
+        self.polygon = np.asarray(polygon, dtype=np.int32).reshape(-1, 2)
+        if len(self.polygon) < 3:
+            raise ValueError("ROI polygon needs at least 3 vertices")
+
+        # Tight bounding box (x2/y2 exclusive, like numpy slicing)
+        self.x1 = max(int(self.polygon[:, 0].min()), 0)
+        self.y1 = max(int(self.polygon[:, 1].min()), 0)
+        self.x2 = int(self.polygon[:, 0].max())
+        self.y2 = int(self.polygon[:, 1].max())
+        if self.x2 <= self.x1 or self.y2 <= self.y1:
+            raise ValueError(f"Degenerate ROI polygon: {self.polygon.tolist()}")
+
+        # Rasterize once; the mask is indexed in bounding-box local coordinates
+        self.mask = np.zeros((self.y2 - self.y1, self.x2 - self.x1), dtype=np.uint8)
+        cv2.fillPoly(self.mask, [self.polygon - [self.x1, self.y1]], 255)
+        self._lookup = self.mask.astype(bool)
+
+        # Axis-aligned rectangles need no per-frame masking
+        self.is_rectangle = bool(self._lookup.all())
+
+    @classmethod
+    def from_rect(cls, coordinates: Sequence[int]) -> "PolygonROI":
+        """Create an ROI from [x1, y1, x2, y2] rectangle coordinates"""
+        return cls(rect_to_polygon(coordinates))
+
+    @property
+    def bbox(self) -> Tuple[int, int, int, int]:
+        """Tight bounding box as (x1, y1, x2, y2)"""
+        return self.x1, self.y1, self.x2, self.y2
+
+    def contains(self, points) -> np.ndarray:
+        """
+        Vectorized point-in-ROI test
+
+        Args:
+            points: Array-like of shape (N, 2) with [x, y] frame coordinates
+
+        Returns:
+            Boolean array of shape (N,)
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if len(points) == 0:
+            return np.zeros(0, dtype=bool)
+
+        xs = np.floor(points[:, 0]).astype(np.int64) - self.x1
+        ys = np.floor(points[:, 1]).astype(np.int64) - self.y1
+        height, width = self._lookup.shape
+        inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+
+        result = np.zeros(len(points), dtype=bool)
+        result[inside] = self._lookup[ys[inside], xs[inside]]
+        return result
+
+    def crop(self, frame: np.ndarray) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """
+        Crop the frame to the ROI bounding box and blank pixels outside the polygon
+
+        Args:
+            frame: Full video frame
+
+        Returns:
+            (cropped frame, (x_offset, y_offset)) of the crop in frame coordinates
+        """
+        crop = frame[self.y1:self.y2, self.x1:self.x2]
+        if self.is_rectangle:
+            return crop, (self.x1, self.y1)
+
+        # Frame may be smaller than the polygon bounds
+        mask = self.mask[:crop.shape[0], :crop.shape[1]]
+        return cv2.bitwise_and(crop, crop, mask=mask), (self.x1, self.y1)
+
+    def draw(self, frame: np.ndarray, color=(255, 255, 0), thickness: int = 2) -> np.ndarray:
+        """Draw the ROI outline on a frame (in place)"""
+        cv2.polylines(frame, [self.polygon], isClosed=True, color=color, thickness=thickness)
+        return frame
@@ -0,0 +1,114 @@
+# run_pipeline.py - Single-decode pipeline: vehicle counting and accident detection on the same frames
+"""
+Opens a phase's video source once and fans every decoded frame out to:
+- the vehicle counting head (detector on the ROI, time-bucketed counts)
+- the accident detection head (accident model on the full frame, every Nth frame)
+
+Replaces running prototype_headless.py and detect_accident.py side by side,
+which decoded every frame twice and held the two models in two processes.
+"""
+
+import argparse
+import logging
+import sys
+
+from config import Config
+from frame_pipeline import FramePipeline
+from pipeline_clock import parse_start_time
+from prototype_headless import PhaseCountingHead, load_phase_config
+from detect_accident import AccidentMonitor
+from anomaly_trigger import AnomalyTrigger
+
+logger = logging.getLogger(__name__)
+
+
+def parse_arguments():
+    """Parse command-line arguments"""
+    parser = argparse.ArgumentParser(description='Single-decode vehicle counting and accident detection pipeline')
+    parser.add_argument('--junction_id', type=str, required=True,
+                        help='Junction ID (e.g., J-001)')
+    parser.add_argument('--phase_number', type=int, required=True,
+                        help='Phase number (e.g., 1, 2, 3, 4)')
+    parser.add_argument('--camera_id', type=str, default=None,
+                        help='Camera ID to tag accident records with (optional)')
+    parser.add_argument('--bucket_seconds', type=float, default=Config.COUNT_BUCKET_SECONDS,
+                        help=f'Length of each traffic_data count bucket in seconds (default: {Config.COUNT_BUCKET_SECONDS})')
+    parser.add_argument('--count_every', type=int, default=1,
+                        help='Run the vehicle detector on every Nth frame (default: 1)')
+    parser.add_argument('--accident_every', type=int, default=Config.ACCIDENT_EVERY_N_FRAMES,
+                        help=f'Run the accident model on every Nth frame (default: {Config.ACCIDENT_EVERY_N_FRAMES})')
+    parser.add_argument('--accident_model', type=str, default=Config.ACCIDENT_MODEL,
+                        help=f'Path to accident model weights (default: {Config.ACCIDENT_MODEL})')
+    parser.add_argument('--confidence', type=float, default=Config.ACCIDENT_CONFIDENCE_THRESHOLD,
+                        help=f'Accident confidence threshold (default: {Config.ACCIDENT_CONFIDENCE_THRESHOLD})')
+    parser.add_argument('--no_accidents', action='store_true',
+                        help='Run vehicle counting only')
+    parser.add_argument('--no_clips', action='store_true',
+                        help='Do not save pre/post-event accident video clips')
+    parser.add_argument('--no_trigger', action='store_true',
+                        help='Run the accident model on every full frame instead of gating it '
+                             'with tracker and motion anomalies')
+    parser.add_argument('--start_time', type=str, default=None,
+                        help='ISO 8601 timestamp of the first video frame, for backfills (default: now)')
+    parser.add_argument('--max_frames', type=int, default=None,
+                        help='Maximum frames to decode (for testing)')
+    return parser.parse_args()
+
+
+def main():
+    """Build the pipeline for one phase camera and run it to the end of the stream"""
+    args = parse_arguments()
+    junction_id = args.junction_id
+    phase_number = args.phase_number
+
+    logger.info(f"Starting single-decode pipeline for Junction={junction_id}, Phase={phase_number}")
+
+    config = load_phase_config(junction_id, phase_number)
+    start_time = parse_start_time(args.start_time)
+
+    pipeline = FramePipeline(config['video_source'], start_time=start_time)
+
+    counting_head = PhaseCountingHead(junction_id, phase_number, config, start_time,
+                                      bucket_seconds=args.bucket_seconds)
+    pipeline.add_head(counting_head, every_n_frames=args.count_every, name='vehicle_counting')
+
+    accident_monitor = None
+    if not args.no_accidents:
+        accident_monitor = AccidentMonitor(
+            junction_id=junction_id,
+            phase_number=phase_number,
+            model_path=args.accident_model,
+            confidence_threshold=args.confidence,
+            camera_id=args.camera_id,
+            start_time=start_time,
+            record_clips=not args.no_clips,
+            trigger=None if args.no_trigger else AnomalyTrigger(track_source=counting_head)
+        )
+        if not accident_monitor.initialize(video_source=config['video_source']):
+            logger.error("Failed to initialize accident monitor")
+            sys.exit(1)
+        if accident_monitor.clip_recorder:
+            # Every frame goes to the clip buffer before the detector sees it
+            pipeline.add_head(accident_monitor.clip_recorder, name='clip_buffer')
+        pipeline.add_head(accident_monitor, every_n_frames=args.accident_every, name='accident_detection')
+
+    try:
+        if pipeline.run(max_frames=args.max_frames) == 0:
+            logger.error(f"Error: Could not process video source: {config['video_source']}")
+            sys.exit(1)
+    except KeyboardInterrupt:
+        logger.info("Pipeline interrupted by user")
+        counting_head.finish(pipeline.clock)
+    finally:
+        if accident_monitor:
+            accident_monitor.cleanup()
+
+    if not counting_head.saved:
+        logger.error("✗ Failed to save traffic data to database")
+        sys.exit(1)
+
+    logger.info("Application finished successfully.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+# schedule_cache.py
+"""
+In-process cache of calculated signal schedules, keyed by junction.
+
+A schedule only changes when new traffic counts arrive or the junction's
+signal phases change, so repeated /schedule polls are served from memory.
+Entries are invalidated by SQLAlchemy session events: any committed insert,
+update or delete of TrafficData or SignalPhase rows (save_traffic_count,
+save_traffic_counts, /traffic-data-record, phase edits) drops the cached
+schedules of the junctions it touched. Concurrent requests for the same
+junction share one computation (single-flight).
+
+Writes made by other processes (e.g. a separate run_pipeline.py) do not fire
+events here; Config.SCHEDULE_CACHE_TTL_SECONDS bounds how stale an entry can
+get in that case.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import traffic_cycle
+from config import Config
+from models import SignalPhase, TrafficData
+
+WATCHED_MODELS = (TrafficData, SignalPhase)
+
+
+class _Flight:
+    """One in-progress computation that concurrent callers wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class ScheduleCache:
+    """
+    Per-junction schedule cache with write-triggered invalidation and single-flight
+
+    Entries are keyed by (junction_id, demand mode, method); invalidation works per junction.
+    """
+
+    def __init__(self, ttl_seconds: float = Config.SCHEDULE_CACHE_TTL_SECONDS):
+        """
+        Initialize the cache
+
+        Args:
+            ttl_seconds: Maximum age of an entry; 0 or less keeps entries until invalidated
+        """
+        self.ttl_seconds = ttl_seconds
+        self.lock = threading.Lock()
+        self.entries: Dict[tuple, tuple] = {}   # (junction_id, demand, method) -> (schedule, computed_at)
+        self.generations: Dict[str, int] = {}   # junction_id -> invalidation counter
+        self.flights: Dict[tuple, _Flight] = {}
+        self.listeners = []  # Called with the junction IDs of every invalidation
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+    def get(self, junction_id: str, demand: str = "latest", method: str = "formula") -> List[Dict]:
+        """
+        Schedule of a junction, computed at most once per invalidation
+
+        Args:
+            junction_id: Junction ID
+            demand: Demand mode passed to traffic_cycle.calculate_schedule
+            method: Schedule method passed to traffic_cycle.calculate_schedule
+
+        Raises:
+            ValueError: If the junction has no signal phases
+        """
+        key = (junction_id, demand, method)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and not self._expired(entry):
+                self.hits += 1
+                return self._copy(entry[0])
+
+            flight = self.flights.get(key)
+            if flight is None:
+                flight = _Flight()
+                self.flights[key] = flight
+                generation = self.generations.get(junction_id, 0)
+                leader = True
+                self.misses += 1
+            else:
+                leader = False
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return self._copy(flight.result)
+
+        try:
+            flight.result = traffic_cycle.calculate_schedule(junction_id=junction_id, demand=demand, method=method)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                # A write that landed while computing makes this result stale: serve it, don't keep it
+                if flight.error is None and self.generations.get(junction_id, 0) == generation:
+                    self.entries[key] = (flight.result, time.monotonic())
+                self.flights.pop(key, None)
+            flight.done.set()
+
+        return self._copy(flight.result)
+
+    def invalidate(self, junction_ids):
+        """Drop the cached schedules of these junctions"""
+        with self.lock:
+            junction_ids = set(junction_ids)
+            for junction_id in junction_ids:
+                self.generations[junction_id] = self.generations.get(junction_id, 0) + 1
+            for key in [key for key in self.entries if key[0] in junction_ids]:
+                del self.entries[key]
+                self.invalidations += 1
+        for listener in self.listeners:
+            listener(junction_ids)
+
+    def add_invalidation_listener(self, listener):
+        """Register a callable notified with the junction IDs of every invalidation"""
+        self.listeners.append(listener)
+
+    def clear(self):
+        """Drop every cached schedule"""
+        with self.lock:
+            for junction_id, *_ in set(self.entries) | set(self.flights):
+                self.generations[junction_id] = self.generations.get(junction_id, 0) + 1
+            junction_ids = {key[0] for key in self.entries}
+            self.invalidations += len(self.entries)
+            self.entries.clear()
+        for listener in self.listeners:
+            listener(junction_ids)
+
+    def stats(self) -> Dict:
+        """Cache counters"""
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'invalidations': self.invalidations,
+            }
+
+    def _expired(self, entry) -> bool:
+        return self.ttl_seconds > 0 and time.monotonic() - entry[1] > self.ttl_seconds
+
+    @staticmethod
+    def _copy(schedule: List[Dict]) -> List[Dict]:
+        return [dict(row) for row in schedule]
+
+
+schedule_cache = ScheduleCache()
+
+
+# --- Invalidation from committed writes ---
+
+def _touched_junctions(session) -> set:
+    """Junction IDs of watched rows in the session's pending changes"""
+    junction_ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, WATCHED_MODELS) and obj.junction_id is not None:
+            junction_ids.add(obj.junction_id)
+    return junction_ids
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_touched_junctions(session, flush_context, instances):
+    session.info.setdefault('schedule_junctions', set()).update(_touched_junctions(session))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    junction_ids = session.info.pop('schedule_junctions', None)
+    if junction_ids:
+        schedule_cache.invalidate(junction_ids)
+        logging.debug(f"Schedule cache invalidated for {sorted(junction_ids)}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session):
+    session.info.pop('schedule_junctions', None)
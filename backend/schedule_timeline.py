@@ -0,0 +1,206 @@
+# schedule_timeline.py
+"""
+Rolling precomputed schedule timeline for signal controllers.
+
+A daemon thread keeps, per junction, a ring buffer of the next
+Config.TIMELINE_CYCLES signal cycles with absolute (epoch) start times of every
+phase's green, yellow and red. Controllers fetch /timeline/{junction_id}
+rarely (with If-None-Match) and keep running from the buffer through API
+hiccups, instead of calling /schedule before each phase change.
+
+The buffer is topped up once half of it has been consumed, so its ETag only
+changes every few cycles. When new counts or phase changes invalidate a
+junction's schedule (schedule cache listener), cycles that have not started
+yet are recomputed; the running cycle is never changed. Responses are encoded
+once per version and served from memory.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import green_time_simulation as gts
+import traffic_cycle
+from config import Config
+from schedule_cache import schedule_cache
+
+
+def build_cycle(schedule: List[Dict], start: float) -> Dict:
+    """
+    Lay out one cycle of a schedule from an absolute start time
+
+    Phases run in order; each phase with green time takes G + Y + all-red.
+    Phases without green stay red for the whole cycle (green_start is None).
+    """
+    phases = []
+    t = start
+    for row in schedule:
+        if row['G'] > 0:
+            phases.append({
+                'phase': row['traffic_light_no'],
+                'green_start': round(t, 2),
+                'yellow_start': round(t + row['G'], 2),
+                'red_start': round(t + row['G'] + row['Y'], 2),
+            })
+            t += row['G'] + row['Y'] + gts.ALL_RED_TIME
+        else:
+            phases.append({'phase': row['traffic_light_no'], 'green_start': None,
+                           'yellow_start': None, 'red_start': round(start, 2)})
+
+    # Pad to the schedule's own cycle (intervals of phases without demand run all-red at the end);
+    # a junction without any demand still gets a minimum all-red cycle to keep the timeline moving
+    cycle = max((row['G'] + row['Y'] + row['R'] for row in schedule), default=0.0)
+    length = max(t - start, cycle, len(schedule) * (gts.YELLOW_TIME + gts.ALL_RED_TIME))
+    return {'start': round(start, 2), 'end': round(start + length, 2), 'phases': phases}
+
+
+class ScheduleTimeline:
+    """
+    Daemon that maintains per-junction ring buffers of upcoming cycles
+    """
+
+    def __init__(self, cycles: int = Config.TIMELINE_CYCLES,
+                 refresh_seconds: float = Config.TIMELINE_REFRESH_SECONDS,
+                 full_refresh_seconds: float = Config.SCHEDULE_CACHE_TTL_SECONDS):
+        """
+        Initialize the timeline
+
+        Args:
+            cycles: Cycles kept per junction (ring buffer size)
+            refresh_seconds: Daemon tick interval
+            full_refresh_seconds: Reload every junction's schedule this often (covers writes
+                                  made by other processes and new junctions)
+        """
+        self.cycles = max(2, cycles)
+        self.refresh_seconds = refresh_seconds
+        self.full_refresh_seconds = full_refresh_seconds
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+        self.schedules: Dict[str, List[Dict]] = {}
+        self.buffers: Dict[str, deque] = {}
+        self.versions: Dict[str, int] = {}
+        self.payloads: Dict[str, Tuple[str, bytes]] = {}  # junction_id -> (etag, encoded JSON)
+        self.dirty = set()
+        self.next_full_refresh = 0.0
+        self.ticks = 0
+        self.errors = 0
+
+    # --- Public API ---
+
+    def start(self):
+        """Start the daemon thread"""
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="schedule-timeline", daemon=True)
+        self.thread.start()
+        logging.info(f"Schedule timeline started ({self.cycles} cycles per junction, "
+                     f"tick every {self.refresh_seconds}s)")
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the daemon thread"""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+
+    def get(self, junction_id: str) -> Optional[Tuple[str, bytes]]:
+        """Current (etag, JSON body) of a junction's timeline, or None if unknown"""
+        with self.lock:
+            return self.payloads.get(junction_id)
+
+    def stats(self) -> Dict:
+        """Timeline counters"""
+        with self.lock:
+            junctions = len(self.payloads)
+        return {'junctions': junctions, 'ticks': self.ticks, 'errors': self.errors,
+                'running': self.thread is not None and self.thread.is_alive()}
+
+    def mark_dirty(self, junction_ids):
+        """Junction schedules changed (called from schedule cache invalidation)"""
+        with self.lock:
+            self.dirty.update(junction_ids)
+
+    # --- Daemon ---
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                self.errors += 1
+                logging.error(f"Schedule timeline tick failed: {e}")
+            self.stop_event.wait(self.refresh_seconds)
+
+    def tick(self, now: Optional[float] = None):
+        """Reload changed schedules, drop finished cycles and top up the buffers"""
+        now = time.time() if now is None else now
+        with self.lock:
+            dirty, self.dirty = self.dirty, set()
+
+        if now >= self.next_full_refresh:
+            schedules = traffic_cycle.calculate_schedules(None)
+            removed = set(self.schedules) - set(schedules)
+            self.next_full_refresh = now + self.full_refresh_seconds
+        elif dirty:
+            schedules = traffic_cycle.calculate_schedules(list(dirty))
+            removed = {j for j in dirty if j in self.schedules and j not in schedules}
+        else:
+            schedules, removed = {}, set()
+
+        changed = {j for j, schedule in schedules.items() if schedule != self.schedules.get(j)}
+        updates = {}
+        for junction_id in removed:
+            self.schedules.pop(junction_id, None)
+            self.buffers.pop(junction_id, None)
+        for junction_id in changed:
+            self.schedules[junction_id] = schedules[junction_id]
+
+        for junction_id, schedule in self.schedules.items():
+            buffer = self.buffers.setdefault(junction_id, deque(maxlen=self.cycles))
+            modified = False
+
+            while buffer and buffer[0]['end'] <= now:
+                buffer.popleft()
+            if junction_id in changed:
+                # Keep the running cycle; recompute every cycle that has not started yet
+                while buffer and buffer[-1]['start'] > now:
+                    buffer.pop()
+                    modified = True
+
+            if len(buffer) <= self.cycles // 2 or junction_id in changed:
+                start = buffer[-1]['end'] if buffer else now
+                while len(buffer) < self.cycles:
+                    cycle = build_cycle(schedule, start)
+                    buffer.append(cycle)
+                    start = cycle['end']
+                modified = True
+
+            if modified or junction_id not in self.payloads:
+                updates[junction_id] = self._encode(junction_id, buffer, now)
+
+        with self.lock:
+            for junction_id in removed:
+                self.payloads.pop(junction_id, None)
+            self.payloads.update(updates)
+        self.ticks += 1
+
+    def _encode(self, junction_id: str, buffer: deque, now: float) -> Tuple[str, bytes]:
+        version = self.versions.get(junction_id, 0) + 1
+        self.versions[junction_id] = version
+        body = json.dumps({
+            'junction_id': junction_id,
+            'version': version,
+            'generated_at': round(now, 2),
+            'cycles': list(buffer),
+        }, separators=(',', ':')).encode()
+        return f'"{junction_id}-{version}"', body
+
+
+schedule_timeline = ScheduleTimeline()
+schedule_cache.add_invalidation_listener(schedule_timeline.mark_dirty)
@@ -0,0 +1,87 @@
+# schema_upgrade.py
+"""
+Idempotent in-place schema upgrades for existing databases.
+
+Base.metadata.create_all creates missing tables but never alters tables that
+already exist, so columns added to a model later are missing on older
+databases and every query on that model fails with "no such column".
+Columns listed in ADDED_COLUMNS are added with ALTER TABLE ... ADD COLUMN
+when missing, and indexes listed in ADDED_INDEXES are created; running it
+again changes nothing.
+
+Runs at API startup and from seed_database.py, right after create_all. CV
+scripts do not create tables, so before running them against an older
+database without starting the API once, upgrade by hand:
+    python schema_upgrade.py
+"""
+
+import logging
+from typing import List
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import SQLAlchemyError
+
+import models
+from database import engine as default_engine
+
+# (model, column name) of nullable columns added after their table first shipped
+ADDED_COLUMNS = [
+    (models.SignalPhase, 'roi_polygon'),
+    (models.SignalPhase, 'count_lines'),
+    (models.Accident, 'thumbnail_path'),
+]
+
+# (model, index name) of indexes added after their table first shipped
+ADDED_INDEXES = [
+    (models.TrafficData, 'ix_traffic_data_junction_phase_time'),
+]
+
+
+def upgrade_schema(engine=default_engine) -> List[str]:
+    """
+    Add missing columns and indexes to existing tables
+
+    Returns:
+        'table.column' / 'table.index' names that were added
+    """
+    preparer = engine.dialect.identifier_preparer
+    added = []
+    for model, name in ADDED_COLUMNS:
+        table = model.__table__
+        inspector = inspect(engine)
+        if not inspector.has_table(table.name):
+            continue  # create_all builds new tables complete
+        if name in {column['name'] for column in inspector.get_columns(table.name)}:
+            continue
+
+        column_type = table.columns[name].type.compile(dialect=engine.dialect)
+        statement = f"ALTER TABLE {preparer.quote(table.name)} ADD COLUMN {preparer.quote(name)} {column_type}"
+        try:
+            with engine.begin() as connection:
+                connection.execute(text(statement))
+        except SQLAlchemyError:
+            # Another process starting at the same time may have added it first
+            if name not in {column['name'] for column in inspect(engine).get_columns(table.name)}:
+                raise
+            continue
+        added.append(f"{table.name}.{name}")
+        logging.info(f"Schema upgrade: added column {table.name}.{name}")
+
+    for model, name in ADDED_INDEXES:
+        table = model.__table__
+        inspector = inspect(engine)
+        if not inspector.has_table(table.name):
+            continue
+        if name in {index['name'] for index in inspector.get_indexes(table.name)}:
+            continue
+        index = next(index for index in table.indexes if index.name == name)
+        index.create(bind=engine, checkfirst=True)
+        added.append(f"{table.name}.{name}")
+        logging.info(f"Schema upgrade: added index {table.name}.{name}")
+    return added
+
+
+if __name__ == '__main__':
+    models.Base.metadata.create_all(bind=default_engine)
+    changes = upgrade_schema()
+    print(f"Added {len(changes)} column(s)/index(es): {', '.join(changes)}" if changes else "Schema is up to date")
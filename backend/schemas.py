@@ -87,6 +87,8 @@ class SignalPhaseBase(BaseModel):
     phase_number: int
     lane_count: int
     default_timer_sec: int = 30
+    roi_polygon: Optional[str] = None  # JSON array of [x, y] vertices
+    count_lines: Optional[str] = None  # JSON array of [x1, y1, x2, y2] lines
 
 class SignalPhaseCreate(SignalPhaseBase):
     pass
@@ -166,6 +168,22 @@ class SystemStatsResponse(BaseModel):
 
 # ===== Accident Detection Schemas =====
 
+def evidence_url(path: Optional[str], tier: Optional[str] = None) -> Optional[str]:
+    """
+    URL of an evidence file under the /evidence mount
+
+    Paths relative to the evidence directory (content-hashed layout) map
+    directly; absolute paths of older records are served by file name.
+    """
+    import os
+    if not path:
+        return None
+    if not os.path.isabs(path):
+        return f"/evidence/{path.replace(os.sep, '/')}"
+    filename = os.path.basename(path)
+    return f"/evidence/{tier}/{filename}" if tier else f"/evidence/{filename}"
+
+
 class AccidentBase(BaseModel):
     junction_id: Optional[str] = None
     camera_id: Optional[str] = None
@@ -173,6 +191,7 @@ class AccidentBase(BaseModel):
     severity: str = 'medium'  # 'low', 'medium', 'high', 'critical'
     description: Optional[str] = None
     image_path: Optional[str] = None
+    thumbnail_path: Optional[str] = None
     video_path: Optional[str] = None
     bounding_boxes: Optional[str] = None  # JSON string
     detection_metadata: Optional[str] = None  # JSON string
@@ -189,6 +208,8 @@ class AccidentResponse(AccidentBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
     evidence_image_path: Optional[str] = None  # URL path to evidence image
+    evidence_thumbnail_path: Optional[str] = None  # URL path to evidence thumbnail
+    evidence_video_path: Optional[str] = None  # URL path to evidence clip
 
     class Config:
         from_attributes = True
@@ -196,7 +217,6 @@ class AccidentResponse(AccidentBase):
     @classmethod
     def from_orm_with_image_url(cls, obj):
         """Convert ORM object to response with image URL"""
-        import os
         data = {
             "id": obj.id,
             "junction_id": obj.junction_id,
@@ -205,6 +225,7 @@ class AccidentResponse(AccidentBase):
             "severity": obj.severity,
             "description": obj.description,
             "image_path": obj.image_path,
+            "thumbnail_path": obj.thumbnail_path,
             "video_path": obj.video_path,
             "bounding_boxes": obj.bounding_boxes,
             "detection_metadata": obj.detection_metadata,
@@ -214,12 +235,11 @@ class AccidentResponse(AccidentBase):
             "detected_at": obj.detected_at,
             "created_at": obj.created_at,
             "updated_at": obj.updated_at,
-            "evidence_image_path": None
+            # Convert stored evidence paths to URL paths
+            "evidence_image_path": evidence_url(obj.image_path),
+            "evidence_thumbnail_path": evidence_url(obj.thumbnail_path),
+            "evidence_video_path": evidence_url(obj.video_path, tier="clips")
         }
-        # Convert absolute image_path to URL path
-        if obj.image_path:
-            filename = os.path.basename(obj.image_path)
-            data["evidence_image_path"] = f"/evidence/{filename}"
         return cls(**data)
 
 
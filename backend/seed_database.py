@@ -3,11 +3,13 @@ Seed initial data for IRIS database
 """
 from database import SessionLocal, engine
 import models
+from schema_upgrade import upgrade_schema
 from datetime import datetime, date
 
 # Create all tables
 print("Creating database tables...")
 models.Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
 print("[OK] Tables created successfully")
 
 db = SessionLocal()
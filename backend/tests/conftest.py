@@ -0,0 +1,10 @@
+# conftest.py
+"""Make the flat backend modules importable from the tests, against an in-memory database."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Set before database.py is imported; tests that need tables bind their own engine
+os.environ.setdefault("DATABASE_URL", "sqlite://")
@@ -0,0 +1,85 @@
+# test_clip_buffer.py
+"""
+ClipRecorder ring-buffer mode: pre-event frames survive the confirmation
+delay, and the buffer plus clips in progress stay within one memory budget.
+"""
+
+import time
+
+import numpy as np
+
+from clip_buffer import ClipRecorder
+
+FPS = 10.0
+
+
+class Clock:
+    def __init__(self):
+        self.elapsed = 0.0
+
+
+def _frames(seed=0):
+    rng = np.random.default_rng(seed)
+    while True:
+        yield rng.integers(0, 256, size=(120, 160, 3), dtype=np.uint8)
+
+
+def _recorder(tmp_path, **kwargs):
+    options = dict(pre_seconds=2.0, post_seconds=1.0, buffer_fps=FPS, scale=1.0, jpeg_quality=90)
+    options.update(kwargs)
+    return ClipRecorder('rtsp://camera/stream', tmp_path, **options)
+
+
+def _advance(recorder, clock, frames, seconds):
+    for _ in range(int(round(seconds * FPS))):
+        clock.elapsed += 1.0 / FPS
+        recorder.process_frame(next(frames), clock)
+
+
+def test_pre_event_frames_survive_confirmation_delay(tmp_path):
+    recorder, clock, frames = _recorder(tmp_path, confirm_delay=4.0), Clock(), _frames()
+    written = []
+    _advance(recorder, clock, frames, 10.0)
+
+    # Confirmed 3 s after the first sighting
+    first_seen = clock.elapsed - 3.0
+    recorder.request_clip('late', first_seen, on_done=written.append)
+    clip = recorder.pending[0]
+    assert clip.frames[0][0] <= first_seen - 2.0 + 1.0 / FPS
+
+    _advance(recorder, clock, frames, 1.0)
+    recorder.finish()
+    assert recorder.clips_written == 1 and len(written) == 1
+
+
+def test_buffer_and_clips_share_one_budget(tmp_path):
+    recorder, clock, frames = _recorder(tmp_path, max_buffer_mb=0.5, max_pending=2,
+                                        post_seconds=30.0), Clock(), _frames(1)
+    frame_bytes = len(recorder._compress(next(frames)))
+    for i in range(6):
+        _advance(recorder, clock, frames, 3.0)
+        recorder.request_clip(f"clip_{i}", clock.elapsed)
+        assert recorder.active_clips <= 2
+        assert recorder.buffer_bytes + recorder.clip_bytes <= recorder.max_bytes + frame_bytes
+    _advance(recorder, clock, frames, 10.0)
+    assert recorder.buffer_bytes + recorder.clip_bytes <= recorder.max_bytes + frame_bytes
+
+    assert recorder.clips_dropped == 4
+    assert recorder.clips_truncated >= 1
+    recorder.finish()
+    assert recorder.active_clips == 0 and recorder.clip_bytes == 0
+    assert recorder.clips_written + recorder.clips_failed == 2
+
+
+def test_slots_free_up_after_clips_are_written(tmp_path):
+    recorder, clock, frames = _recorder(tmp_path, max_pending=1), Clock(), _frames(2)
+    for i in range(3):
+        _advance(recorder, clock, frames, 3.0)
+        recorder.request_clip(f"clip_{i}", clock.elapsed)
+        _advance(recorder, clock, frames, 1.5)
+        deadline = time.monotonic() + 10.0
+        while recorder.active_clips and time.monotonic() < deadline:
+            time.sleep(0.01)  # Writer thread finishing the queued clip
+    recorder.finish()
+    assert recorder.clips_dropped == 0
+    assert recorder.clips_written == 3
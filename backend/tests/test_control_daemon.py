@@ -0,0 +1,113 @@
+# test_control_daemon.py
+"""
+ControlDaemon deadline fallback: a batch that misses its deadline keeps the
+previous timing, and ticks don't queue work behind a batch still running.
+"""
+
+import threading
+import time
+
+import pytest
+
+import traffic_cycle
+from control_daemon import ControlDaemon, SimulatedController
+
+DEADLINE = 0.05
+
+
+def _schedule(green):
+    return [{'traffic_light_no': 1, 'G': green, 'Y': 3.0, 'R': 24.0, 'percentage_clearance': 80.0},
+            {'traffic_light_no': 2, 'G': 20.0, 'Y': 3.0, 'R': green + 7.0, 'percentage_clearance': 80.0}]
+
+
+class Scheduler:
+    """Stands in for traffic_cycle.calculate_schedules; blocks while `slow` is set"""
+
+    def __init__(self):
+        self.calls = 0
+        self.green = 10.0
+        self.slow = False
+        self.release = threading.Event()
+
+    def __call__(self, junction_ids, db=None, demand='latest', method='formula'):
+        self.calls += 1
+        if self.slow:
+            self.release.wait(5.0)
+        return {junction_id: _schedule(self.green) for junction_id in junction_ids}
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert predicate()
+
+
+@pytest.fixture
+def setup(monkeypatch):
+    scheduler = Scheduler()
+    monkeypatch.setattr(traffic_cycle, 'calculate_schedules', scheduler)
+    controller = SimulatedController()
+    daemon = ControlDaemon(link=controller, deadline_seconds=DEADLINE, lead_seconds=1.0,
+                           write_batch_seconds=1e9)
+    yield daemon, controller, scheduler
+    scheduler.release.set()
+    daemon.stop()
+
+
+def _tick_next_cycle(daemon):
+    """Tick at the moment the junction's next cycle is due; returns the tick's wall time"""
+    now = daemon.next_cycle['J-1'] - daemon.lead_seconds
+    started = time.perf_counter()
+    assert daemon.tick(now, poll=False) == ['J-1']
+    return time.perf_counter() - started
+
+
+def test_missed_deadline_keeps_previous_timing(setup):
+    daemon, controller, scheduler = setup
+    daemon.next_cycle['J-1'] = time.time()
+
+    _tick_next_cycle(daemon)
+    _wait_for(lambda: controller.received == 1)
+    first = controller.commands['J-1']
+    assert first['schedule'] == _schedule(10.0)
+
+    # Next batch is slow: it misses the deadline and the previous schedule is pushed again
+    scheduler.slow, scheduler.green = True, 40.0
+    elapsed = _tick_next_cycle(daemon)
+    assert DEADLINE <= elapsed < 1.0
+    assert daemon.stats()['deadline_misses'] == 1
+    _wait_for(lambda: controller.received == 2)
+    second = controller.commands['J-1']
+    assert second['schedule'] == first['schedule']
+    assert second['cycle']['start'] == first['cycle']['end']
+
+    # Batch still running: the next tick doesn't submit more work or wait for the deadline
+    elapsed = _tick_next_cycle(daemon)
+    assert elapsed < DEADLINE
+    assert scheduler.calls == 2
+    assert daemon.stats()['deadline_misses'] == 2
+    _wait_for(lambda: controller.received == 3)
+    assert controller.commands['J-1']['schedule'] == first['schedule']
+
+    # Once the late batch finishes, the next cycle is computed fresh
+    scheduler.slow = False
+    scheduler.release.set()
+    _wait_for(lambda: daemon.inflight.done())
+    _tick_next_cycle(daemon)
+    _wait_for(lambda: controller.received == 4)
+    assert controller.commands['J-1']['schedule'] == _schedule(40.0)
+    assert scheduler.calls == 3
+    assert daemon.stats()['cycles'] == 4
+
+
+def test_no_previous_timing_retries_next_lead(setup):
+    daemon, controller, scheduler = setup
+    scheduler.slow = True
+    now = time.time()
+    daemon.next_cycle['J-1'] = now
+    daemon.tick(now, poll=False)
+
+    assert daemon.stats()['deadline_misses'] == 1
+    assert daemon.next_cycle['J-1'] == now + daemon.lead_seconds
+    assert controller.received == 0 and 'J-1' not in daemon.applied
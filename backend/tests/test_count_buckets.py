@@ -0,0 +1,85 @@
+# test_count_buckets.py
+"""
+CountBucketAggregator flushing: batch size, time-based flush, retry delay
+after a failed write and the cap on unwritten buckets.
+"""
+
+import logging
+from datetime import datetime, timezone
+
+from count_buckets import CountBucketAggregator
+
+START = datetime(2026, 3, 2, 8, 0, tzinfo=timezone.utc)
+
+
+class Writer:
+    def __init__(self):
+        self.calls = []
+        self.fail = False
+
+    def __call__(self, rows):
+        self.calls.append(list(rows))
+        return not self.fail
+
+
+def _aggregator(writer, **kwargs):
+    options = dict(bucket_seconds=10.0, flush_batch_size=4, flush_interval=25.0, max_pending=6)
+    options.update(kwargs)
+    return CountBucketAggregator('J-001', 1, START, writer, **options)
+
+
+def _run(aggregator, until, start=0.0, step=0.5, vehicle_every=None):
+    t = start
+    while t <= until:
+        if vehicle_every and round(t / step) % vehicle_every == 0:
+            aggregator.add(t, 'light_motor')
+        aggregator.advance(t)
+        t += step
+
+
+def test_full_batch_is_one_write():
+    writer = Writer()
+    aggregator = _aggregator(writer, flush_interval=1000.0)
+    _run(aggregator, 80.0, vehicle_every=4)
+    assert [len(rows) for rows in writer.calls] == [4, 4]
+    assert aggregator.buckets_written == 8
+
+
+def test_flush_interval_writes_partial_batch():
+    writer = Writer()
+    aggregator = _aggregator(writer, flush_batch_size=100)
+    _run(aggregator, 36.0)
+    # First bucket closed at 10 s, due at 35 s with three buckets closed
+    assert [len(rows) for rows in writer.calls] == [3]
+    assert [row['timestamp'].second for row in writer.calls[0]] == [0, 10, 20]
+
+
+def test_failed_write_waits_for_retry_interval():
+    writer = Writer()
+    writer.fail = True
+    aggregator = _aggregator(writer, max_pending=100)
+    _run(aggregator, 59.5)
+    # Due at 35 s and failed; the batch filled at 40 s but the retry waits until 60 s instead of every frame
+    assert [len(rows) for rows in writer.calls] == [3]
+
+    writer.fail = False
+    _run(aggregator, 60.0, start=60.0)
+    assert [len(rows) for rows in writer.calls] == [3, 6] and aggregator.pending == []
+    assert aggregator.buckets_written == 6
+
+
+def test_pending_capped_and_drops_logged(caplog):
+    writer = Writer()
+    writer.fail = True
+    aggregator = _aggregator(writer)
+    with caplog.at_level(logging.WARNING):
+        _run(aggregator, 200.0, vehicle_every=3)
+    assert len(aggregator.pending) == 6
+    assert aggregator.buckets_dropped == 14
+    assert sum('dropping' in r.message for r in caplog.records) == 14
+    # The newest buckets are kept
+    assert aggregator.pending[-1]['timestamp'].minute * 60 + aggregator.pending[-1]['timestamp'].second == 190
+
+    writer.fail = False
+    assert aggregator.close(200.0)
+    assert aggregator.buckets_written == 6
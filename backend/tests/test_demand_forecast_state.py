@@ -0,0 +1,71 @@
+# test_demand_forecast_state.py
+"""
+One demand forecast state per junction phase: writers upsert the state and
+reload it under a row lock, so a stale copy in the session is never written
+back.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+import demand_forecast
+import models
+
+T0 = datetime(2026, 3, 2, 8, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'forecast.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+def _add_counts(Session, minutes, phase=1, counts=(4, 10, 2)):
+    with Session() as db:
+        db.add(models.TrafficData(junction_id='J-001', phase=phase, two_wheelers=counts[0],
+                                  light_vehicles=counts[1], heavy_vehicles=counts[2],
+                                  timestamp=T0 + timedelta(minutes=minutes)))
+        db.commit()
+
+
+def _states(Session):
+    with Session() as db:
+        return db.query(models.DemandForecast).order_by(models.DemandForecast.id).all()
+
+
+def test_one_state_per_phase_across_sessions(engine):
+    Session = sessionmaker(bind=engine)
+    for minute in range(5):
+        _add_counts(Session, minute, phase=1)
+        _add_counts(Session, minute, phase=2)
+    states = _states(Session)
+    assert sorted((s.phase, s.samples) for s in states) == [(1, 5), (2, 5)]
+
+
+def test_stale_state_in_session_is_reloaded(engine):
+    Session = sessionmaker(bind=engine)
+    _add_counts(Session, 0)
+
+    with Session() as stale:
+        cached = stale.query(models.DemandForecast).one()
+        assert cached.samples == 1
+        _add_counts(Session, 1)  # Another writer updates the state meanwhile
+        stale.add(models.TrafficData(junction_id='J-001', phase=1, two_wheelers=1, light_vehicles=1,
+                                     heavy_vehicles=0, timestamp=T0 + timedelta(minutes=2)))
+        stale.commit()
+
+    assert [s.samples for s in _states(Session)] == [3]
+
+
+def test_duplicate_state_rejected(engine):
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        db.add_all([demand_forecast.new_state('J-001', 1), demand_forecast.new_state('J-001', 1)])
+        with pytest.raises(IntegrityError):
+            db.commit()
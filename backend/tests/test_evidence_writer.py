@@ -0,0 +1,62 @@
+# test_evidence_writer.py
+"""
+EvidenceWriter keeps the record ID of a bounded number of incidents: the
+least recently written incident is forgotten first, and updates to a
+forgotten incident are skipped instead of touching another record.
+"""
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+from evidence_writer import EvidenceWriter
+
+
+@pytest.fixture
+def writer(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'evidence.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    writer = EvidenceWriter(tmp_path / 'evidence', max_tracked_incidents=2)
+    writer.db_session = sessionmaker(bind=engine)()
+    yield writer
+    writer.db_session.close()
+    engine.dispose()
+
+
+def _create(writer, key):
+    frame = np.zeros((120, 160, 3), dtype=np.uint8)
+    detections = [{'class': 'accident', 'confidence': 0.9, 'bbox': (10, 40, 80, 100)}]
+    writer._process({'action': 'create', 'key': key, 'frame': frame, 'detections': detections,
+                     'record': {'filename': f'{key}.jpg', 'confidence_score': 0.9}, 'enqueued_at': 0.0})
+
+
+def _update(writer, key, description):
+    writer._process({'action': 'update', 'key': key, 'record': {'description': description},
+                     'enqueued_at': 0.0})
+
+
+def _descriptions(writer):
+    return [a.description for a in writer.db_session.query(models.Accident).order_by(models.Accident.id)]
+
+
+def test_map_is_capped_and_oldest_incident_forgotten(writer):
+    for key in ('a', 'b', 'c'):
+        _create(writer, key)
+
+    assert list(writer.accident_ids) == ['b', 'c']
+
+    _update(writer, 'a', 'late clip')
+    _update(writer, 'b', 'clip b')
+
+    assert _descriptions(writer) == [None, 'clip b', None]
+
+
+def test_update_keeps_incident_recently_used(writer):
+    _create(writer, 'a')
+    _create(writer, 'b')
+    _update(writer, 'a', 'clip a')
+    _create(writer, 'c')
+
+    assert list(writer.accident_ids) == ['a', 'c']
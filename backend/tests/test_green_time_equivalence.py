@@ -0,0 +1,101 @@
+# test_green_time_equivalence.py
+"""
+The aggregated (count-based) schedule path must return exactly the rows of
+the per-vehicle path, run_cycle(convert_raw_to_vehicle_data(...)).
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+import green_time_simulation as gts
+
+P = 0.8
+T_RED = 60.0
+D_VALUE = 10
+
+
+def _vehicle_schedule(phase_counts, num_lanes, max_per_phase=gts.MAX_GREEN_PER_PHASE):
+    phases_data = [gts.convert_raw_to_vehicle_data(D_VALUE, *counts) for counts in phase_counts]
+    if max_per_phase == gts.MAX_GREEN_PER_PHASE:
+        return gts.run_cycle(phases_data, P, T_RED, num_lanes)
+    return gts.schedule_phases(phases_data, P, T_RED, num_lanes, max_per_phase)
+
+
+def _assert_same(phase_counts, num_lanes, max_per_phase=gts.MAX_GREEN_PER_PHASE):
+    expected = _vehicle_schedule(phase_counts, num_lanes, max_per_phase)
+    assert gts.schedule_from_counts(phase_counts, P, T_RED, num_lanes, max_per_phase) == expected
+
+    G, Y, R, clearance = gts.schedule_batch([phase_counts], [num_lanes], p=P, T_red=T_RED,
+                                            max_per_phase=max_per_phase)
+    assert gts.schedule_rows(G[0], Y[0], R[0], clearance[0]) == expected
+    return expected
+
+
+def test_random_counts_and_lanes():
+    rng = random.Random(39)
+    for _ in range(300):
+        n_phases = rng.randint(1, 6)
+        phase_counts = [tuple(rng.choice([0, rng.randint(0, 60)]) for _ in range(3)) for _ in range(n_phases)]
+        num_lanes = [rng.randint(0, 4) for _ in range(n_phases)]
+        _assert_same(phase_counts, num_lanes)
+
+
+def test_all_zero_counts():
+    schedule = _assert_same([(0, 0, 0)] * 4, [2, 2, 3, 1])
+    assert all(row['G'] == 0.0 for row in schedule)
+
+
+@pytest.mark.parametrize('active', [0, 2, 3])
+def test_single_active_phase(active):
+    phase_counts = [(0, 0, 0)] * 4
+    phase_counts[active] = (12, 30, 4)
+    schedule = _assert_same(phase_counts, [2, 3, 1, 2])
+    assert schedule[active]['R'] == 0.0
+    assert all(row['G'] == 0.0 for i, row in enumerate(schedule) if i != active)
+
+
+def test_single_active_phase_without_lanes():
+    _assert_same([(0, 0, 0), (5, 5, 5), (0, 0, 0)], [2, 0, 2])
+
+
+def test_green_capped_at_max_per_phase():
+    # One saturated phase is clamped to MAX_GREEN_PER_PHASE, the others keep their G
+    schedule = _assert_same([(400, 600, 200), (10, 20, 2), (0, 4, 0)], [1, 2, 2])
+    assert schedule[0]['G'] == gts.MAX_GREEN_PER_PHASE
+    assert schedule[1]['G'] < gts.MAX_GREEN_PER_PHASE
+
+
+def test_all_phases_saturated():
+    schedule = _assert_same([(900, 900, 900)] * 3, [1, 1, 1])
+    assert all(row['G'] == gts.MAX_GREEN_PER_PHASE for row in schedule)
+
+
+@pytest.mark.parametrize('max_per_phase', [0.0, 5.0, 30.0])
+def test_custom_max_per_phase(max_per_phase):
+    rng = random.Random(int(max_per_phase))
+    for _ in range(50):
+        n_phases = rng.randint(2, 5)
+        phase_counts = [tuple(rng.randint(0, 40) for _ in range(3)) for _ in range(n_phases)]
+        num_lanes = [rng.randint(1, 3) for _ in range(n_phases)]
+        _assert_same(phase_counts, num_lanes, max_per_phase)
+
+
+def test_batch_matches_per_junction_with_mask():
+    rng = np.random.default_rng(39)
+    counts = rng.integers(0, 50, size=(40, 4, 3))
+    counts[rng.random(counts.shape[:2]) < 0.3] = 0
+    num_lanes = rng.integers(1, 4, size=(40, 4))
+    phase_mask = np.ones((40, 4), dtype=bool)
+    n_real = rng.integers(1, 5, size=40)
+    for j, n in enumerate(n_real):
+        phase_mask[j, n:] = False
+
+    G, Y, R, clearance = gts.schedule_batch(counts, num_lanes, phase_mask, P, T_RED)
+    for j, n in enumerate(n_real):
+        phase_counts = [tuple(int(c) for c in counts[j, k]) for k in range(n)]
+        lanes = [int(x) for x in num_lanes[j, :n]]
+        assert gts.schedule_rows(G[j, :n], Y[j, :n], R[j, :n], clearance[j, :n]) == \
+            _vehicle_schedule(phase_counts, lanes)
+        assert not G[j, n:].any() and not R[j, n:].any()
@@ -0,0 +1,89 @@
+# test_green_wave.py
+"""
+GreenWaveCoordinator incremental refresh against the in-memory database.
+"""
+
+import pytest
+
+import models
+from database import SessionLocal, engine
+from green_wave import GreenWaveCoordinator
+from schedule_cache import schedule_cache
+
+
+@pytest.fixture
+def coordinator():
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.add_all([
+        models.Junction(id='J-1', name='North', latitude=12.9700, longitude=77.5900),
+        models.Junction(id='J-2', name='South', latitude=12.9650, longitude=77.5900),
+        models.Junction(id='J-3', name='No phases', latitude=12.9600, longitude=77.5900),
+        models.SignalAdjacency(from_junction_id='J-1', to_junction_id='J-2'),
+    ])
+    for junction_id in ('J-1', 'J-2'):
+        for phase in (1, 2):
+            db.add(models.SignalPhase(junction_id=junction_id, phase_number=phase, lane_count=2))
+            db.add(models.TrafficData(junction_id=junction_id, phase=phase, two_wheelers=5,
+                                      light_vehicles=10 * phase, heavy_vehicles=1))
+    db.commit()
+    db.close()
+
+    coordinator = GreenWaveCoordinator(max_age_seconds=0)
+    schedule_cache.add_invalidation_listener(coordinator.mark_stale)
+    yield coordinator
+    schedule_cache.listeners.remove(coordinator.mark_stale)
+    models.Base.metadata.drop_all(bind=engine)
+
+
+def _record(junction_id, phase, light_vehicles):
+    db = SessionLocal()
+    db.add(models.TrafficData(junction_id=junction_id, phase=phase, two_wheelers=0,
+                              light_vehicles=light_vehicles, heavy_vehicles=0))
+    db.commit()
+    db.close()
+
+
+def test_offsets_cover_coordinated_junctions(coordinator):
+    entries = {e['junction_id']: e for e in coordinator.offsets_for()}
+    assert set(entries) == {'J-1', 'J-2'}
+    assert entries['J-1']['common_cycle'] == entries['J-2']['common_cycle'] > 0
+
+
+def test_counts_for_junction_without_phases(coordinator):
+    before = coordinator.offsets_for()
+    _record('J-3', 1, 12)
+    assert coordinator.stale == {'J-3'}
+
+    # Stale junction without phases is skipped, and the coordinator keeps working
+    assert coordinator.offsets_for() == before
+    assert coordinator.offsets_for(['J-3']) == []
+    assert 'J-3' not in coordinator.cycles
+    assert coordinator.full_recomputes == 1
+
+
+def test_stale_junction_resolves_only_its_component(coordinator):
+    coordinator.offsets_for()
+    solved = coordinator.component_recomputes
+    _record('J-2', 1, 400)
+    entries = {e['junction_id']: e for e in coordinator.offsets_for()}
+    assert entries['J-2']['cycle'] == entries['J-2']['common_cycle']
+    assert coordinator.component_recomputes == solved + 1
+    assert coordinator.full_recomputes == 1
+
+
+def test_graph_change_notifies_every_graph_listener(coordinator):
+    from corridor_planner import corridor_planner
+    from green_wave import green_wave
+
+    green_wave.graph_dirty = corridor_planner.graph_dirty = False
+    db = SessionLocal()
+    db.add(models.SignalAdjacency(from_junction_id='J-2', to_junction_id='J-3'))
+    db.flush()
+    db.rollback()
+    assert not green_wave.graph_dirty and not corridor_planner.graph_dirty
+
+    db.add(models.SignalAdjacency(from_junction_id='J-2', to_junction_id='J-3'))
+    db.commit()
+    db.close()
+    assert green_wave.graph_dirty and corridor_planner.graph_dirty
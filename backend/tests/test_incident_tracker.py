@@ -0,0 +1,87 @@
+# test_incident_tracker.py
+"""
+IncidentTracker N-of-M confirmation and incident clearing.
+"""
+
+from incident_tracker import IncidentTracker
+
+BOX = [100, 100, 200, 200]
+STEP = 0.5  # Seconds between model evaluations
+
+
+def _detection(confidence=0.8, bbox=BOX):
+    return {'class': 'accident', 'confidence': confidence, 'bbox': list(bbox)}
+
+
+def _run(tracker, pattern, start=0.0):
+    """Feed evaluations ('x' hit, '.' miss, '-' frame without evaluation); returns per-frame results"""
+    results = []
+    for index, mark in enumerate(pattern):
+        detections = [_detection()] if mark == 'x' else []
+        results.append(tracker.update(detections, start + index * STEP, evaluated=mark != '-'))
+    return results
+
+
+def test_confirmed_at_exactly_n_of_m():
+    tracker = IncidentTracker(confirm_hits=3, confirm_window=5)
+    results = _run(tracker, 'x.x.x')
+    confirmed = [len(r[0]) for r in results]
+    assert confirmed == [0, 0, 0, 0, 1]
+    assert tracker.open_incidents[0].confirmed
+
+
+def test_consecutive_hits_confirm_on_the_nth():
+    tracker = IncidentTracker(confirm_hits=3, confirm_window=5)
+    results = _run(tracker, 'xxx')
+    assert [len(r[0]) for r in results] == [0, 0, 1]
+
+
+def test_not_confirmed_at_n_minus_one():
+    tracker = IncidentTracker(confirm_hits=3, confirm_window=5)
+    results = _run(tracker, 'x...x')
+    assert all(not r[0] for r in results)
+    assert not tracker.open_incidents[0].confirmed
+
+
+def test_hits_outside_the_window_do_not_count():
+    # 3 hits, but never 3 within any 5 consecutive evaluations
+    tracker = IncidentTracker(confirm_hits=3, confirm_window=5, max_gap_seconds=60.0)
+    results = _run(tracker, 'x..x..x')
+    assert all(not r[0] for r in results)
+    assert len(tracker.open_incidents) == 1 and not tracker.open_incidents[0].confirmed
+
+
+def test_frames_without_evaluation_are_not_misses():
+    tracker = IncidentTracker(confirm_hits=3, confirm_window=3, max_gap_seconds=60.0)
+    results = _run(tracker, 'x----x----x')
+    assert [i for i, r in enumerate(results) if r[0]] == [10]
+
+
+def test_confirmed_incident_seen_then_cleared_after_gap():
+    tracker = IncidentTracker(confirm_hits=2, confirm_window=3, max_gap_seconds=2.0)
+    results = _run(tracker, 'xxx')
+    incident = results[1][0][0]
+    assert results[2][1] == [incident]  # Seen again after confirmation
+
+    last_seen = incident.last_seen
+    # Still open at exactly max_gap_seconds after the last sighting, closed just after
+    assert tracker.update([], last_seen + 2.0)[2] == []
+    closed = tracker.update([], last_seen + 2.0 + STEP)[2]
+    assert closed == [incident]
+    assert tracker.open_incidents == [] and tracker.rejected_count == 0
+
+
+def test_unconfirmed_candidate_is_rejected_after_gap():
+    tracker = IncidentTracker(confirm_hits=3, confirm_window=5, max_gap_seconds=2.0)
+    _run(tracker, 'x.')
+    assert tracker.update([], 10.0) == ([], [], [])
+    assert tracker.open_incidents == [] and tracker.rejected_count == 1
+
+
+def test_separate_boxes_vote_separately():
+    tracker = IncidentTracker(confirm_hits=2, confirm_window=2)
+    far = [600, 600, 700, 700]
+    tracker.update([_detection(), _detection(bbox=far)], 0.0)
+    confirmed, _, _ = tracker.update([_detection(bbox=far)], STEP)
+    assert [i.bbox for i in confirmed] == [far]
+    assert len(tracker.open_incidents) == 2
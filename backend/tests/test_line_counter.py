@@ -0,0 +1,93 @@
+# test_line_counter.py
+"""
+LineCrossingCounter segment intersection, direction and once-per-line counting.
+"""
+
+from line_counter import LineCrossingCounter
+
+HORIZONTAL = [0, 360, 1600, 360]  # Drawn left to right: 'forward' is moving down the image
+
+
+def _track(prev, curr, vehicle_class='car', lost_frames=0):
+    return {'prev_center': prev, 'center': curr, 'vehicle_class': vehicle_class, 'lost_frames': lost_frames}
+
+
+def _move(tracks, track_id, curr):
+    """Advance a track to a new center the way VehicleTracker does"""
+    track = tracks[track_id]
+    track['prev_center'], track['center'] = track['center'], curr
+
+
+def test_crossing_between_skipped_frames():
+    counter = LineCrossingCounter([HORIZONTAL])
+    # Center jumps from well above to well below the line in one update
+    events = counter.update({7: _track([100, 250], [100, 480], 'truck')})
+    assert events == [{'track_id': 7, 'line_index': 0, 'direction': 'forward', 'vehicle_class': 'truck'}]
+    assert counter.counts[0]['forward'] == {'truck': 1}
+
+
+def test_no_count_without_reaching_the_line():
+    counter = LineCrossingCounter([HORIZONTAL])
+    assert counter.update({1: _track([100, 300], [100, 359])}) == []
+
+
+def test_both_directions():
+    counter = LineCrossingCounter([HORIZONTAL])
+    events = counter.update({
+        1: _track([200, 340], [200, 380], 'car'),         # down
+        2: _track([400, 380], [400, 340], 'motorcycle'),  # up
+    })
+    assert {e['track_id']: e['direction'] for e in events} == {1: 'forward', 2: 'backward'}
+    assert counter.counts[0] == {'forward': {'car': 1}, 'backward': {'motorcycle': 1}}
+
+
+def test_vertical_line():
+    # Drawn top to bottom: its right-hand side is the left of the image
+    counter = LineCrossingCounter([[500, 0, 500, 720]])
+    events = counter.update({
+        1: _track([520, 300], [480, 300]),  # leftwards
+        2: _track([450, 500], [560, 520]),  # rightwards
+        3: _track([450, 800], [560, 800]),  # below the line's end
+    })
+    assert {e['track_id']: e['direction'] for e in events} == {1: 'forward', 2: 'backward'}
+
+
+def test_diagonal_line_and_segment_extent():
+    counter = LineCrossingCounter([[0, 0, 1000, 1000]])
+    events = counter.update({
+        1: _track([600, 200], [200, 600]),    # crosses at (400, 400) onto the lower-left side
+        2: _track([300, 100], [100, 300]),    # crosses at (200, 200)
+        3: _track([1300, 1100], [1100, 1300]),  # crosses the extension past (1000, 1000)
+    })
+    assert sorted((e['track_id'], e['direction']) for e in events) == [(1, 'forward'), (2, 'forward')]
+
+
+def test_track_first_seen_past_the_line_is_not_counted():
+    counter = LineCrossingCounter([HORIZONTAL])
+    tracks = {3: _track(None, [100, 500])}  # New track: no previous center yet
+    assert counter.update(tracks) == []
+    _move(tracks, 3, [100, 560])
+    assert counter.update(tracks) == []
+    assert counter.counts[0] == {'forward': {}, 'backward': {}}
+
+
+def test_lost_tracks_are_not_tested():
+    counter = LineCrossingCounter([HORIZONTAL])
+    assert counter.update({4: _track([100, 300], [100, 400], lost_frames=2)}) == []
+
+
+def test_track_crossing_twice_is_counted_once():
+    counter = LineCrossingCounter([HORIZONTAL])
+    tracks = {5: _track([100, 340], [100, 370])}
+    assert len(counter.update(tracks)) == 1
+    for center in ([100, 350], [100, 375], [100, 340]):  # back up, down again, up again
+        _move(tracks, 5, center)
+        assert counter.update(tracks) == []
+    assert tracks[5]['counted_lines'] == {0}
+    assert counter.counts[0] == {'forward': {'car': 1}, 'backward': {}}
+
+
+def test_each_line_counted_separately():
+    counter = LineCrossingCounter([HORIZONTAL, [0, 500, 1600, 500]])
+    events = counter.update({6: _track([100, 300], [100, 600])})
+    assert sorted(e['line_index'] for e in events) == [0, 1]
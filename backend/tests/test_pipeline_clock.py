@@ -0,0 +1,65 @@
+# test_pipeline_clock.py
+"""
+PipelineClock elapsed time from source PTS: nonzero start offsets, streams
+without PTS and PTS resets after a reconnect.
+"""
+
+from datetime import datetime, timezone
+
+import cv2
+import pytest
+
+from pipeline_clock import PipelineClock
+
+START = datetime(2026, 1, 18, 4, 0, tzinfo=timezone.utc)
+
+
+class FakeCapture:
+    """Stands in for cv2.VideoCapture, reporting a scripted PTS per frame"""
+
+    def __init__(self, pts_ms):
+        self.pts_ms = list(pts_ms)
+        self.current = 0.0
+
+    def read(self):
+        self.current = self.pts_ms.pop(0)
+
+    def get(self, prop):
+        assert prop == cv2.CAP_PROP_POS_MSEC
+        return self.current
+
+
+def _run(pts_ms, fps=25.0):
+    clock = PipelineClock(start_time=START, fps=fps)
+    capture = FakeCapture(pts_ms)
+    times = []
+    for _ in range(len(capture.pts_ms)):
+        capture.read()
+        times.append(clock.tick(capture))
+    return clock, times
+
+
+def test_file_pts_from_zero():
+    _, times = _run([0.0, 40.0, 80.0, 120.0])
+    assert times == pytest.approx([0.0, 0.04, 0.08, 0.12])
+
+
+def test_live_stream_nonzero_start_pts():
+    # RTSP stream joined 5000 s into its PTS timeline starts at elapsed 0
+    clock, times = _run([5_000_000.0 + 40.0 * i for i in range(10)])
+    assert times == pytest.approx([0.04 * i for i in range(10)])
+    assert clock.now() == clock.at(0.36)
+
+
+def test_no_pts_falls_back_to_frame_rate():
+    _, times = _run([0.0] * 5, fps=10.0)
+    assert times == pytest.approx([0.0, 0.1, 0.2, 0.3, 0.4])
+
+
+def test_pts_reset_after_reconnect_keeps_clock_running():
+    pts = [900_000.0 + 40.0 * i for i in range(5)] + [40.0 * i for i in range(1, 6)]
+    _, times = _run(pts)
+    assert times[:5] == pytest.approx([0.0, 0.04, 0.08, 0.12, 0.16])
+    # Continues one frame after the last timestamp, then follows the new PTS
+    assert times[5:] == pytest.approx([0.2, 0.24, 0.28, 0.32, 0.36])
+    assert all(b > a for a, b in zip(times, times[1:]))
@@ -0,0 +1,124 @@
+# test_schedule_cache.py
+"""
+ScheduleCache guarantees the schedule consumers rely on: committed counts
+invalidate only their junction, rolled-back writes invalidate nothing, and
+concurrent misses for one key share a single computation.
+"""
+
+import threading
+import time
+
+import pytest
+
+import models
+import traffic_cycle
+from database import SessionLocal, engine
+from schedule_cache import ScheduleCache, schedule_cache
+
+
+class Calculator:
+    """Stands in for traffic_cycle.calculate_schedule, counting calls"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, junction_id, demand="latest", method="formula"):
+        with self.lock:
+            self.calls.append(junction_id)
+            version = len(self.calls)
+        time.sleep(self.delay)
+        return [{'traffic_light_no': 1, 'G': 10.0 + version, 'Y': 3.0, 'R': 0.0, 'percentage_clearance': 80.0}]
+
+
+@pytest.fixture
+def calculator(monkeypatch):
+    calculator = Calculator()
+    monkeypatch.setattr(traffic_cycle, 'calculate_schedule', calculator)
+    return calculator
+
+
+@pytest.fixture
+def database():
+    models.Base.metadata.create_all(bind=engine)
+    schedule_cache.clear()
+    yield
+    schedule_cache.clear()
+    models.Base.metadata.drop_all(bind=engine)
+
+
+def _traffic(junction_id):
+    return models.TrafficData(junction_id=junction_id, phase=1, two_wheelers=1, light_vehicles=2, heavy_vehicles=0)
+
+
+def test_commit_invalidates_only_its_junction(calculator, database):
+    notified = []
+    schedule_cache.add_invalidation_listener(notified.append)
+    try:
+        first = {j: schedule_cache.get(j) for j in ('J-1', 'J-2')}
+        db = SessionLocal()
+        db.add(_traffic('J-1'))
+        db.commit()
+        db.close()
+
+        assert schedule_cache.get('J-2') == first['J-2']  # Still cached
+        assert schedule_cache.get('J-1') != first['J-1']  # Recomputed
+        assert calculator.calls == ['J-1', 'J-2', 'J-1']
+        assert notified == [{'J-1'}]
+    finally:
+        schedule_cache.listeners.remove(notified.append)
+
+
+def test_rollback_invalidates_nothing(calculator, database):
+    schedule_cache.get('J-1')
+    invalidations = schedule_cache.stats()['invalidations']
+
+    db = SessionLocal()
+    db.add(_traffic('J-1'))
+    db.flush()  # Collected by before_flush, then discarded
+    db.rollback()
+    db.commit()  # A later empty commit must not replay the rolled-back junctions
+    db.close()
+
+    schedule_cache.get('J-1')
+    assert calculator.calls == ['J-1']
+    assert schedule_cache.stats()['invalidations'] == invalidations
+
+
+def test_concurrent_misses_compute_once(monkeypatch):
+    calculator = Calculator(delay=0.2)
+    monkeypatch.setattr(traffic_cycle, 'calculate_schedule', calculator)
+    cache = ScheduleCache(ttl_seconds=0)
+
+    start = threading.Barrier(8)
+    results = []
+
+    def request():
+        start.wait()
+        results.append(cache.get('J-1'))
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calculator.calls == ['J-1']
+    assert len(results) == 8 and all(r == results[0] for r in results)
+    stats = cache.stats()
+    assert stats['misses'] == 1 and stats['coalesced'] == 7
+
+
+def test_write_during_computation_is_not_cached(monkeypatch):
+    cache = ScheduleCache(ttl_seconds=0)
+    calculator = Calculator()
+
+    def calculate(junction_id, **kwargs):
+        cache.invalidate([junction_id])  # A commit lands while computing
+        return calculator(junction_id, **kwargs)
+
+    monkeypatch.setattr(traffic_cycle, 'calculate_schedule', calculate)
+    cache.get('J-1')
+    cache.get('J-1')
+    assert calculator.calls == ['J-1', 'J-1']
@@ -0,0 +1,102 @@
+# test_tracker_soak.py
+"""
+Soak test: tracker + line counter bookkeeping stays bounded on long streams.
+
+Drives VehicleTracker and LineCrossingCounter with synthetic vehicles that
+enter at the top of the frame, cross a count line and leave at the bottom,
+starting the ID counter just below Config.MAX_TRACK_ID so IDs wrap during the
+run. Asserts that RSS, the live track dict and the IDs stay bounded, and that
+every vehicle is still counted exactly once.
+
+Frames default to 5000 so the regular test run stays fast (IDs still wrap);
+set SOAK_FRAMES (e.g. 300000 or 2000000) for a real soak.
+"""
+
+import os
+import resource
+import sys
+
+from config import Config
+from line_counter import LineCrossingCounter
+from vehicle_tracker import VehicleTracker
+
+SOAK_FRAMES = int(os.getenv("SOAK_FRAMES", "5000"))
+WARMUP_FRAMES = min(20000, SOAK_FRAMES // 4)
+LANES = (100, 300, 500, 700, 900, 1100, 1300, 1500)  # Farther apart than the tracker's match radius
+SPEED = 15                         # Pixels per frame
+SPAWN_EVERY = 5                    # Frames; a lane gets a vehicle every 40 frames (600 px), so a lost
+                                   # track waiting at the exit never sees the lane's next vehicle
+FRAME_HEIGHT = 720
+LINE_Y = 360
+CLASSES = ('car', 'motorcycle', 'truck')
+MAX_LIVE_TRACKS = 32               # ~10 vehicles in view plus tracks awaiting max_track_age expiry
+MAX_RSS_GROWTH = 8 * 1024 * 1024
+
+
+def _rss_bytes() -> int:
+    """Current resident set size (peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _detections(vehicles):
+    return [{'center': [x, y], 'bbox': [x - 20, y - 20, x + 20, y + 20], 'vehicle_class': cls}
+            for x, y, cls in vehicles]
+
+
+def test_tracker_and_counter_stay_bounded():
+    tracker = VehicleTracker(max_track_age=Config.MAX_TRACK_AGE, min_hits=1)
+    tracker.next_object_id = Config.MAX_TRACK_ID - 50  # Wrap early in the run
+    counter = LineCrossingCounter([[0, LINE_Y, 1600, LINE_Y]])
+
+    vehicles = []  # [x, y, class]
+    spawned = crossed_expected = counted = 0
+    wrapped = False
+    rss_after_warmup = None
+
+    for frame in range(SOAK_FRAMES):
+        if frame % SPAWN_EVERY == 0:
+            vehicles.append([LANES[spawned % len(LANES)], 0, CLASSES[spawned % len(CLASSES)]])
+            spawned += 1
+        for vehicle in vehicles:
+            before = vehicle[1]
+            vehicle[1] += SPEED
+            if before < LINE_Y <= vehicle[1]:
+                crossed_expected += 1
+        vehicles = [v for v in vehicles if v[1] <= FRAME_HEIGHT]
+
+        active = tracker.update_tracks(_detections(vehicles))
+        counted += len(counter.update(active))
+
+        if tracker.next_object_id < 100:
+            wrapped = True
+        if frame == WARMUP_FRAMES:
+            rss_after_warmup = _rss_bytes()
+        if frame % 1000 == 0:
+            assert len(tracker.tracked_objects) <= MAX_LIVE_TRACKS
+            assert all(0 <= track_id <= Config.MAX_TRACK_ID for track_id in tracker.tracked_objects)
+
+    assert wrapped, "track IDs never wrapped at Config.MAX_TRACK_ID"
+    assert len(tracker.tracked_objects) <= MAX_LIVE_TRACKS
+    assert sum(len(per_class) for line in counter.counts for per_class in line.values()) <= len(CLASSES) * 2
+    assert counted == crossed_expected
+
+    growth = _rss_bytes() - rss_after_warmup
+    assert growth < MAX_RSS_GROWTH, f"RSS grew by {growth / 1024 / 1024:.1f} MiB after warm-up"
+
+
+def test_track_id_wrap_skips_ids_in_use():
+    tracker = VehicleTracker(min_hits=1)
+    tracker.next_object_id = Config.MAX_TRACK_ID
+    tracker.tracked_objects[0] = {'center': [5000, 5000], 'prev_center': None, 'bbox': [0, 0, 1, 1],
+                                  'vehicle_class': 'car', 'hits': 1, 'lost_frames': 0}
+
+    tracks = tracker.update_tracks(_detections([(10, 10, 'car'), (400, 10, 'car')]))
+
+    assert Config.MAX_TRACK_ID in tracks
+    assert 1 in tracks  # 0 is still in use
+    assert tracker.next_object_id == 2
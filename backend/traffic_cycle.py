@@ -1,91 +1,143 @@
+import numpy as np
+
 import green_time_simulation as gts
+import demand_forecast
+import signal_optimizer
 from database import SessionLocal
 from models import TrafficData, SignalPhase
 from sqlalchemy import func
 
-def calculate_schedule(junction_id="J-001"):
+# --- Simulation Parameters ---
+P_SERVICE_FRACTION = 0.8  # Target service fraction
+T_RED_INTERVAL = 60.0  # Red interval time
+
+
+DEMAND_MODES = ('latest', 'forecast')
+METHODS = ('formula', 'optimize')
+
+
+def calculate_schedule(junction_id="J-001", demand="latest", method="formula"):
     """
     Calculates the traffic light schedule using real-time data from database.
     
     Args:
         junction_id (str): Junction ID to calculate schedule for
+        demand (str): 'latest' counts or the per-phase 'forecast'
+        method (str): 'formula' green times or the cycle/split 'optimize'r
     
     Returns:
         schedule list or raises an exception on error.
     """
-    db = SessionLocal()
-    
+    schedules = calculate_schedules([junction_id], demand=demand, method=method)
+    if junction_id not in schedules:
+        raise ValueError(f"No phases found for junction {junction_id}")
+    return schedules[junction_id]
+
+
+def calculate_schedules(junction_ids=None, db=None, demand="latest", method="formula"):
+    """
+    Calculates the schedules of many junctions in a constant number of queries.
+
+    Phases come from one query and the latest traffic row per (junction, phase)
+    from one window-function query; all schedules are then computed together
+    by gts.schedule_batch.
+
+    Args:
+        junction_ids (list): Junction IDs to schedule; None for every junction with phases
+        db: Optional open session (a new one is opened and closed otherwise)
+        demand (str): 'latest' uses each phase's most recent count; 'forecast' uses the
+                      demand forecast (see demand_forecast.py), falling back to the latest
+                      count for phases with too few observations
+        method (str): 'formula' uses gts.schedule_batch; 'optimize' searches cycle lengths
+                      and splits for the least Webster delay (signal_optimizer.py)
+
+    Returns:
+        dict: junction_id -> schedule list. Junctions without phases are left out.
+    """
+    if demand not in DEMAND_MODES:
+        raise ValueError(f"Unknown demand mode '{demand}' (expected one of {', '.join(DEMAND_MODES)})")
+    if method not in METHODS:
+        raise ValueError(f"Unknown schedule method '{method}' (expected one of {', '.join(METHODS)})")
+
+    own_session = db is None
+    if own_session:
+        db = SessionLocal()
+
     try:
-        # Get number of phases for this junction
-        phases = db.query(SignalPhase).filter(
-            SignalPhase.junction_id == junction_id
-        ).all()
-        
-        if not phases:
-            raise ValueError(f"No phases found for junction {junction_id}")
-        
-        num_phases = len(phases)
-        d_value_hardcoded = 10.0  # meters/feet
-        
-        # Get lane counts from signal_phases table
-        lanes_per_phase = [phase.lane_count for phase in sorted(phases, key=lambda p: p.phase_number)]
-        
-        # Initialize lists to store data for each phase
-        raw_phase_vehicle_counts = []
-        
-        # Query latest traffic data for each phase
-        for phase_num in range(1, num_phases + 1):
-            # Get the most recent traffic count for this phase
-            latest_data = db.query(TrafficData).filter(
-                TrafficData.junction_id == junction_id,
-                TrafficData.phase == phase_num
-            ).order_by(TrafficData.timestamp.desc()).first()
-            
-            if latest_data:
-                two_wheelers = latest_data.two_wheelers
-                light_motor_vehicles = latest_data.light_vehicles
-                heavy_motor_vehicles = latest_data.heavy_vehicles
-            else:
-                # Default values if no data exists
-                two_wheelers = 0
-                light_motor_vehicles = 0
-                heavy_motor_vehicles = 0
-            
-            raw_phase_vehicle_counts.append({
-                'd': d_value_hardcoded,
-                'two_wheelers': two_wheelers,
-                'light_motor_vehicles': light_motor_vehicles,
-                'heavy_motor_vehicles': heavy_motor_vehicles
-            })
-
-        # Convert raw vehicle counts into the format expected by green_time_simulation
-        formatted_phases_data = []
-        for phase_counts in raw_phase_vehicle_counts:
-            vehicles_for_phase = gts.convert_raw_to_vehicle_data(
-                phase_counts['d'],
-                phase_counts['two_wheelers'],
-                phase_counts['light_motor_vehicles'],
-                phase_counts['heavy_motor_vehicles']
+        phase_query = db.query(SignalPhase.junction_id, SignalPhase.phase_number, SignalPhase.lane_count)
+        if junction_ids is not None:
+            if not junction_ids:
+                return {}
+            phase_query = phase_query.filter(SignalPhase.junction_id.in_(junction_ids))
+
+        # Lane counts per junction, in phase order
+        lanes_by_junction = {}
+        for junction_id, phase_number, lane_count in phase_query.order_by(
+                SignalPhase.junction_id, SignalPhase.phase_number):
+            lanes_by_junction.setdefault(junction_id, []).append(lane_count)
+
+        if not lanes_by_junction:
+            return {}
+
+        # Latest traffic row per (junction, phase)
+        ranked = db.query(
+            TrafficData.junction_id,
+            TrafficData.phase,
+            TrafficData.two_wheelers,
+            TrafficData.light_vehicles,
+            TrafficData.heavy_vehicles,
+            func.row_number().over(
+                partition_by=(TrafficData.junction_id, TrafficData.phase),
+                order_by=(TrafficData.timestamp.desc(), TrafficData.id.desc())
+            ).label('row_number')
+        ).filter(TrafficData.junction_id.in_(list(lanes_by_junction))).subquery()
+
+        latest_rows = db.query(
+            ranked.c.junction_id, ranked.c.phase,
+            ranked.c.two_wheelers, ranked.c.light_vehicles, ranked.c.heavy_vehicles
+        ).filter(ranked.c.row_number == 1).all()
+
+        # Pad junctions to the largest phase count; the mask marks real phases
+        ordered_ids = list(lanes_by_junction)
+        index_of = {junction_id: j for j, junction_id in enumerate(ordered_ids)}
+        max_phases = max(len(lanes) for lanes in lanes_by_junction.values())
+
+        counts = np.zeros((len(ordered_ids), max_phases, 3))
+        num_lanes = np.zeros((len(ordered_ids), max_phases))
+        phase_mask = np.zeros((len(ordered_ids), max_phases), dtype=bool)
+        for j, junction_id in enumerate(ordered_ids):
+            lanes = lanes_by_junction[junction_id]
+            num_lanes[j, :len(lanes)] = lanes
+            phase_mask[j, :len(lanes)] = True
+
+        for junction_id, phase, two_wheelers, light_vehicles, heavy_vehicles in latest_rows:
+            j = index_of[junction_id]
+            # Phase numbers are 1-based; rows for phases the junction does not have are ignored
+            if 1 <= phase <= len(lanes_by_junction[junction_id]):
+                counts[j, phase - 1] = (two_wheelers or 0, light_vehicles or 0, heavy_vehicles or 0)
+
+        if demand == "forecast":
+            for (junction_id, phase), forecast in demand_forecast.forecast_phase_counts(db, ordered_ids).items():
+                if 1 <= phase <= len(lanes_by_junction[junction_id]):
+                    counts[index_of[junction_id], phase - 1] = forecast
+
+        if method == "optimize":
+            optimized = signal_optimizer.optimize_batch(counts, num_lanes, phase_mask)
+            G, Y, R, clearance = (optimized[key] for key in ('G', 'Y', 'R', 'percentage_clearance'))
+        else:
+            G, Y, R, clearance = gts.schedule_batch(
+                counts, num_lanes, phase_mask, P_SERVICE_FRACTION, T_RED_INTERVAL
             )
-            formatted_phases_data.append(vehicles_for_phase)
-
-        # --- Simulation Parameters ---
-        p_service_fraction = 0.8  # Target service fraction
-        T_red_interval = 60.0  # Red interval time
-
-        # Run the simulation cycle
-        schedule = gts.run_cycle(
-            formatted_phases_data,
-            p_service_fraction,
-            T_red_interval,
-            lanes_per_phase
-        )
-        
-        return schedule
-    
-    finally:
-        db.close()
 
+        schedules = {}
+        for j, junction_id in enumerate(ordered_ids):
+            n = len(lanes_by_junction[junction_id])
+            schedules[junction_id] = gts.schedule_rows(G[j, :n], Y[j, :n], R[j, :n], clearance[j, :n])
+        return schedules
+
+    finally:
+        if own_session:
+            db.close()
 
 def main():
     print("--- Traffic Light Simulation Setup ---")
@@ -0,0 +1,293 @@
+# traffic_simulator.py
+"""
+Vectorized Monte Carlo simulation of signal timing strategies.
+
+Each scenario draws per-phase arrival rates from a junction's traffic_data
+history (bootstrap over stored count buckets) and then runs many signal
+cycles with Poisson arrivals. Queues are modelled per cycle as a fluid queue
+(uniform arrivals, saturation-flow discharge during effective green), which
+gives the exact queue area - the total delay - without stepping through
+seconds. All scenarios and phases advance together as NumPy arrays; only the
+cycle loop is in Python, because each cycle's queue depends on the previous.
+
+Timing policies:
+    adaptive  schedule recomputed every cycle from the previous cycle's counts
+              (what traffic_cycle does live), for a given p_service_fraction
+    fixed     the junction's stored SignalTiming rows
+    forecast  the schedule from the demand forecast (demand_forecast.py)
+
+Usage:
+    python traffic_simulator.py --junction J-001
+    python traffic_simulator.py --junction J-001 --policies adaptive fixed --p 0.6 0.7 0.8 0.9
+    python traffic_simulator.py --junction J-001 --scenarios 5000 --cycles 2000 --demand-scale 1.2
+"""
+
+import argparse
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import green_time_simulation as gts
+from config import Config
+
+LIGHT_CLASS = gts.COUNT_CLASSES.index('light_motor_vehicle')  # PCE 1.0: PCE counts go in this slot
+PERCENTILES = (50, 90, 99)
+
+
+def load_arrival_history(junction_id: str, db=None, limit: Optional[int] = None):
+    """
+    Per-phase arrival rate samples and lane counts of a junction
+
+    Args:
+        junction_id: Junction ID
+        db: Optional open session
+        limit: Use only the most recent `limit` rows per phase
+
+    Returns:
+        (list of per-phase arrays of arrival rates in PCE/second, lanes per phase)
+    """
+    from database import SessionLocal
+    from models import SignalPhase, TrafficData
+
+    own_session = db is None
+    if own_session:
+        db = SessionLocal()
+    try:
+        phases = db.query(SignalPhase).filter(
+            SignalPhase.junction_id == junction_id
+        ).order_by(SignalPhase.phase_number).all()
+        if not phases:
+            raise ValueError(f"No phases found for junction {junction_id}")
+
+        rates = []
+        for phase_number in range(1, len(phases) + 1):
+            query = db.query(
+                TrafficData.two_wheelers, TrafficData.light_vehicles, TrafficData.heavy_vehicles
+            ).filter(
+                TrafficData.junction_id == junction_id,
+                TrafficData.phase == phase_number
+            ).order_by(TrafficData.timestamp.desc())
+            if limit:
+                query = query.limit(limit)
+            counts = np.array(query.all(), dtype=np.float64).reshape(-1, 3)
+            rates.append(np.nan_to_num(counts) @ gts.PCE_VECTOR / Config.COUNT_BUCKET_SECONDS)
+
+        return rates, [phase.lane_count for phase in phases]
+    finally:
+        if own_session:
+            db.close()
+
+
+def sample_scenarios(rate_history: List[np.ndarray], n_scenarios: int,
+                     rng: np.random.Generator, demand_scale: float = 1.0) -> np.ndarray:
+    """
+    Draw per-phase mean arrival rates for each scenario from the history
+
+    Returns:
+        Array (n_scenarios, phases) of arrival rates in PCE/second (phases without history get 0)
+    """
+    rates = np.zeros((n_scenarios, len(rate_history)))
+    for k, history in enumerate(rate_history):
+        if len(history):
+            rates[:, k] = rng.choice(history, size=n_scenarios)
+    return rates * demand_scale
+
+
+def schedule_arrays(schedule: List[Dict]):
+    """Green times (phases,) and cycle length of a schedule in the traffic_cycle format"""
+    G = np.array([row['G'] for row in schedule], dtype=np.float64)
+    cycle = max(row['G'] + row['Y'] + row['R'] for row in schedule) if schedule else 0.0
+    return G, cycle
+
+
+def simulate(rates, num_lanes, schedule: Optional[List[Dict]] = None, n_cycles: int = 1000,
+             p: float = 0.8, T_red: float = 60.0, warmup_cycles: int = 50,
+             seed: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Simulate many scenarios of one junction under a timing policy
+
+    Args:
+        rates: Array (scenarios, phases) of mean arrival rates in PCE/second
+        num_lanes: Lanes per phase
+        schedule: Static schedule (list of {'G', 'Y', 'R', ...} per phase), or None for the
+                  adaptive policy recomputed every cycle from the previous cycle's counts
+        n_cycles: Cycles simulated per scenario (after warm-up)
+        p: Service fraction of the adaptive policy
+        T_red: Red interval of the adaptive policy
+        warmup_cycles: Cycles run first and left out of the statistics
+        seed: Random seed
+
+    Returns:
+        Per-scenario arrays: avg_delay (S,), cycle_length (S,), max_queue, mean_queue,
+        clearance_rate and served_fraction (S, phases)
+    """
+    rng = np.random.default_rng(seed)
+    rates = np.asarray(rates, dtype=np.float64)
+    n_scenarios, n_phases = rates.shape
+    lanes = np.broadcast_to(np.asarray(num_lanes, dtype=np.float64), (n_scenarios, n_phases))
+    capacity_rate = gts.SATURATION_FLOW_RATE_PER_LANE * lanes  # PCE/second while discharging
+    min_cycle = n_phases * (gts.YELLOW_TIME + gts.ALL_RED_TIME)
+
+    if schedule is not None:
+        static_G, static_cycle = schedule_arrays(schedule)
+        G = np.broadcast_to(static_G, (n_scenarios, n_phases))
+        cycle = np.full(n_scenarios, max(static_cycle, min_cycle))
+    else:
+        # The first adaptive schedule sees the expected count of one bucket
+        last_counts = rates * Config.COUNT_BUCKET_SECONDS
+
+    queue = np.zeros((n_scenarios, n_phases))
+    total_delay = np.zeros(n_scenarios)
+    total_arrivals = np.zeros(n_scenarios)
+    total_served = np.zeros((n_scenarios, n_phases))
+    total_demand = np.zeros((n_scenarios, n_phases))
+    max_queue = np.zeros((n_scenarios, n_phases))
+    queue_time = np.zeros((n_scenarios, n_phases))
+    cleared = np.zeros((n_scenarios, n_phases))
+    cycle_sum = np.zeros(n_scenarios)
+
+    for step in range(warmup_cycles + n_cycles):
+        if schedule is None:
+            counts = np.zeros((n_scenarios, n_phases, 3))
+            counts[:, :, LIGHT_CLASS] = last_counts
+            G, Y, R, _ = gts.schedule_batch(counts, lanes, None, p, T_red)
+            cycle = np.maximum((G + Y + R).max(axis=1), min_cycle)
+
+        arrivals = rng.poisson(rates * cycle[:, None]).astype(np.float64)
+        arrival_rate = arrivals / cycle[:, None]
+        green = np.maximum(G - gts.START_UP_LOST_TIME_PER_PHASE, 0.0)
+        red = cycle[:, None] - green
+
+        # Red: queue grows linearly from the carried-over queue
+        at_green = queue + arrival_rate * red
+        red_area = (queue + at_green) / 2 * red
+
+        # Green: discharge at saturation flow while arrivals continue
+        net_rate = capacity_rate - arrival_rate
+        with np.errstate(divide='ignore', invalid='ignore'):
+            clear_time = np.where(net_rate > 0, at_green / net_rate, np.inf)
+        clears = (at_green <= 0) | (clear_time <= green)
+        at_end = np.where(clears, 0.0, np.maximum(at_green - net_rate * green, 0.0))
+        green_area = np.where(clears, at_green * np.where(clears & np.isfinite(clear_time), clear_time, 0.0) / 2,
+                              (at_green + at_end) / 2 * green)
+
+        if step >= warmup_cycles:
+            total_delay += (red_area + green_area).sum(axis=1)
+            total_arrivals += arrivals.sum(axis=1)
+            total_demand += queue + arrivals
+            total_served += queue + arrivals - at_end
+            max_queue = np.maximum(max_queue, at_green)
+            queue_time += red_area + green_area
+            cleared += clears
+            cycle_sum += cycle
+
+        queue = at_end
+        if schedule is None:
+            last_counts = arrivals * (Config.COUNT_BUCKET_SECONDS / cycle[:, None])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avg_delay = np.where(total_arrivals > 0, total_delay / total_arrivals, 0.0)
+        served_fraction = np.where(total_demand > 0, total_served / total_demand, 1.0)
+
+    return {
+        'avg_delay': avg_delay,
+        'cycle_length': cycle_sum / max(1, n_cycles),
+        'max_queue': max_queue,
+        'mean_queue': queue_time / np.maximum(cycle_sum, 1e-9)[:, None],
+        'clearance_rate': cleared / max(1, n_cycles),
+        'served_fraction': served_fraction,
+    }
+
+
+def summarize(result: Dict[str, np.ndarray], percentiles=PERCENTILES) -> Dict:
+    """
+    Distribution summary of a simulation result
+
+    Returns:
+        {metric: {'mean': ..., 'p50': ..., ...}}; per-phase metrics are summarized per phase
+    """
+    summary = {}
+    for metric, values in result.items():
+        entry = {'mean': np.mean(values, axis=0).tolist()}
+        for q, value in zip(percentiles, np.percentile(values, percentiles, axis=0)):
+            entry[f'p{q}'] = np.asarray(value).tolist()
+        summary[metric] = entry
+    return summary
+
+
+def policy_schedule(policy: str, junction_id: str, db) -> Optional[List[Dict]]:
+    """Static schedule of a policy ('fixed' or 'forecast'); None for 'adaptive'"""
+    if policy == 'adaptive':
+        return None
+    if policy == 'forecast':
+        import traffic_cycle
+        return traffic_cycle.calculate_schedules([junction_id], db=db, demand='forecast')[junction_id]
+    if policy == 'fixed':
+        from models import SignalTiming
+        timings = {}
+        for timing in db.query(SignalTiming).filter(
+                SignalTiming.junction_id == junction_id
+        ).order_by(SignalTiming.is_default, SignalTiming.id):
+            timings[timing.phase] = timing  # Non-default and newer rows win
+        if not timings:
+            raise ValueError(f"No signal timings found for junction {junction_id}")
+        return [{'G': float(t.green_time), 'Y': float(t.yellow_time or 0), 'R': float(t.red_time)}
+                for _, t in sorted(timings.items())]
+    raise ValueError(f"Unknown policy '{policy}'")
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Monte Carlo evaluation of signal timing policies')
+    parser.add_argument('--junction', type=str, required=True, help='Junction ID (e.g. J-001)')
+    parser.add_argument('--policies', nargs='+', default=['adaptive', 'fixed', 'forecast'],
+                        choices=['adaptive', 'fixed', 'forecast'], help='Timing policies to compare')
+    parser.add_argument('--p', type=float, nargs='+', default=[0.8],
+                        help='p_service_fraction values for the adaptive policy (default: 0.8)')
+    parser.add_argument('--t-red', type=float, default=60.0, help='T_red_interval of the adaptive policy')
+    parser.add_argument('--scenarios', type=int, default=1000, help='Scenarios per policy (default: 1000)')
+    parser.add_argument('--cycles', type=int, default=1000, help='Cycles per scenario (default: 1000)')
+    parser.add_argument('--history', type=int, default=None,
+                        help='Use only the most recent N traffic records per phase')
+    parser.add_argument('--demand-scale', type=float, default=1.0, help='Multiply historical demand')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    args = parser.parse_args()
+
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        rate_history, lanes = load_arrival_history(args.junction, db=db, limit=args.history)
+        rng = np.random.default_rng(args.seed)
+        rates = sample_scenarios(rate_history, args.scenarios, rng, args.demand_scale)
+
+        runs = []
+        for policy in args.policies:
+            if policy == 'adaptive':
+                runs.extend((f"adaptive p={p}", None, p) for p in args.p)
+            else:
+                try:
+                    runs.append((policy, policy_schedule(policy, args.junction, db), None))
+                except ValueError as e:
+                    logging.warning(f"Skipping policy '{policy}': {e}")
+    finally:
+        db.close()
+
+    print(f"\n--- {args.junction}: {args.scenarios} scenarios x {args.cycles} cycles ---")
+    print("{:<20} {:>12} {:>12} {:>12} {:>14} {:>12}".format(
+        "Policy", "Delay p50", "Delay p90", "Delay p99", "Max queue p90", "Cleared"))
+    print("-" * 86)
+    for name, schedule, p in runs:
+        result = simulate(rates, lanes, schedule, n_cycles=args.cycles, p=p or 0.8,
+                          T_red=args.t_red, seed=args.seed)
+        summary = summarize(result)
+        delay = summary['avg_delay']
+        print("{:<20} {:>11.1f}s {:>11.1f}s {:>11.1f}s {:>14.1f} {:>11.1f}%".format(
+            name, delay['p50'], delay['p90'], delay['p99'],
+            max(summary['max_queue']['p90']), 100 * float(np.mean(summary['clearance_rate']['mean']))))
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -25,6 +25,8 @@ from vehicle_detector import VehicleDetector
 from vehicle_tracker import VehicleTracker
 from manual_roi_selector import ManualROISelector
 from config import Config
+from roi_mask import PolygonROI, parse_polygon, rect_to_polygon
+from line_counter import LineCrossingCounter, parse_lines, default_exit_line
 
 # Database imports
 try:
@@ -66,6 +68,7 @@ class VehicleClassifier:
         self.detector = None
         self.tracker = None
         self.roi_coordinates = None
+        self.roi: Optional[PolygonROI] = None
         self.use_database = use_database and DATABASE_AVAILABLE
         self.junction_id = junction_id
         self.phase = phase
@@ -79,11 +82,8 @@ class VehicleClassifier:
             'hmv': 0
         }
         
-        # Track IDs that have been counted (for cumulative counting)
-        self.counted_track_ids = set()
-        
-        # Entry/exit line coordinates
-        self.exit_line_y = None
+        # Count lines (exit line by default), tested against track segments
+        self.line_counter: Optional[LineCrossingCounter] = None
         
         if self.use_database:
             if not DATABASE_AVAILABLE:
@@ -129,27 +129,31 @@ class VehicleClassifier:
                 logging.error(f"No phase record found for junction {self.junction_id}, phase {self.phase}")
                 return False
                 
-            if not all([phase_record.roi_x1, phase_record.roi_y1, 
-                       phase_record.roi_x2, phase_record.roi_y2]):
-                logging.error(f"ROI coordinates not set in database for junction {self.junction_id}, phase {self.phase}")
-                return False
+            # Polygon ROI takes precedence over the rectangle
+            polygon = parse_polygon(phase_record.roi_polygon)
+            if polygon is None:
+                if not all([phase_record.roi_x1, phase_record.roi_y1, 
+                           phase_record.roi_x2, phase_record.roi_y2]):
+                    logging.error(f"ROI coordinates not set in database for junction {self.junction_id}, phase {self.phase}")
+                    return False
+                polygon = rect_to_polygon([
+                    phase_record.roi_x1,
+                    phase_record.roi_y1,
+                    phase_record.roi_x2,
+                    phase_record.roi_y2
+                ])
                 
-            self.roi_coordinates = [
-                phase_record.roi_x1,
-                phase_record.roi_y1,
-                phase_record.roi_x2,
-                phase_record.roi_y2
-            ]
-            
-            # Set exit line at 3/4 of ROI height
-            roi_height = self.roi_coordinates[3] - self.roi_coordinates[1]
-            self.exit_line_y = self.roi_coordinates[1] + int(roi_height * 0.75)
+            # Configure detector with ROI (rasterized once into a lookup mask)
+            self.detector.set_roi_polygon(polygon, enabled=True)
+            self.roi = self.detector.roi
+            self.roi_coordinates = list(self.roi.bbox)
             
-            # Configure detector with ROI
-            self.detector.set_roi(self.roi_coordinates, enabled=True)
+            # Count lines from database, or exit line at 3/4 of ROI height
+            count_lines = parse_lines(phase_record.count_lines) or [default_exit_line(self.roi_coordinates)]
+            self.line_counter = LineCrossingCounter(count_lines)
             
-            logging.info(f"ROI loaded from database: {self.roi_coordinates}")
-            logging.info(f"Exit line set at y={self.exit_line_y}")
+            logging.info(f"ROI loaded from database: {self.roi.polygon.tolist()}")
+            logging.info(f"Count lines set: {count_lines}")
             
             return True
             
@@ -251,13 +255,14 @@ class VehicleClassifier:
             return False
             
         # Set exit line at 3/4 of ROI height
-        roi_height = self.roi_coordinates[3] - self.roi_coordinates[1]
-        self.exit_line_y = self.roi_coordinates[1] + int(roi_height * 0.75)
+        exit_line = default_exit_line(self.roi_coordinates)
+        self.line_counter = LineCrossingCounter([exit_line])
             
         # Configure detector with ROI
         self.detector.set_roi(self.roi_coordinates, enabled=True)
+        self.roi = self.detector.roi
         logging.info(f"ROI selected: {self.roi_coordinates}")
-        logging.info(f"Exit line set at y={self.exit_line_y}")
+        logging.info(f"Exit line set at y={exit_line[1]}")
         return True
         
     def classify_vehicle_simple(self, vehicle_class: str) -> str:
@@ -281,7 +286,12 @@ class VehicleClassifier:
             
     def count_vehicles_at_exit_line(self, tracked_objects: Dict) -> Dict[str, int]:
         """
-        Count vehicles crossing exit line (cumulative counting)
+        Count vehicles crossing any count line (cumulative counting)
+        
+        A vehicle is counted once, on the first line its track segment crosses,
+        in either direction; per-line directional totals are kept on
+        self.line_counter.counts. The counted flag lives on the track and is
+        evicted with it, so memory stays bounded on long-running streams.
         
         Args:
             tracked_objects: Dictionary of tracked vehicles from tracker
@@ -295,29 +305,27 @@ class VehicleClassifier:
             'hmv': 0
         }
         
-        if not self.roi_coordinates or self.exit_line_y is None:
+        if self.line_counter is None:
             return new_counts
             
-        roi_x1, roi_y1, roi_x2, roi_y2 = self.roi_coordinates
-        
-        for track_id, track_data in tracked_objects.items():
-            # Skip if already counted
-            if track_id in self.counted_track_ids:
+        # One vectorized segment/line intersection pass for all tracks
+        for event in self.line_counter.update(tracked_objects):
+            track_id = event['track_id']
+            track_data = tracked_objects[track_id]
+            
+            # Skip if already counted on another line
+            if track_data.get('counted'):
                 continue
                 
-            center_x, center_y = track_data['center']
+            simplified_class = self.classify_vehicle_simple(event['vehicle_class'])
             
-            # Check if vehicle is within ROI horizontally and has crossed exit line
-            if roi_x1 < center_x < roi_x2 and center_y > self.exit_line_y:
-                vehicle_class = track_data['vehicle_class']
-                simplified_class = self.classify_vehicle_simple(vehicle_class)
-                
-                # Count this vehicle
-                new_counts[simplified_class] += 1
-                self.vehicle_counts[simplified_class] += 1
-                self.counted_track_ids.add(track_id)
-                
-                logging.debug(f"Counted vehicle ID {track_id} as {simplified_class}")
+            # Count this vehicle
+            new_counts[simplified_class] += 1
+            self.vehicle_counts[simplified_class] += 1
+            track_data['counted'] = True
+            
+            logging.debug(f"Counted vehicle ID {track_id} as {simplified_class} "
+                          f"(line {event['line_index'] + 1}, {event['direction']})")
                 
         return new_counts
         
@@ -334,19 +342,16 @@ class VehicleClassifier:
         """
         result_frame = frame.copy()
         
-        # Draw ROI rectangle
-        if self.roi_coordinates:
+        # Draw ROI outline
+        if self.roi is not None:
             roi_x1, roi_y1, roi_x2, roi_y2 = self.roi_coordinates
-            cv2.rectangle(result_frame, (roi_x1, roi_y1), (roi_x2, roi_y2), (0, 255, 255), 3)
+            self.roi.draw(result_frame, (0, 255, 255), 3)
             cv2.putText(result_frame, "Classification ROI", (roi_x1 + 10, roi_y1 + 30),
                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
             
-            # Draw exit line
-            if self.exit_line_y:
-                cv2.line(result_frame, (roi_x1, self.exit_line_y), (roi_x2, self.exit_line_y), 
-                        (255, 0, 255), 2)
-                cv2.putText(result_frame, "Exit Line", (roi_x2 - 100, self.exit_line_y - 10),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 255), 2)
+            # Draw count lines
+            if self.line_counter is not None:
+                self.line_counter.draw(result_frame, (255, 0, 255), 2)
         
         # Calculate total
         total = self.vehicle_counts['motorcycle'] + self.vehicle_counts['lmv'] + self.vehicle_counts['hmv']
@@ -4,6 +4,7 @@ from ultralytics import YOLO
 import logging
 from typing import List, Dict, Tuple, Optional
 from config import Config
+from roi_mask import PolygonROI
 import os
 
 class VehicleDetector:
@@ -16,6 +17,7 @@ class VehicleDetector:
         self.confidence_threshold = Config.CONFIDENCE_THRESHOLD
         self.iou_threshold = Config.IOU_THRESHOLD
         self.roi_config = Config.DEFAULT_ROI.copy()
+        self.roi: Optional[PolygonROI] = None
         
         # Vehicle class mapping
         self.vehicle_classes = Config.COCO_VEHICLE_CLASSES
@@ -38,7 +40,8 @@ class VehicleDetector:
             raise
     
     def set_roi(self, coordinates: List[int], enabled: bool = True):
-        """Set region of interest for detection"""
+        """Set rectangular region of interest for detection"""
+        self.roi = PolygonROI.from_rect(coordinates)
         self.roi_config = {
             'enabled': enabled,
             'coordinates': coordinates,
@@ -46,6 +49,17 @@ class VehicleDetector:
         }
         logging.info(f"ROI set: {self.roi_config}")
     
+    def set_roi_polygon(self, polygon: List[List[int]], enabled: bool = True):
+        """Set polygon region of interest for detection (mask is rasterized once here)"""
+        self.roi = PolygonROI(polygon)
+        self.roi_config = {
+            'enabled': enabled,
+            'coordinates': list(self.roi.bbox),
+            'polygon': self.roi.polygon.tolist(),
+            'name': 'custom_roi'
+        }
+        logging.info(f"ROI polygon set: {self.roi_config}")
+    
     def classify_vehicle(self, class_id: int, bbox: List[float]) -> str:
         """Enhanced vehicle classification"""
         class_names = self.model.names
@@ -85,10 +99,9 @@ class VehicleDetector:
             detection_frame = frame
             roi_offset = [0, 0]
             
-            if self.roi_config['enabled']:
-                x1, y1, x2, y2 = self.roi_config['coordinates']
-                detection_frame = frame[y1:y2, x1:x2]
-                roi_offset = [x1, y1]
+            if self.roi_config['enabled'] and self.roi is not None:
+                # Tight bounding-box crop with pixels outside the polygon masked out
+                detection_frame, roi_offset = self.roi.crop(frame)
             
             # Run inference
             results = self.model(
@@ -147,9 +160,9 @@ class VehicleDetector:
         result_frame = frame.copy()
         
         # Draw ROI if enabled
-        if self.roi_config['enabled']:
-            x1, y1, x2, y2 = self.roi_config['coordinates']
-            cv2.rectangle(result_frame, (x1, y1), (x2, y2), (255, 255, 0), 2)
+        if self.roi_config['enabled'] and self.roi is not None:
+            x1, y1 = self.roi.x1, self.roi.y1
+            self.roi.draw(result_frame, (255, 255, 0), 2)
             cv2.putText(result_frame, 'ROI', (x1, y1-10), 
                         cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
         
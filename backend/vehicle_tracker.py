@@ -15,21 +15,33 @@ class VehicleTracker:
     """
 
     def __init__(self, max_track_age: int = Config.MAX_TRACK_AGE,
-                 min_hits: int = Config.MIN_HITS):
+                 min_hits: int = Config.MIN_HITS,
+                 max_track_id: int = Config.MAX_TRACK_ID):
         """
         Initializes the tracker.
 
         Args:
             max_track_age: Number of frames a track can be 'lost' before being deleted.
             min_hits: Minimum number of detections required to establish a track.
+            max_track_id: Track IDs wrap around to 0 after this value, so IDs stay
+                          bounded on long-running streams.
         """
         self.next_object_id = 0
-        # Store tracked objects: {object_id: {'center': [x, y], 'bbox': [...], 'vehicle_class': '...', 'hits': 0, 'lost_frames': 0}}
+        self.max_track_id = max_track_id
+        # Store tracked objects: {object_id: {'center': [x, y], 'prev_center': [x, y] or None, 'bbox': [...], 'vehicle_class': '...', 'hits': 0, 'lost_frames': 0}}
         self.tracked_objects = OrderedDict()
         self.max_track_age = max_track_age
         self.min_hits = min_hits
         logging.info(f"VehicleTracker initialized with max_track_age={max_track_age}, min_hits={min_hits}")
 
+    def _allocate_id(self) -> int:
+        """Returns the next free track ID, wrapping around at max_track_id."""
+        while self.next_object_id in self.tracked_objects:
+            self.next_object_id = (self.next_object_id + 1) % (self.max_track_id + 1)
+        new_id = self.next_object_id
+        self.next_object_id = (self.next_object_id + 1) % (self.max_track_id + 1)
+        return new_id
+
     def _get_distance(self, p1: List[float], p2: List[float]) -> float:
         """Calculates Euclidean distance between two points."""
         return math.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)
@@ -45,7 +57,9 @@ class VehicleTracker:
 
         Returns:
             A dictionary of currently active tracked objects,
-            {track_id: {'center': [x, y], 'bbox': [...], 'vehicle_class': '...', 'hits': int, 'lost_frames': int}}
+            {track_id: {'center': [x, y], 'prev_center': [x, y] or None, 'bbox': [...], 'vehicle_class': '...', 'hits': int, 'lost_frames': int}}
+            'prev_center' is the center at the track's previous match, so
+            prev_center -> center is the segment travelled since then.
         """
         if not detections:
             # If no detections, increment lost_frames for all existing tracks
@@ -85,6 +99,7 @@ class VehicleTracker:
 
             if best_match_idx != -1:
                 # Update matched tracked object
+                self.tracked_objects[obj_id]['prev_center'] = obj_data['center']
                 self.tracked_objects[obj_id]['center'] = current_detection_centers[best_match_idx]
                 self.tracked_objects[obj_id]['bbox'] = current_detection_bboxes[best_match_idx]
                 self.tracked_objects[obj_id]['vehicle_class'] = current_detection_classes[best_match_idx] # Update class in case of re-classification
@@ -102,15 +117,15 @@ class VehicleTracker:
         # Create new tracks for unmatched detections
         for i, det_center in enumerate(current_detection_centers):
             if i not in matched_detection_indices:
-                new_id = self.next_object_id
+                new_id = self._allocate_id()
                 self.tracked_objects[new_id] = {
                     'center': det_center,
+                    'prev_center': None,
                     'bbox': current_detection_bboxes[i],
                     'vehicle_class': current_detection_classes[i],
                     'hits': 1,
                     'lost_frames': 0
                 }
-                self.next_object_id += 1
                 logging.debug(f"New track {new_id} created for detection {i}.")
 
         # Filter out tracks that haven't met min_hits yet
@@ -111,6 +111,7 @@ export default function Alerts() {
                 status: acc.status === 'active' ? 'in-process' : 'resolved',
                 description: acc.description || 'Accident detected by camera',
                 snapshot: acc.evidence_image_path || '/placeholder-accident.jpg',
+                thumbnail: acc.evidence_thumbnail_path,
                 hospital: {
                     name: 'City General Hospital',
                     location: '2.3 km away - 4th Cross',
@@ -315,6 +316,15 @@ export default function Alerts() {
                                                 {accident.junction}
                                             </div>
                                             <p className="accident-desc">{accident.description}</p>
+                                            {accident.thumbnail && (
+                                                <img
+                                                    src={`${API_BASE_URL}${accident.thumbnail}`}
+                                                    alt="Accident evidence thumbnail"
+                                                    className="accident-thumbnail"
+                                                    loading="lazy"
+                                                    onError={(e) => e.target.style.display = 'none'}
+                                                />
+                                            )}
                                         </div>
                                     ))
                                 ) : (
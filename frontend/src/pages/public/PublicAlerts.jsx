@@ -209,13 +209,16 @@ export default function PublicAlerts() {
                                     </div>
                                 )}
 
-                                {accident.image_path && (
+                                {(accident.evidence_thumbnail_path || accident.evidence_image_path) && (
                                     <div className="accident-image">
-                                        <img
-                                            src={accident.image_url || `${API_BASE_URL}/evidence/${accident.image_path.split('/').pop()}`}
-                                            alt="Accident evidence"
-                                            onError={(e) => e.target.style.display = 'none'}
-                                        />
+                                        <a href={`${API_BASE_URL}${accident.evidence_image_path}`} target="_blank" rel="noopener noreferrer">
+                                            <img
+                                                src={`${API_BASE_URL}${accident.evidence_thumbnail_path || accident.evidence_image_path}`}
+                                                alt="Accident evidence"
+                                                loading="lazy"
+                                                onError={(e) => e.target.style.display = 'none'}
+                                            />
+                                        </a>
                                     </div>
                                 )}
 